@@ -108,9 +108,28 @@ export const api = {
     })
   },
   deleteWeek(weekId) {
+    // Deletion runs as a background job; resolve once it has finished
     return request(`/admin/weeks/${weekId}`, {
       method: 'DELETE',
-    })
+    }).then((data) => (data?.job_id ? api.waitForJob(data.job_id) : data))
+  },
+  getJob(jobId) {
+    return request(`/admin/jobs/${jobId}`).then((data) => data.job)
+  },
+  async waitForJob(jobId, { intervalMs = 500, maxIntervalMs = 5000, timeoutMs = 10 * 60 * 1000 } = {}) {
+    // Poll with backoff; give up after timeoutMs (the job keeps running on the server)
+    const deadline = Date.now() + timeoutMs
+    let delay = intervalMs
+    for (;;) {
+      const job = await api.getJob(jobId)
+      if (job.status === 'succeeded') return job
+      if (job.status === 'failed') throw new Error(job.error || 'Job failed')
+      if (Date.now() + delay > deadline) {
+        throw new Error(`Timed out waiting for job ${jobId} (still ${job.status})`)
+      }
+      await new Promise((resolve) => setTimeout(resolve, delay))
+      delay = Math.min(delay * 2, maxIntervalMs)
+    }
   },
   createWeek(categoryId, payload) {
     return request(`/admin/categories/${categoryId}/weeks`, {
@@ -123,6 +142,10 @@ export const api = {
     const suffix = query ? `?${query}` : ''
     return request(`/admin/submissions${suffix}`).then((data) => data.submissions || [])
   },
+  searchSubmissions(q, params = {}) {
+    const query = new URLSearchParams({ ...params, q }).toString()
+    return request(`/admin/submissions/search?${query}`)
+  },
   updateSubmission(submissionId, payload) {
     return request(`/admin/submissions/${submissionId}`, {
       method: 'PUT',
@@ -1,14 +1,42 @@
 """Admin endpoints for managing weeks and submissions with Firebase."""
-from flask import Blueprint, request, jsonify
-from .models import Week, Submission, Category
+from flask import Blueprint, request, jsonify, send_file
+from .models import Week, Submission, Category, SubmissionStats, load_related
+from .storage import AlreadyExists
 from .auth import admin_required
+from .cache import read_cache
+from .singleflight import flights
+from .pagination import InvalidCursor, encode_cursor, page_args, wants_page
+from .jobs import job_runner
+from .analytics import completion_matrices
+from .search import submission_search
+from .streaming import stream_json, streaming_enabled
+from .imports import InvalidImport, decode_lines, import_submissions, import_weeks
+from .exports import (InvalidExport, download_name, export_params, export_path, remove_export,
+                      run_export)
+from .validation import week_error
+from flask_jwt_extended import get_jwt_identity
+import itertools
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
 admin_api = Blueprint('admin_api', __name__)
 
 
+def _with_category_names(weeks, chunk_size=200):
+    """Yield weeks with their category_name, loading categories in batched reads."""
+    weeks = iter(weeks)
+    while True:
+        chunk = list(itertools.islice(weeks, chunk_size))
+        if not chunk:
+            return
+        categories = load_related(chunk, 'category_id', Category)
+        for week in chunk:
+            category = categories.get(week.get('category_id'))
+            yield {**week, 'category_name': category['name'] if category else 'Unknown'}
+
+
 # Admin - Get all weeks across all categories
 @admin_api.route('/weeks', methods=['GET'])
 @admin_required
@@ -30,17 +58,11 @@ def get_all_weeks():
     }
     """
     try:
-        weeks = Week.get_all()
-        
-        # Enrich with category names
-        result = []
-        for week in weeks:
-            category = Category.get_by_id(week['category_id'])
-            week_data = {**week}
-            week_data['category_name'] = category['name'] if category else 'Unknown'
-            result.append(week_data)
+        if streaming_enabled():
+            return stream_json("weeks", _with_category_names(Week.stream()))
         
-        return jsonify({"weeks": result}), 200
+        weeks = Week.get_all()
+        return jsonify({"weeks": list(_with_category_names(weeks))}), 200
     except Exception as e:
         logger.error(f"Get all weeks error: {e}")
         return jsonify({"error": str(e)}), 500
@@ -92,6 +114,8 @@ def update_week(week_id):
             "week": updated_week
         }), 200
         
+    except AlreadyExists:
+        return jsonify({"error": "Week number already exists for this category"}), 400
     except Exception as e:
         logger.error(f"Update week error: {e}")
         return jsonify({"error": str(e)}), 500
@@ -121,8 +145,11 @@ def create_week(category_id):
             return jsonify({"error": "Category not found"}), 404
         
         data = request.get_json()
-        if not data or 'week_number' not in data or 'title' not in data:
+        if not data:
             return jsonify({"error": "Missing required fields: week_number and title"}), 400
+        error = week_error(data)
+        if error:
+            return jsonify({"error": error}), 400
         
         # Check if week already exists
         existing = Week.get_by_category_and_number(category_id, data['week_number'])
@@ -148,6 +175,9 @@ def create_week(category_id):
             "week": week
         }), 201
         
+    except AlreadyExists:
+        # Lost a race with a concurrent create of the same week number
+        return jsonify({"error": "Week number already exists for this category"}), 400
     except Exception as e:
         logger.error(f"Create week error: {e}")
         return jsonify({"error": str(e)}), 500
@@ -157,17 +187,33 @@ def create_week(category_id):
 @admin_api.route('/weeks/<string:week_id>', methods=['DELETE'])
 @admin_required
 def delete_week(week_id):
-    """Admin only - Delete a week and all its submissions."""
+    """
+    Admin only - Delete a week and all its submissions.
+    
+    Runs as a background job; poll /api/admin/jobs/<job_id> for the result.
+    
+    Example response (202):
+    {
+        "message": "Week deletion started",
+        "job_id": "job123",
+        "status_url": "/api/admin/jobs/job123"
+    }
+    """
     try:
         week = Week.get_by_id(week_id)
         if not week:
             return jsonify({"error": "Week not found"}), 404
         
-        Week.delete(week_id)
+        job = job_runner.submit('delete_week', {'week_id': week_id},
+                                created_by=get_jwt_identity())
         
-        logger.info(f"Week deleted: {week_id}")
+        logger.info(f"Week deletion queued: {week_id} (job {job['id']})")
         
-        return jsonify({"message": "Week deleted successfully"}), 200
+        return jsonify({
+            "message": "Week deletion started",
+            "job_id": job['id'],
+            "status_url": f"/api/admin/jobs/{job['id']}"
+        }), 202
         
     except Exception as e:
         logger.error(f"Delete week error: {e}")
@@ -183,24 +229,57 @@ def get_all_submissions():
     
     Query params:
     - week_id: Filter by week
+    - class_id: Filter by category
     - status: Filter by status (pending, reviewed, approved)
+    - limit, cursor: Return one page (newest first) plus "next_cursor"
     """
     try:
         week_id = request.args.get('week_id')
         status = request.args.get('status')
         class_id = request.args.get('class_id')
         
+        if wants_page():
+            limit, start_after = page_args()
+            filters = []
+            if week_id:
+                filters.append(('week_id', '==', week_id))
+            if class_id:
+                filters.append(('category_id', '==', class_id))
+            if status:
+                filters.append(('status', '==', status))
+            submissions, next_position = Submission.get_page(filters, limit=limit, start_after=start_after)
+            return jsonify({
+                "submissions": submissions,
+                "next_cursor": encode_cursor(next_position) if next_position else None
+            }), 200
+        
+        if streaming_enabled():
+            # Same selection, read and encoded a chunk at a time, newest first
+            if week_id and class_id and (Week.get_by_id(week_id) or {}).get('category_id') != class_id:
+                submissions = iter(())
+            elif week_id:
+                submissions = Submission.stream(filters=[('week_id', '==', week_id)])
+            elif class_id:
+                submissions = Submission.stream(filters=[('category_id', '==', class_id)])
+            else:
+                submissions = Submission.stream()
+            if status:
+                submissions = (s for s in submissions if s.get('status') == status)
+            return stream_json("submissions", submissions)
+        
         if week_id:
             submissions = Submission.get_by_week(week_id)
+            # A week belongs to exactly one class, so check the week itself.
+            if class_id:
+                week = Week.get_by_id(week_id)
+                if not week or week.get('category_id') != class_id:
+                    submissions = []
+        elif class_id:
+            # Indexed query on the category_id denormalized onto submissions
+            # (run scripts/backfill_submission_category.py for older data).
+            submissions = Submission.get_by_category(class_id)
         else:
             submissions = Submission.get_all()
-
-        # Filter by class/category if provided.
-        # Submissions only store week_id, so we join against weeks to determine category_id.
-        if class_id:
-            weeks = Week.get_all()
-            week_ids_for_class = {w.get('id') for w in weeks if w.get('category_id') == class_id}
-            submissions = [s for s in submissions if s.get('week_id') in week_ids_for_class]
         
         # Filter by status if provided
         if status:
@@ -214,11 +293,56 @@ def get_all_submissions():
         
         return jsonify({"submissions": submissions}), 200
         
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Get all submissions error: {e}")
         return jsonify({"error": str(e)}), 500
 
 
+# Admin - Search submissions
+@admin_api.route('/submissions/search', methods=['GET'])
+@admin_required
+def search_submissions():
+    """
+    Admin only - Search submissions by student name, project URL or admin comment.
+    
+    Every word of ``q`` must match; the last one also matches as a prefix,
+    and words with no match fall back to a one-typo match.
+    
+    Query params:
+    - q: Search text (required)
+    - limit: Maximum results, newest first (default 20)
+    - week_id, class_id, status: Narrow the matches
+    
+    Example response:
+    {
+        "submissions": [{"id": "sub123", "student_name": "Ada Lovelace", "project_url": "...", ...}],
+        "total": 3
+    }
+    """
+    try:
+        query = (request.args.get('q') or '').strip()
+        if not query:
+            return jsonify({"error": "q is required"}), 400
+        if not submission_search.enabled:
+            return jsonify({"error": "Search is disabled (SEARCH_INDEX_ENABLED)"}), 503
+        if not submission_search.ready:
+            return jsonify({"error": "Search index is not ready yet"}), 503
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 200)
+        submissions, total = submission_search.search(
+            query,
+            limit=limit,
+            category_id=request.args.get('class_id'),
+            week_id=request.args.get('week_id'),
+            status=request.args.get('status'),
+        )
+        return jsonify({"submissions": submissions, "total": total}), 200
+    except Exception as e:
+        logger.error(f"Search submissions error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
 # Admin - Update submission
 @admin_api.route('/submissions/<string:submission_id>', methods=['PUT'])
 @admin_required
@@ -265,6 +389,28 @@ def update_submission(submission_id):
         return jsonify({"error": str(e)}), 500
 
 
+# Admin - Get earlier versions of a submission
+@admin_api.route('/submissions/<string:submission_id>/history', methods=['GET'])
+@admin_required
+def get_submission_history(submission_id):
+    """
+    Admin only - Get the versions a student's resubmissions replaced.
+    
+    Only populated when SUBMISSIONS_UPSERT is enabled; newest first.
+    """
+    try:
+        submission = Submission.get_by_id(submission_id)
+        if not submission:
+            return jsonify({"error": "Submission not found"}), 404
+        
+        history = Submission.get_history(submission_id)
+        return jsonify({"submission": submission, "history": history}), 200
+        
+    except Exception as e:
+        logger.error(f"Get submission history error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
 # Admin - Delete submission
 @admin_api.route('/submissions/<string:submission_id>', methods=['DELETE'])
 @admin_required
@@ -357,18 +503,451 @@ def update_category(category_id):
 @admin_api.route('/categories/<string:category_id>', methods=['DELETE'])
 @admin_required
 def delete_category(category_id):
-    """Admin only - Delete a category and all its weeks."""
+    """
+    Admin only - Delete a category and all its weeks.
+    
+    Runs as a background job, like week deletion.
+    """
     try:
         category = Category.get_by_id(category_id)
         if not category:
             return jsonify({"error": "Category not found"}), 404
         
-        Category.delete(category_id)
+        job = job_runner.submit('delete_category', {'category_id': category_id},
+                                created_by=get_jwt_identity())
         
-        logger.info(f"Category deleted: {category_id}")
+        logger.info(f"Category deletion queued: {category_id} (job {job['id']})")
         
-        return jsonify({"message": "Category deleted successfully"}), 200
+        return jsonify({
+            "message": "Category deletion started",
+            "job_id": job['id'],
+            "status_url": f"/api/admin/jobs/{job['id']}"
+        }), 202
         
     except Exception as e:
         logger.error(f"Delete category error: {e}")
         return jsonify({"error": str(e)}), 500
+
+
+# Admin - Read cache statistics
+@admin_api.route('/cache/stats', methods=['GET'])
+@admin_required
+def get_cache_stats():
+    """
+    Admin only - Get read cache and read coalescing counters for this worker.
+    
+    Example response:
+    {
+        "cache": {"hits": 120, "negative_hits": 3, "misses": 9, "evictions": 0, "size": 9, ...},
+        "singleflight": {"calls": 40, "executions": 12, "coalesced": 28, "in_flight": 0}
+    }
+    """
+    try:
+        return jsonify({
+            "cache": read_cache.stats(),
+            "singleflight": flights.stats(),
+            "completion_matrices": completion_matrices.stats()
+        }), 200
+    except Exception as e:
+        logger.error(f"Get cache stats error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+# Admin - Submission counts
+@admin_api.route('/stats', methods=['GET'])
+@admin_required
+def get_stats():
+    """
+    Admin only - Get submission counts by status from the maintained counters.
+    
+    Query params:
+    - week_id: Counts for one week
+    - class_id: Counts for one category (class) and each of its weeks
+    
+    Without parameters, returns counts per category plus overall totals.
+    
+    Example response (?week_id=week123):
+    {
+        "week_id": "week123",
+        "counts": {"total": 42, "by_status": {"pending": 30, "approved": 12, ...}}
+    }
+    """
+    try:
+        week_id = request.args.get('week_id')
+        class_id = request.args.get('class_id')
+        
+        if week_id:
+            counts = SubmissionStats.for_weeks([week_id])[week_id]
+            return jsonify({"week_id": week_id, "counts": counts}), 200
+        
+        if class_id:
+            weeks = Week.get_by_category(class_id)
+            week_counts = SubmissionStats.for_weeks(w['id'] for w in weeks)
+            return jsonify({
+                "class_id": class_id,
+                "counts": SubmissionStats.for_categories([class_id])[class_id],
+                "weeks": [{
+                    "week_id": week['id'],
+                    "week_number": week.get('week_number'),
+                    "title": week.get('title'),
+                    "counts": week_counts[week['id']]
+                } for week in weeks]
+            }), 200
+        
+        categories = Category.get_all()
+        category_counts = SubmissionStats.for_categories(c['id'] for c in categories)
+        totals = {"total": 0, "by_status": {}}
+        for counts in category_counts.values():
+            totals["total"] += counts["total"]
+            for status, n in counts["by_status"].items():
+                totals["by_status"][status] = totals["by_status"].get(status, 0) + n
+        return jsonify({
+            "counts": totals,
+            "categories": [{
+                "class_id": category['id'],
+                "name": category.get('name'),
+                "counts": category_counts[category['id']]
+            } for category in categories]
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Get stats error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+# Admin - Student x week completion grid
+@admin_api.route('/categories/<string:category_id>/completion', methods=['GET'])
+@admin_required
+def get_completion(category_id):
+    """
+    Admin only - Get which students submitted for each week of a category, on time or late.
+    
+    Students are keyed by normalized name; a cell is judged by the student's
+    first submission for the week against the week's due_date.
+    
+    Example response:
+    {
+        "category_id": "cat123",
+        "legend": {"0": "missing", "1": "on_time", "2": "late"},
+        "weeks": [{"id": "week1", "week_number": 1, "title": "Intro", "due_date": "..."}, ...],
+        "students": ["Ada Lovelace", "Alan Turing", ...],
+        "matrix": [[1, 2, 0, ...], [1, 1, 1, ...], ...],
+        "week_totals": {"missing": [...], "on_time": [...], "late": [...]},
+        "student_totals": {"missing": [...], "on_time": [...], "late": [...]}
+    }
+    """
+    try:
+        if not Category.get_by_id(category_id):
+            return jsonify({"error": "Category not found"}), 404
+        return jsonify({"category_id": category_id, **completion_matrices.get(category_id)}), 200
+    except Exception as e:
+        logger.error(f"Get completion error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+def _uploaded_csv():
+    """Lines of the uploaded CSV: a multipart ``file`` field or a raw text/csv body."""
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('file')
+        if upload is None:
+            raise InvalidImport("No file uploaded (expected a 'file' field)")
+        return decode_lines(upload.stream)
+    return decode_lines(request.stream)
+
+
+# Admin - Import submissions from CSV
+@admin_api.route('/import/submissions', methods=['POST'])
+@admin_required
+def import_submissions_csv():
+    """
+    Admin only - Import submissions from a CSV file (see imports.py for the columns).
+    
+    Send the file as multipart field ``file`` or as a text/csv body. Rows
+    are validated like POST /api/weeks/<id>/submissions and written in
+    batches; rows that fail are listed with their row number.
+    
+    Example response:
+    {
+        "rows": 3,
+        "imported": 2,
+        "failed": 1,
+        "errors": [{"row": 3, "error": "Week not found"}],
+        "errors_truncated": false,
+        "ignored_columns": ["email"]
+    }
+    """
+    try:
+        report = import_submissions(_uploaded_csv())
+        logger.info(f"Submissions imported: {report['imported']} of {report['rows']} rows")
+        return jsonify(report), 200
+    except InvalidImport as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Import submissions error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+# Admin - Import weeks from CSV
+@admin_api.route('/import/weeks', methods=['POST'])
+@admin_required
+def import_weeks_csv():
+    """
+    Admin only - Import weeks from a CSV file (see imports.py for the columns).
+    
+    Send the file as multipart field ``file`` or as a text/csv body. Rows
+    are validated like POST /api/admin/categories/<id>/weeks; a week number
+    that already exists in its category is reported, not overwritten.
+    
+    Example response:
+    {
+        "rows": 12,
+        "imported": 12,
+        "failed": 0,
+        "errors": [],
+        "errors_truncated": false,
+        "ignored_columns": []
+    }
+    """
+    try:
+        report = import_weeks(_uploaded_csv())
+        logger.info(f"Weeks imported: {report['imported']} of {report['rows']} rows")
+        return jsonify(report), 200
+    except InvalidImport as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Import weeks error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+# Admin - Recount submission counters
+@admin_api.route('/stats/reconcile', methods=['POST'])
+@admin_required
+def reconcile_stats():
+    """
+    Admin only - Recount submissions with count() aggregations and repair the counters.
+    
+    Runs as a background job. Pass ?class_id= to reconcile one category;
+    without it every category is reconciled (also the way to initialize
+    counters for submissions created before they existed).
+    """
+    try:
+        class_id = request.args.get('class_id')
+        job = job_runner.submit('reconcile_stats', {'class_id': class_id},
+                                created_by=get_jwt_identity())
+        return jsonify({
+            "message": "Reconciliation started",
+            "job_id": job['id'],
+            "status_url": f"/api/admin/jobs/{job['id']}"
+        }), 202
+    except Exception as e:
+        logger.error(f"Reconcile stats error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+# Admin - List background jobs
+@admin_api.route('/jobs', methods=['GET'])
+@admin_required
+def get_jobs():
+    """Admin only - Get the most recent background jobs, newest first."""
+    try:
+        return jsonify({"jobs": job_runner.get_recent()}), 200
+    except Exception as e:
+        logger.error(f"Get jobs error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+# Admin - Background job status
+@admin_api.route('/jobs/<string:job_id>', methods=['GET'])
+@admin_required
+def get_job(job_id):
+    """
+    Admin only - Get the status, progress and result of a background job.
+    
+    Example response:
+    {
+        "job": {
+            "id": "job123",
+            "type": "delete_category",
+            "status": "running",
+            "progress": {"weeks_total": 12, "weeks_done": 5, "deleted": 1830},
+            "result": null,
+            "error": null,
+            ...
+        }
+    }
+    """
+    try:
+        job = job_runner.get(job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify({"job": job}), 200
+    except Exception as e:
+        logger.error(f"Get job error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+# Admin - Start a submission export
+@admin_api.route('/exports', methods=['POST'])
+@admin_required
+def start_export():
+    """
+    Admin only - Export submissions to a gzip-compressed file in the background.
+    
+    Query params: format (ndjson or csv, default ndjson), and optionally
+    class_id or week_id to export one category or week. The export shows
+    the submissions as of this request (see server/exports.py).
+    
+    Example response:
+    {
+        "message": "Export started",
+        "job_id": "job123",
+        "status_url": "/api/admin/exports/job123",
+        "download_url": "/api/admin/exports/job123/download"
+    }
+    """
+    try:
+        params = export_params(request.args.get('format', 'ndjson'),
+                               class_id=request.args.get('class_id'),
+                               week_id=request.args.get('week_id'))
+        job = job_runner.submit('export_submissions', params, created_by=get_jwt_identity())
+        return jsonify({
+            "message": "Export started",
+            "job_id": job['id'],
+            "status_url": f"/api/admin/exports/{job['id']}",
+            "download_url": f"/api/admin/exports/{job['id']}/download"
+        }), 202
+    except InvalidExport as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Start export error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+def _export_job(job_id):
+    """The export job with this ID, or None."""
+    job = job_runner.get(job_id)
+    if not job or job.get('type') != 'export_submissions':
+        return None
+    return job
+
+
+# Admin - Submission export status
+@admin_api.route('/exports/<string:job_id>', methods=['GET'])
+@admin_required
+def get_export(job_id):
+    """
+    Admin only - Get the progress of an export; download_url is set once it has finished.
+    
+    Example response:
+    {
+        "export": {
+            "id": "job123",
+            "format": "csv",
+            "status": "running",
+            "progress": {"rows": 12000, "rows_estimate": 48210, "bytes": 1048576},
+            "result": null,
+            "error": null,
+            "download_url": null
+        }
+    }
+    """
+    try:
+        job = _export_job(job_id)
+        if not job:
+            return jsonify({"error": "Export not found"}), 404
+        finished = job['status'] == 'succeeded'
+        return jsonify({"export": {
+            "id": job['id'],
+            "format": job['params']['format'],
+            "status": job['status'],
+            "progress": job.get('progress'),
+            "result": job.get('result'),
+            "error": job.get('error'),
+            "download_url": f"/api/admin/exports/{job['id']}/download" if finished else None
+        }}), 200
+    except Exception as e:
+        logger.error(f"Get export error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+# Admin - Download a finished export
+@admin_api.route('/exports/<string:job_id>/download', methods=['GET'])
+@admin_required
+def download_export(job_id):
+    """
+    Admin only - Download a finished export file (application/gzip).
+    
+    The file is sent from disk in chunks and supports Range requests, so an
+    interrupted download can be resumed. Returns 409 while the export is
+    still running.
+    """
+    try:
+        job = _export_job(job_id)
+        if not job:
+            return jsonify({"error": "Export not found"}), 404
+        if job['status'] != 'succeeded':
+            return jsonify({"error": f"Export is {job['status']}"}), 409
+        fmt = job['params']['format']
+        path = os.path.abspath(export_path(job_id, fmt))
+        if not os.path.exists(path):
+            return jsonify({"error": "Export file not found"}), 404
+        return send_file(path, mimetype='application/gzip', as_attachment=True,
+                         download_name=download_name(job_id, fmt), conditional=True)
+    except Exception as e:
+        logger.error(f"Download export error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+# Background job handlers
+@job_runner.handler('delete_week')
+def run_delete_week(job):
+    """Delete a week and its submissions. Re-running deletes whatever is left."""
+    deleted = Week.delete(job.params['week_id'])
+    return {'deleted': deleted}
+
+
+@job_runner.handler('delete_category')
+def run_delete_category(job):
+    """Delete a category week by week, checkpointing after each week."""
+    category_id = job.params['category_id']
+    deleted = job.checkpoint.get('deleted', 0)
+    weeks_done = job.checkpoint.get('weeks_done', 0)
+    # Weeks deleted before a restart are already gone from this list
+    weeks = Week.get_by_category(category_id)
+    weeks_total = weeks_done + len(weeks)
+    job.save(progress={'weeks_total': weeks_total, 'weeks_done': weeks_done, 'deleted': deleted})
+    for week in weeks:
+        deleted += Week.delete(week['id'])
+        weeks_done += 1
+        checkpoint = {'deleted': deleted, 'weeks_done': weeks_done}
+        job.save(checkpoint=checkpoint, progress={'weeks_total': weeks_total, **checkpoint})
+    deleted += Category.delete(category_id)
+    return {'deleted': deleted}
+
+
+@job_runner.handler('reconcile_stats')
+def run_reconcile_stats(job):
+    """Reconcile submission counters category by category, checkpointing after each."""
+    class_id = job.params.get('class_id')
+    category_ids = [class_id] if class_id else [c['id'] for c in Category.get_all()]
+    done = job.checkpoint.get('done', [])
+    for category_id in category_ids:
+        if category_id in done:
+            continue
+        SubmissionStats.reconcile_category(category_id)
+        done = [*done, category_id]
+        job.save(checkpoint={'done': done},
+                 progress={'categories_total': len(category_ids), 'categories_done': len(done)})
+    return {'categories': len(category_ids)}
+
+
+@job_runner.handler('export_submissions')
+def run_export_submissions(job):
+    """Write an export file page by page, checkpointing after each page."""
+    return run_export(job)
+
+
+@job_runner.cleanup('export_submissions')
+def cleanup_export_submissions(job):
+    """Remove the export file when the finished job is purged."""
+    remove_export(job)
@@ -0,0 +1,241 @@
+"""Student-by-week completion analytics for a category.
+
+The completion matrix has one row per student (by normalized name) and one
+column per week of the category. Each cell is ``MISSING``, ``ON_TIME`` or
+``LATE``, judged by the student's first submission for that week against the
+week's ``due_date`` (weeks without a due date count every submission as on
+time).
+
+A cell is on time when its earliest submission is, which is the same as any
+of its submissions being on time. So the matrix never needs the earliest
+time: each submission is compared with its week's due date and the results
+are scattered into boolean NumPy arrays. Field lookups, name rows and the
+datetime comparisons run through ``map`` over C-level callables, with no
+Python code per submission. Built matrices are cached per category. New submissions are applied incrementally; the matrix
+is rebuilt from scratch only when weeks change or a submission is edited or
+deleted (the submissions generation moves; creates do not bump it).
+"""
+from __future__ import annotations
+import operator
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import repeat
+from typing import Iterable, Optional
+
+import numpy as np
+
+from .coherence import generations
+from .storage import naive_utc
+from .models import (Week, Submission, WEEKS_COLLECTION, SUBMISSIONS_COLLECTION,
+                     normalize_student_name)
+
+# Cell states
+MISSING = 0
+ON_TIME = 1
+LATE = 2
+STATES = {MISSING: 'missing', ON_TIME: 'on_time', LATE: 'late'}
+
+_TZINFO = operator.attrgetter('tzinfo')
+
+# Incremental refreshes re-read this far behind the newest applied submission,
+# so writes that committed slightly out of order are not missed. Re-applying
+# a submission is harmless: a cell keeps its earliest time.
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+
+def to_datetime(value) -> Optional[datetime]:
+    """Naive UTC datetime for a datetime or ISO string; None if unset or unparseable."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    return naive_utc(value)
+
+
+class CompletionMatrix:
+    """Array-backed student x week completion grid for one category."""
+
+    def __init__(self, weeks: list):
+        self.weeks = sorted(weeks, key=lambda w: w.get('week_number', 0))
+        self.week_index = {week['id']: i for i, week in enumerate(self.weeks)}
+        # No due date: nothing is late. The aware copy is compared with
+        # Firestore's aware datetimes, the naive one with everything else.
+        self.due = [to_datetime(w.get('due_date')) or datetime.max for w in self.weeks]
+        self._due_aware = [due.replace(tzinfo=timezone.utc) for due in self.due]
+        self.student_index: dict[str, int] = {}
+        self.student_names: list[str] = []
+        # Raw student_name -> row (-1 for blank names), so names are normalized once
+        self.name_rows: dict = {}
+        # Whether the cell has a submission, and one at or before the due date
+        self.submitted = np.zeros((0, len(self.weeks)), dtype=bool)
+        self.on_time = np.zeros((0, len(self.weeks)), dtype=bool)
+        # Latest submitted_at applied, for incremental updates
+        self.watermark: Optional[datetime] = None
+
+    @property
+    def signature(self) -> tuple:
+        """Identity of the week columns; a change means the matrix must be rebuilt."""
+        return tuple((w['id'], w.get('week_number'), w.get('due_date')) for w in self.weeks)
+
+    def apply(self, submissions: Iterable[dict]) -> int:
+        """Fold submissions into the matrix. Returns how many landed in a known week."""
+        submissions = list(submissions)
+        week_ids = list(map(dict.get, submissions, repeat('week_id')))
+        names = list(map(dict.get, submissions, repeat('student_name')))
+        latest = list(map(dict.get, submissions, repeat('submitted_at')))
+        # Upserted submissions remember when the student first submitted
+        times = list(map(dict.get, submissions, repeat('first_submitted_at'), latest))
+        try:
+            watermark = max(filter(None, latest), default=None)
+        except TypeError:
+            # Naive and aware datetimes mixed
+            watermark = max(map(naive_utc, filter(None, latest)))
+        if watermark is not None and (self.watermark is None or watermark > self.watermark):
+            self.watermark = watermark
+        if not week_ids or not self.weeks:
+            return 0
+
+        # Normalize each distinct name once, not once per submission
+        for name in dict.fromkeys(names):
+            if name in self.name_rows:
+                continue
+            if not name:
+                self.name_rows[name] = -1
+                continue
+            key = normalize_student_name(name)
+            row = self.student_index.get(key)
+            if row is None:
+                row = self.student_index[key] = len(self.student_names)
+                self.student_names.append(' '.join(name.split()))
+            self.name_rows[name] = row
+        rows = np.fromiter(map(self.name_rows.__getitem__, names), dtype=np.int64, count=len(names))
+        cols = np.fromiter(map(self.week_index.get, week_ids, repeat(-1)), dtype=np.int64,
+                           count=len(week_ids))
+        known = (rows >= 0) & (cols >= 0)
+        if not known.any():
+            return 0
+        on_time = self._on_time(times, cols)[known]
+        rows, cols = rows[known], cols[known]
+
+        n_students = len(self.student_names)
+        capacity = self.submitted.shape[0]
+        if n_students > capacity:
+            # Grow geometrically so a stream of new students stays amortized O(1)
+            capacity = max(n_students, 2 * capacity)
+            grown_submitted = np.zeros((capacity, len(self.weeks)), dtype=bool)
+            grown_submitted[:len(self.submitted)] = self.submitted
+            self.submitted = grown_submitted
+            grown_on_time = np.zeros((capacity, len(self.weeks)), dtype=bool)
+            grown_on_time[:len(self.on_time)] = self.on_time
+            self.on_time = grown_on_time
+        self.submitted[rows, cols] = True
+        self.on_time[rows[on_time], cols[on_time]] = True
+        return int(known.sum())
+
+    def _on_time(self, times: list, cols: np.ndarray) -> np.ndarray:
+        """Whether each time is at or before its column's due date (-1 columns are ignored)."""
+        columns = cols.tolist()
+        try:
+            # All aware (Firestore) or all naive: compare the datetimes as they are
+            due = self._due_aware if any(map(_TZINFO, times)) else self.due
+            return np.fromiter(map(operator.le, times, map(due.__getitem__, columns)),
+                               dtype=bool, count=len(times))
+        except (AttributeError, TypeError):
+            # Missing times, ISO strings or a mix of naive and aware datetimes.
+            # A submission without a timestamp cannot be late.
+            times = [to_datetime(at) or datetime.min for at in times]
+            return np.fromiter(map(operator.le, times, map(self.due.__getitem__, columns)),
+                               dtype=bool, count=len(times))
+
+    def states(self) -> np.ndarray:
+        """int8 matrix of MISSING / ON_TIME / LATE, students x weeks."""
+        n_students = len(self.student_names)
+        submitted = self.submitted[:n_students]
+        on_time = self.on_time[:n_students]
+        return np.where(submitted, np.where(on_time, ON_TIME, LATE), MISSING).astype(np.int8)
+
+    def to_dict(self) -> dict:
+        """JSON-ready grid with per-week and per-student totals."""
+        states = self.states()
+        order = sorted(range(len(self.student_names)), key=lambda i: self.student_names[i].casefold())
+        states = states[order]
+        per_week = {name: (states == state).sum(axis=0).tolist() for state, name in STATES.items()}
+        per_student = {name: (states == state).sum(axis=1).tolist() for state, name in STATES.items()}
+        return {
+            'legend': STATES,
+            'weeks': [{
+                'id': week['id'],
+                'week_number': week.get('week_number'),
+                'title': week.get('title'),
+                'due_date': week.get('due_date'),
+            } for week in self.weeks],
+            'students': [self.student_names[i] for i in order],
+            'matrix': states.tolist(),
+            'week_totals': per_week,
+            'student_totals': per_student,
+        }
+
+
+class CompletionMatrixCache:
+    """Per-category completion matrices, refreshed incrementally.
+    
+    A cached matrix is rebuilt when the week columns change, when the
+    weeks or submissions generation moves (an edit or delete somewhere), or
+    after ``max_age`` seconds as a backstop when coherence is disabled.
+    """
+
+    def __init__(self, max_age: float = 600):
+        self.max_age = max_age
+        self._entries: dict[str, tuple[CompletionMatrix, tuple, float]] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._stats = {'builds': 0, 'refreshes': 0}
+
+    def _refreshed(self, category_id: str) -> CompletionMatrix:
+        weeks = Week.get_by_category(category_id)
+        generation = (generations.current(WEEKS_COLLECTION),
+                      generations.current(SUBMISSIONS_COLLECTION))
+        now = time.monotonic()
+        cached = self._entries.get(category_id)
+        if cached is not None:
+            matrix, built_generation, built_at = cached
+            if (built_generation == generation and now - built_at < self.max_age
+                    and CompletionMatrix(weeks).signature == matrix.signature):
+                if matrix.watermark is None:
+                    matrix.apply(Submission.get_by_category(category_id))
+                else:
+                    matrix.apply(Submission.get_by_category_since(
+                        category_id, matrix.watermark - REFRESH_OVERLAP))
+                self._stats['refreshes'] += 1
+                return matrix
+        matrix = CompletionMatrix(weeks)
+        matrix.apply(Submission.get_by_category(category_id))
+        self._entries[category_id] = (matrix, generation, now)
+        self._stats['builds'] += 1
+        return matrix
+
+    def get(self, category_id: str) -> dict:
+        """The category's matrix as a JSON-ready dict (see CompletionMatrix.to_dict)."""
+        with self._lock:
+            lock = self._locks.setdefault(category_id, threading.Lock())
+        # One refresh per category at a time; the matrix is mutated in place
+        with lock:
+            return self._refreshed(category_id).to_dict()
+
+    def invalidate(self, category_id: Optional[str] = None) -> None:
+        with self._lock:
+            if category_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(category_id, None)
+
+    def stats(self) -> dict:
+        return {**self._stats, 'categories': len(self._entries)}
+
+
+# Global per-worker matrix cache
+completion_matrices = CompletionMatrixCache()
@@ -1,6 +1,11 @@
 """Public API blueprint for SparkRepo with Firebase Firestore."""
 from flask import request, jsonify, Blueprint, make_response
 from .models import Category, Week, Submission
+from .catalog_mirror import catalog_mirror
+from .ingest import ingest_pipeline, IngestBacklogFull
+from .validation import submission_error
+from .streaming import stream_json, streaming_enabled
+from .pagination import InvalidCursor, encode_cursor, page_args, wants_page
 import logging
 
 logger = logging.getLogger(__name__)
@@ -8,6 +13,11 @@ logger = logging.getLogger(__name__)
 # Create a Blueprint for API routes
 api = Blueprint('api', __name__)
 
+# Submission fields anyone may see on the unauthenticated student lookup
+# (no admin_comment, modified_by or internal bookkeeping)
+PUBLIC_SUBMISSION_FIELDS = ('id', 'week_id', 'category_id', 'student_name', 'project_url',
+                            'status', 'submitted_at', 'first_submitted_at', 'version')
+
 
 # Error handling
 def handle_error(e, status_code=400):
@@ -20,7 +30,10 @@ def handle_error(e, status_code=400):
 def get_categories():
     """Returns a list of all available categories."""
     try:
-        categories = Category.get_all()
+        if catalog_mirror.ready:
+            categories = catalog_mirror.get_categories()
+        else:
+            categories = Category.get_all()
         return jsonify({'categories': categories}), 200
     except Exception as e:
         return handle_error(e, 500)
@@ -31,7 +44,10 @@ def get_categories():
 def get_category(category_id):
     """Returns details for a specific category."""
     try:
-        category = Category.get_by_id(category_id)
+        if catalog_mirror.ready:
+            category = catalog_mirror.get_category(category_id)
+        else:
+            category = Category.get_by_id(category_id)
         if not category:
             return jsonify({'error': 'Category not found'}), 404
         return jsonify(category), 200
@@ -44,6 +60,11 @@ def get_category(category_id):
 def get_category_weeks(category_id):
     """Returns all weeks for a specific category."""
     try:
+        if catalog_mirror.ready:
+            if not catalog_mirror.get_category(category_id):
+                return jsonify({'error': 'Category not found'}), 404
+            return jsonify({'weeks': catalog_mirror.get_weeks_by_category(category_id)}), 200
+
         category = Category.get_by_id(category_id)
         if not category:
             return jsonify({'error': 'Category not found'}), 404
@@ -54,12 +75,41 @@ def get_category_weeks(category_id):
         return handle_error(e, 500)
 
 
+# GET /categories/{id}/students/submissions?student_name= - One student's progress
+@api.route('/categories/<string:category_id>/students/submissions', methods=['GET'])
+def get_student_submissions(category_id):
+    """Returns one student's submissions across all weeks of a category.
+    
+    ``student_name`` is matched case-insensitively with whitespace collapsed.
+    Served from the per-student index with a single read. Only the
+    PUBLIC_SUBMISSION_FIELDS of each submission are returned.
+    """
+    try:
+        student_name = (request.args.get('student_name') or '').strip()
+        if not student_name:
+            return jsonify({'error': 'student_name is required'}), 400
+        if catalog_mirror.ready:
+            category = catalog_mirror.get_category(category_id)
+        else:
+            category = Category.get_by_id(category_id)
+        if not category:
+            return jsonify({'error': 'Category not found'}), 404
+        submissions = [{field: s[field] for field in PUBLIC_SUBMISSION_FIELDS if field in s}
+                       for s in Submission.get_by_student(category_id, student_name)]
+        return jsonify({'student_name': student_name, 'submissions': submissions}), 200
+    except Exception as e:
+        return handle_error(e, 500)
+
+
 # GET /categories/{id}/weeks/{week} - Get a specific week's assignment
 @api.route('/categories/<string:category_id>/weeks/<int:week_number>', methods=['GET'])
 def get_week_assignment(category_id, week_number):
     """Returns details for a specific week's assignment."""
     try:
-        week = Week.get_by_category_and_number(category_id, week_number)
+        if catalog_mirror.ready:
+            week = catalog_mirror.get_week_by_number(category_id, week_number)
+        else:
+            week = Week.get_by_category_and_number(category_id, week_number)
         if not week:
             return jsonify({'error': 'Week not found'}), 404
         return jsonify(week), 200
@@ -83,18 +133,28 @@ def create_submission_by_week_number(category_id, week_number):
             return jsonify({'error': 'No data provided'}), 400
         
         # Validate required fields
-        student_name = data.get('student_name')
-        project_url = data.get('project_url')
+        error = submission_error(data)
+        if error:
+            return jsonify({'error': error}), 400
+        student_name = data['student_name']
+        project_url = data['project_url']
         
-        if not student_name or not project_url:
-            return jsonify({'error': 'student_name and project_url are required'}), 400
+        if ingest_pipeline.enabled:
+            # Logged locally and acknowledged; written to the database by the flusher
+            submission = ingest_pipeline.submit(week, student_name, project_url)
+            logger.info(f"Submission accepted: {submission['id']} for week {week['id']}")
+            return jsonify({
+                'message': 'Submission received',
+                'submission': submission
+            }), 202
         
         # Create submission
         submission = Submission.create(
             week_id=week['id'],
             student_name=student_name,
             project_url=project_url,
-            status='pending'
+            status='pending',
+            category_id=week.get('category_id')
         )
         
         logger.info(f"Submission created: {submission['id']} for week {week['id']}")
@@ -103,6 +163,8 @@ def create_submission_by_week_number(category_id, week_number):
             'submission': submission
         }), 201
         
+    except IngestBacklogFull as e:
+        return handle_error(e, 503)
     except Exception as e:
         return handle_error(e, 500)
 
@@ -123,14 +185,32 @@ def get_week(week_id):
 # GET /weeks/{id}/submissions - Get all submissions for a week
 @api.route('/weeks/<string:week_id>/submissions', methods=['GET'])
 def get_week_submissions(week_id):
-    """Returns all submissions for a specific week."""
+    """Returns all submissions for a specific week.
+    
+    Pass ``limit`` and/or ``cursor`` to get one page at a time; the response
+    then includes ``next_cursor`` (null on the last page).
+    """
     try:
         week = Week.get_by_id(week_id)
         if not week:
             return jsonify({'error': 'Week not found'}), 404
         
+        if wants_page():
+            limit, start_after = page_args()
+            submissions, next_position = Submission.get_page(
+                [('week_id', '==', week_id)], limit=limit, start_after=start_after)
+            return jsonify({
+                'submissions': submissions,
+                'next_cursor': encode_cursor(next_position) if next_position else None
+            }), 200
+        
+        if streaming_enabled():
+            return stream_json('submissions', Submission.stream(filters=[('week_id', '==', week_id)]))
+        
         submissions = Submission.get_by_week(week_id)
         return jsonify({'submissions': submissions}), 200
+    except InvalidCursor as e:
+        return handle_error(e, 400)
     except Exception as e:
         return handle_error(e, 500)
 
@@ -151,18 +231,28 @@ def create_submission(week_id):
             return jsonify({'error': 'No data provided'}), 400
         
         # Validate required fields
-        student_name = data.get('student_name')
-        project_url = data.get('project_url')
+        error = submission_error(data)
+        if error:
+            return jsonify({'error': error}), 400
+        student_name = data['student_name']
+        project_url = data['project_url']
         
-        if not student_name or not project_url:
-            return jsonify({'error': 'student_name and project_url are required'}), 400
+        if ingest_pipeline.enabled:
+            # Logged locally and acknowledged; written to the database by the flusher
+            submission = ingest_pipeline.submit(week, student_name, project_url)
+            logger.info(f"Submission accepted: {submission['id']} for week {week_id}")
+            return jsonify({
+                'message': 'Submission received',
+                'submission': submission
+            }), 202
         
         # Create submission
         submission = Submission.create(
             week_id=week_id,
             student_name=student_name,
             project_url=project_url,
-            status='pending'
+            status='pending',
+            category_id=week.get('category_id')
         )
         
         logger.info(f"Submission created: {submission['id']} for week {week_id}")
@@ -171,6 +261,8 @@ def create_submission(week_id):
             'submission': submission
         }), 201
         
+    except IngestBacklogFull as e:
+        return handle_error(e, 503)
     except Exception as e:
         return handle_error(e, 500)
 
@@ -12,8 +12,16 @@ from .api import api
 from .auth import auth
 from .admin import admin_api
 from .config import get_config
-from .firebase_client import initialize_firebase
-from .models import User
+from .storage import init_backend, get_backend, AlreadyExists
+from .cache import configure_cache
+from .coherence import configure_coherence
+from .catalog_mirror import catalog_mirror
+from .jobs import configure_jobs, job_runner
+from .search import configure_search, submission_search
+from .ingest import configure_ingest, ingest_pipeline
+from .identity_map import log_reads_saved
+from .query_plans import configure_query_plans
+from .models import User, Submission, configure_models, SUBMISSIONS_COLLECTION
 
 # Setup logging
 logging.basicConfig(
@@ -36,19 +44,55 @@ def create_app(test_config=None):
     try:
         ConfigClass = get_config()
         app.config.from_object(ConfigClass)
+        if test_config:
+            app.config.update(test_config)
         logger.info(f"Configuration loaded: {ConfigClass.__name__}")
     except Exception as e:
         logger.error(f"Failed to load configuration: {e}")
         raise
 
-    # Initialize Firebase
+    # Initialize storage backend (Firestore by default)
     try:
-        initialize_firebase()
-        logger.info("Firebase initialized successfully")
+        init_backend(app.config)
+        logger.info(f"Storage backend initialized: {app.config['STORAGE_BACKEND']}")
     except Exception as e:
-        logger.error(f"Failed to initialize Firebase: {e}")
+        logger.error(f"Failed to initialize storage backend: {e}")
         raise
 
+    # Configure in-process read cache and cross-worker coherence
+    configure_coherence(app.config)
+    configure_cache(app.config)
+
+    # Model settings (submission layout)
+    configure_models(app.config)
+    configure_query_plans(app.config)
+
+    # Drop the request-scoped identity map after each request
+    app.teardown_request(log_reads_saved)
+
+    # Background services run in the server only; one-off scripts must not scan
+    # whole collections or take over WAL files and jobs from live workers
+    background = app.config.get('BACKGROUND_SERVICES', True)
+
+    # Start catalog mirror listeners (initial sync continues in the background)
+    if background and app.config.get('CATALOG_MIRROR_ENABLED'):
+        catalog_mirror.start(get_backend())
+
+    # Build the admin search index in the background and keep it refreshed
+    configure_search(app.config)
+    if background and app.config.get('SEARCH_INDEX_ENABLED'):
+        submission_search.start(Submission.stream, SUBMISSIONS_COLLECTION)
+
+    # Write-ahead-logged intake of public submissions, replaying any left unflushed
+    configure_ingest(app.config)
+    if background and app.config.get('INGEST_WAL_ENABLED'):
+        ingest_pipeline.start()
+
+    # Start background job workers (cascade deletes) and resume unfinished jobs
+    configure_jobs(app.config)
+    if background:
+        job_runner.start(app)
+
     # Configure JWT
     jwt_secret = os.environ.get('JWT_SECRET_KEY') or secrets.token_hex(32)
     app.config['JWT_SECRET_KEY'] = jwt_secret
@@ -85,7 +129,7 @@ def create_app(test_config=None):
         return jsonify({
             'message': 'SparkRepo API',
             'version': '2.0.0',
-            'database': 'Firebase Firestore',
+            'database': get_backend().display_name,
             'endpoints': {
                 'categories': '/api/categories',
                 'weeks': '/api/categories/<id>/weeks',
@@ -100,12 +144,15 @@ def create_app(test_config=None):
     def health():
         """Health check endpoint."""
         try:
-            # Test Firebase connection
-            from .firebase_client import get_firestore_client
-            db = get_firestore_client()
-            # Simple test query
-            list(db.collection('categories').limit(1).stream())
-            return jsonify({'status': 'healthy', 'database': 'connected'}), 200
+            # Test storage connection with a simple query
+            get_backend().ping()
+            return jsonify({
+                'status': 'healthy',
+                'database': 'connected',
+                'catalog_mirror': catalog_mirror.status(),
+                'search_index': submission_search.status(),
+                'ingest': ingest_pipeline.status()
+            }), 200
         except Exception as e:
             logger.error(f"Health check failed: {e}")
             return jsonify({'status': 'unhealthy', 'error': str(e)}), 500
@@ -118,13 +165,17 @@ def create_app(test_config=None):
             
             if not existing_user:
                 admin_password = app.config.get('ADMIN_PASSWORD', 'admin123')
-                User.create(
-                    username=admin_username,
-                    password=admin_password,
-                    email='admin@sparkrepo.com',
-                    is_admin=True
-                )
-                logger.info(f"Default admin user created: {admin_username}")
+                try:
+                    User.create(
+                        username=admin_username,
+                        password=admin_password,
+                        email='admin@sparkrepo.com',
+                        is_admin=True
+                    )
+                    logger.info(f"Default admin user created: {admin_username}")
+                except AlreadyExists:
+                    # Another worker booting at the same time created it
+                    logger.info(f"Admin user already exists: {admin_username}")
             else:
                 logger.info(f"Admin user already exists: {admin_username}")
         except Exception as e:
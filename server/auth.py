@@ -2,6 +2,7 @@
 from flask import Blueprint, request, jsonify, make_response
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from .models import User
+from .storage import AlreadyExists
 from datetime import timedelta
 import functools
 import logging
@@ -144,12 +145,16 @@ def create_user():
             return jsonify({"error": "Username already exists"}), 400
         
         # Create user
-        user = User.create(
-            username=data['username'],
-            password=data['password'],
-            email=data.get('email'),
-            is_admin=data.get('is_admin', False)
-        )
+        try:
+            user = User.create(
+                username=data['username'],
+                password=data['password'],
+                email=data.get('email'),
+                is_admin=data.get('is_admin', False)
+            )
+        except AlreadyExists:
+            # A concurrent request took the name after our check
+            return jsonify({"error": "Username already exists"}), 400
         
         logger.info(f"New user created: {user['username']}")
         
@@ -0,0 +1,199 @@
+"""In-process read cache for rarely changing documents.
+
+A bounded LRU shared by all collections, with a TTL per namespace and short
+negative caching for lookups that found nothing (so repeated 404s do not hit
+the database). Models invalidate entries on every write so the worker that
+made a change sees it immediately; other workers notice through the
+generation counters in ``coherence.py``.
+"""
+from __future__ import annotations
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from .singleflight import flights
+
+# Marker stored for lookups that returned None
+_MISSING = object()
+
+# Namespaces whose staleness is tracked by another collection's generation
+NAMESPACE_COLLECTIONS = {
+    'weeks_by_category': 'weeks',
+    'week_numbers': 'weeks',
+    'usernames': 'users',
+}
+
+
+class ReadCache:
+    """Thread-safe LRU cache keyed by ``(namespace, key)``."""
+
+    def __init__(self, max_entries: int = 2048, ttls: Optional[dict] = None,
+                 default_ttl: float = 300, negative_ttl: float = 30, enabled: bool = True):
+        self.max_entries = max_entries
+        self.ttls = dict(ttls or {})
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self.enabled = enabled
+        # Callable returning the current generation of a collection, if any
+        self.generation_source: Optional[Callable[[str], int]] = None
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'negative_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'stale': 0,
+            'invalidations': 0,
+        }
+
+    def _ttl(self, namespace: str, value: Any) -> float:
+        ttl = self.ttls.get(namespace, self.default_ttl)
+        if value is _MISSING:
+            return min(ttl, self.negative_ttl)
+        return ttl
+
+    def _generation(self, namespace: str) -> int:
+        if self.generation_source is None:
+            return 0
+        return self.generation_source(NAMESPACE_COLLECTIONS.get(namespace, namespace))
+
+    def lookup(self, namespace: str, key: Any, generation: Optional[int] = None) -> tuple[bool, Any]:
+        """Return ``(found, value)``; ``value`` is None for a cached miss."""
+        if not self.enabled:
+            return False, None
+        if generation is None:
+            generation = self._generation(namespace)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is None:
+                self._stats['misses'] += 1
+                return False, None
+            value, expires_at, entry_generation = entry
+            if expires_at <= now or entry_generation != generation:
+                del self._entries[(namespace, key)]
+                self._stats['expirations' if expires_at <= now else 'stale'] += 1
+                self._stats['misses'] += 1
+                return False, None
+            self._entries.move_to_end((namespace, key))
+            if value is _MISSING:
+                self._stats['negative_hits'] += 1
+                return True, None
+            self._stats['hits'] += 1
+        return True, copy.deepcopy(value)
+
+    def store(self, namespace: str, key: Any, value: Any, generation: Optional[int] = None) -> None:
+        """Cache a value; None is cached as a negative entry.
+
+        Pass the generation observed *before* loading the value, so a write
+        racing with the load leaves the entry already stale.
+        """
+        if not self.enabled:
+            return
+        if generation is None:
+            generation = self._generation(namespace)
+        if value is None:
+            value = _MISSING
+        else:
+            value = copy.deepcopy(value)
+        expires_at = time.monotonic() + self._ttl(namespace, value)
+        with self._lock:
+            self._entries[(namespace, key)] = (value, expires_at, generation)
+            self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def get_or_load(self, namespace: str, key: Any, loader: Callable[[], Any]) -> Any:
+        """Return the cached value, calling ``loader`` and caching on a miss."""
+        if not self.enabled:
+            return loader()
+        generation = self._generation(namespace)
+        found, value = self.lookup(namespace, key, generation)
+        if found:
+            return value
+        # Concurrent misses for the same key share one load.
+        value = flights.do(('cache', namespace, key), loader)
+        self.store(namespace, key, value, generation)
+        return copy.deepcopy(value)
+
+    def get_many_or_load(self, namespace: str, keys, loader: Callable[[list], dict]) -> dict:
+        """Return ``{key: value}`` for found keys, loading all misses in one call.
+
+        ``loader`` receives the list of uncached keys and returns a dict of
+        the ones that exist; the rest are cached as negative entries.
+        """
+        keys = list(dict.fromkeys(k for k in keys if k))
+        if not self.enabled:
+            return loader(keys) if keys else {}
+        generation = self._generation(namespace)
+        result, missing = {}, []
+        for key in keys:
+            found, value = self.lookup(namespace, key, generation)
+            if not found:
+                missing.append(key)
+            elif value is not None:
+                result[key] = value
+        if missing:
+            loaded = loader(missing)
+            for key in missing:
+                self.store(namespace, key, loaded.get(key), generation)
+                if key in loaded:
+                    result[key] = loaded[key]
+        return result
+
+    def invalidate(self, namespace: str, key: Any = None) -> None:
+        """Drop one entry, or every entry in ``namespace`` when key is None."""
+        with self._lock:
+            if key is not None:
+                if self._entries.pop((namespace, key), None) is not None:
+                    self._stats['invalidations'] += 1
+                return
+            stale = [k for k in self._entries if k[0] == namespace]
+            for k in stale:
+                del self._entries[k]
+            self._stats['invalidations'] += len(stale)
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return hit/miss/eviction counters and the current size."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        stats['max_entries'] = self.max_entries
+        stats['enabled'] = self.enabled
+        return stats
+
+
+# Global read cache, reconfigured from app config at startup
+read_cache = ReadCache()
+
+
+def configure_cache(config) -> ReadCache:
+    """Apply cache settings from a Flask config mapping."""
+    read_cache.enabled = config.get('CACHE_ENABLED', True)
+    read_cache.max_entries = config.get('CACHE_MAX_ENTRIES', 2048)
+    read_cache.negative_ttl = config.get('CACHE_NEGATIVE_TTL', 30)
+    read_cache.ttls = {
+        'categories': config.get('CACHE_TTL_CATEGORIES', 3600),
+        'weeks': config.get('CACHE_TTL_WEEKS', 3600),
+        'weeks_by_category': config.get('CACHE_TTL_WEEKS', 3600),
+        'week_numbers': config.get('CACHE_TTL_WEEKS', 3600),
+        'users': config.get('CACHE_TTL_USERS', 60),
+        'usernames': config.get('CACHE_TTL_USERS', 60),
+    }
+    if config.get('COHERENCE_ENABLED', True):
+        from .coherence import generations
+        read_cache.generation_source = generations.current
+    else:
+        read_cache.generation_source = None
+    read_cache.clear()
+    return read_cache
@@ -0,0 +1,133 @@
+"""Live in-memory mirror of the categories and weeks collections.
+
+When ``CATALOG_MIRROR_ENABLED`` is set, each worker subscribes to both
+collections with snapshot listeners and serves the public catalog endpoints
+from memory. Until the first snapshot of both collections has arrived the
+mirror reports itself as not ready and callers fall back to the models.
+
+Listeners run on background threads, so the mirror must be started after
+gunicorn forks its workers (i.e. without ``--preload``).
+"""
+from __future__ import annotations
+import logging
+import threading
+from typing import Optional
+
+from .models import CATEGORIES_COLLECTION, WEEKS_COLLECTION
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogMirror:
+    """Snapshot-listener-fed copy of categories and weeks."""
+
+    def __init__(self):
+        self._categories: dict[str, dict] = {}
+        self._weeks: dict[str, dict] = {}
+        self._weeks_by_category: dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._synced = {CATEGORIES_COLLECTION: threading.Event(), WEEKS_COLLECTION: threading.Event()}
+        self._watches = []
+        self.enabled = False
+
+    @property
+    def ready(self) -> bool:
+        """True once the initial sync of both collections has completed."""
+        return self.enabled and all(event.is_set() for event in self._synced.values())
+
+    def start(self, backend) -> bool:
+        """Subscribe to both collections; return False if unsupported."""
+        self.stop()
+        try:
+            self._watches = [
+                backend.watch(CATEGORIES_COLLECTION, self._on_categories),
+                backend.watch(WEEKS_COLLECTION, self._on_weeks),
+            ]
+        except NotImplementedError as e:
+            logger.warning(f"Catalog mirror disabled: {e}")
+            self.stop()
+            return False
+        self.enabled = True
+        logger.info("Catalog mirror listeners started")
+        return True
+
+    def stop(self) -> None:
+        """Unsubscribe listeners and drop mirrored data."""
+        for watch in self._watches:
+            try:
+                watch.unsubscribe()
+            except Exception as e:
+                logger.warning(f"Failed to stop catalog listener: {e}")
+        self._watches = []
+        self.enabled = False
+        with self._lock:
+            self._categories = {}
+            self._weeks = {}
+            self._weeks_by_category = {}
+        for event in self._synced.values():
+            event.clear()
+
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until the initial sync completes or ``timeout`` elapses."""
+        for event in self._synced.values():
+            if not event.wait(timeout):
+                return False
+        return self.enabled
+
+    def _on_categories(self, upserted: list, removed: list) -> None:
+        with self._lock:
+            categories = dict(self._categories)
+            for doc in upserted:
+                categories[doc['id']] = doc
+            for doc_id in removed:
+                categories.pop(doc_id, None)
+            self._categories = categories
+        self._synced[CATEGORIES_COLLECTION].set()
+
+    def _on_weeks(self, upserted: list, removed: list) -> None:
+        with self._lock:
+            weeks = dict(self._weeks)
+            for doc in upserted:
+                weeks[doc['id']] = doc
+            for doc_id in removed:
+                weeks.pop(doc_id, None)
+            by_category: dict[str, list] = {}
+            for week in weeks.values():
+                by_category.setdefault(week.get('category_id'), []).append(week)
+            for week_list in by_category.values():
+                week_list.sort(key=lambda w: w.get('week_number', 0))
+            self._weeks = weeks
+            self._weeks_by_category = by_category
+        self._synced[WEEKS_COLLECTION].set()
+
+    def get_categories(self) -> list:
+        """All categories ordered by name."""
+        categories = [dict(c) for c in self._categories.values() if 'name' in c]
+        return sorted(categories, key=lambda c: c['name'])
+
+    def get_category(self, category_id: str) -> Optional[dict]:
+        category = self._categories.get(category_id)
+        return dict(category) if category else None
+
+    def get_weeks_by_category(self, category_id: str) -> list:
+        """Weeks of a category ordered by week number."""
+        return [dict(w) for w in self._weeks_by_category.get(category_id, [])]
+
+    def get_week_by_number(self, category_id: str, week_number: int) -> Optional[dict]:
+        for week in self._weeks_by_category.get(category_id, []):
+            if week.get('week_number') == week_number:
+                return dict(week)
+        return None
+
+    def status(self) -> dict:
+        """Readiness and size summary for health checks."""
+        return {
+            'enabled': self.enabled,
+            'ready': self.ready,
+            'categories': len(self._categories),
+            'weeks': len(self._weeks),
+        }
+
+
+# Global catalog mirror, started from create_app when enabled
+catalog_mirror = CatalogMirror()
@@ -0,0 +1,73 @@
+"""Cross-worker cache coherence through per-collection generation counters.
+
+Every model write bumps ``_generations/{collection}``. Each worker remembers
+the last generation it saw and re-reads the counter at most once per
+``COHERENCE_CHECK_INTERVAL`` seconds, so a cache entry written under an older
+generation is dropped within that window after a write on any worker,
+without flushing the rest of the cache.
+"""
+from __future__ import annotations
+import logging
+import threading
+import time
+
+from .storage import get_backend
+
+logger = logging.getLogger(__name__)
+
+GENERATIONS_COLLECTION = '_generations'
+
+
+class GenerationTracker:
+    """Caches the generation of each collection for a short interval."""
+
+    def __init__(self, check_interval: float = 5.0, enabled: bool = True):
+        self.check_interval = check_interval
+        self.enabled = enabled
+        self._known: dict[str, tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def current(self, collection: str) -> int:
+        """Return the collection's generation, re-reading it when due."""
+        if not self.enabled:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            generation, checked_at = self._known.get(collection, (0, None))
+        if checked_at is not None and now - checked_at < self.check_interval:
+            return generation
+        try:
+            doc = get_backend().get(GENERATIONS_COLLECTION, collection)
+            generation = int(doc.get('generation', 0)) if doc else 0
+        except Exception as e:
+            # Keep serving the last known generation if the check fails.
+            logger.warning(f"Generation check failed for {collection}: {e}")
+        with self._lock:
+            self._known[collection] = (generation, now)
+        return generation
+
+    def bump(self, collection: str) -> None:
+        """Record a write to ``collection`` so other workers drop stale entries."""
+        if not self.enabled:
+            return
+        get_backend().increment(GENERATIONS_COLLECTION, collection, {'generation': 1})
+        with self._lock:
+            # Force the next read on this worker to pick up the new value.
+            generation, _ = self._known.get(collection, (0, None))
+            self._known[collection] = (generation, None)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._known.clear()
+
+
+# Global generation tracker, configured from app config at startup
+generations = GenerationTracker()
+
+
+def configure_coherence(config) -> GenerationTracker:
+    """Apply coherence settings from a Flask config mapping."""
+    generations.enabled = config.get('COHERENCE_ENABLED', True)
+    generations.check_interval = config.get('COHERENCE_CHECK_INTERVAL', 5)
+    generations.reset()
+    return generations
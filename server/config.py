@@ -22,6 +22,84 @@ class BaseConfig:
     FIREBASE_SERVICE_ACCOUNT_KEY: Optional[str] = os.getenv("FIREBASE_SERVICE_ACCOUNT_KEY")
     FIREBASE_SERVICE_ACCOUNT_PATH: Optional[str] = os.getenv("FIREBASE_SERVICE_ACCOUNT_PATH", "serviceAccountKey.json")
     
+    # Storage backend ('firestore', 'sqlite' or 'memory')
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "firestore")
+    SQLITE_PATH: str = os.getenv("SQLITE_PATH", "sparkrepo.db")
+    
+    # Read cache (seconds)
+    CACHE_ENABLED: bool = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+    CACHE_MAX_ENTRIES: int = int(os.getenv("CACHE_MAX_ENTRIES", "2048"))
+    CACHE_TTL_CATEGORIES: int = int(os.getenv("CACHE_TTL_CATEGORIES", "3600"))
+    CACHE_TTL_WEEKS: int = int(os.getenv("CACHE_TTL_WEEKS", "3600"))
+    CACHE_TTL_USERS: int = int(os.getenv("CACHE_TTL_USERS", "60"))
+    CACHE_NEGATIVE_TTL: int = int(os.getenv("CACHE_NEGATIVE_TTL", "30"))
+    
+    # Cross-worker cache coherence: re-check collection generations this often (seconds)
+    COHERENCE_ENABLED: bool = os.getenv("COHERENCE_ENABLED", "true").lower() == "true"
+    COHERENCE_CHECK_INTERVAL: int = int(os.getenv("COHERENCE_CHECK_INTERVAL", "5"))
+    
+    # Send unpaginated list responses (admin weeks/submissions, week submissions)
+    # as chunked JSON encoded while the documents are read
+    STREAM_LIST_RESPONSES: bool = os.getenv("STREAM_LIST_RESPONSES", "true").lower() == "true"
+    
+    # Cursor pagination bounds for list endpoints
+    PAGE_SIZE_DEFAULT: int = int(os.getenv("PAGE_SIZE_DEFAULT", "50"))
+    PAGE_SIZE_MAX: int = int(os.getenv("PAGE_SIZE_MAX", "200"))
+    
+    # Start the background services below (catalog mirror, search index, ingest
+    # flusher, job workers); the scripts in server/scripts turn this off
+    BACKGROUND_SERVICES: bool = os.getenv("BACKGROUND_SERVICES", "true").lower() == "true"
+
+    # Serve public catalog reads from a snapshot-listener mirror (Firestore only)
+    CATALOG_MIRROR_ENABLED: bool = os.getenv("CATALOG_MIRROR_ENABLED", "false").lower() == "true"
+    
+    # Submission layout: 'flat', 'nested' (weeks/{id}/submissions) or 'dual' (migration)
+    SUBMISSIONS_LAYOUT: str = os.getenv("SUBMISSIONS_LAYOUT", "flat")
+    # One submission per student and week; resubmissions move the old version to history
+    SUBMISSIONS_UPSERT: bool = os.getenv("SUBMISSIONS_UPSERT", "false").lower() == "true"
+    
+    # Query shapes (see query_plans.py) whose Firestore composite indexes are
+    # deployed, comma-separated, or "all"; the rest sort in Python
+    FIRESTORE_INDEXES: str = os.getenv("FIRESTORE_INDEXES", "")
+    
+    # Spread submission index writes over this many shards (a "shard" field
+    # prefixing the submitted_at indexes; reads merge the shards); 0 = off
+    SUBMISSION_SHARDS: int = int(os.getenv("SUBMISSION_SHARDS", "0"))
+    
+    # Shard documents per submission counter (more shards = more write throughput)
+    COUNTER_SHARDS: int = int(os.getenv("COUNTER_SHARDS", "4"))
+    
+    # Background jobs (cascade deletes): worker threads per process, and how long
+    # a job may go without a heartbeat before another worker resumes it (seconds)
+    JOBS_WORKERS: int = int(os.getenv("JOBS_WORKERS", "2"))
+    JOBS_STALE_AFTER: int = int(os.getenv("JOBS_STALE_AFTER", "300"))
+    JOBS_RECOVERY_INTERVAL: int = int(os.getenv("JOBS_RECOVERY_INTERVAL", "60"))
+    # Days finished jobs (and their export files) are kept; 0 = keep forever
+    JOBS_RETENTION_DAYS: int = int(os.getenv("JOBS_RETENTION_DAYS", "7"))
+    
+    # Directory for submission export files (on disk shared by all workers
+    # when exports should be downloadable from any of them)
+    EXPORT_DIR: str = os.getenv("EXPORT_DIR", "exports")
+    
+    # Public submissions go through a local fsync'd write-ahead log and are
+    # group-committed in batches of up to INGEST_BATCH_SIZE, at most
+    # INGEST_MAX_DELAY_MS after the first; beyond INGEST_MAX_PENDING unflushed
+    # entries new submissions get 503
+    INGEST_WAL_ENABLED: bool = os.getenv("INGEST_WAL_ENABLED", "false").lower() == "true"
+    INGEST_WAL_DIR: str = os.getenv("INGEST_WAL_DIR", "ingest-wal")
+    INGEST_BATCH_SIZE: int = int(os.getenv("INGEST_BATCH_SIZE", "100"))
+    INGEST_MAX_DELAY_MS: int = int(os.getenv("INGEST_MAX_DELAY_MS", "50"))
+    INGEST_MAX_PENDING: int = int(os.getenv("INGEST_MAX_PENDING", "10000"))
+    
+    # In-memory admin search index: documents kept per worker, catch-up interval
+    # for other workers' submissions, and minimum time between full rebuilds (seconds).
+    # Off by default: every worker scans all submissions on startup and again
+    # after edits elsewhere (about 15s and 120 MB per worker at 100k submissions)
+    SEARCH_INDEX_ENABLED: bool = os.getenv("SEARCH_INDEX_ENABLED", "false").lower() == "true"
+    SEARCH_MAX_DOCUMENTS: int = int(os.getenv("SEARCH_MAX_DOCUMENTS", "200000"))
+    SEARCH_REFRESH_INTERVAL: int = int(os.getenv("SEARCH_REFRESH_INTERVAL", "30"))
+    SEARCH_REBUILD_INTERVAL: int = int(os.getenv("SEARCH_REBUILD_INTERVAL", "600"))
+    
     # JWT
     JWT_SECRET: str = os.getenv("JWT_SECRET", "dev-jwt-secret")
     JWT_ALGORITHM: str = "HS256"
@@ -70,6 +148,7 @@ class TestingConfig(BaseConfig):
     TESTING = True
     DEBUG = True
     LOG_LEVEL = "DEBUG"
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "memory")
 
 
 # Configuration dictionary
@@ -0,0 +1,192 @@
+"""Background export of submissions to gzip-compressed NDJSON or CSV files.
+
+An export runs as a background job (see jobs.py) and reads the submissions
+newest first, one page of ``PAGE_SIZE`` at a time, as of the moment it was
+requested: on Firestore every page is read with ``read_time`` set to that
+moment, so submissions created, changed or deleted while the export runs
+do not show up in it. Point-in-time reads only reach back one hour (seven
+days with point-in-time recovery enabled), so an export that is resumed
+after that fails and has to be started again. Backends without point-in-time
+reads (SQLite, memory) skip submissions newer than the export instead, but
+still show later changes to older ones.
+
+Each page is compressed as a separate gzip member and appended to a
+``.part`` file in ``EXPORT_DIR``; members concatenate into a valid gzip
+stream. After each page the file is fsync'd and the job checkpoints the
+file size and the page cursor, so a resumed job truncates whatever was
+written after the last checkpoint and carries on from there. The finished
+file is renamed into place and served from disk (with Range support) by
+the admin download endpoint. The file is deleted together with its job,
+``JOBS_RETENTION_DAYS`` after the export finished (see ``remove_export``).
+
+CSV files have the columns of ``CSV_COLUMNS``; they include the columns
+the CSV import reads, so an export can be imported elsewhere. NDJSON files
+have one submission document per line plus its ``week_number``. Datetimes
+are ISO 8601, UTC.
+"""
+from __future__ import annotations
+import csv
+import gzip
+import io
+import json
+import os
+from datetime import datetime
+from typing import Optional
+
+from flask import current_app
+
+from .models import Category, Week, Submission, SubmissionStats
+from .pagination import decode_cursor, encode_cursor
+from .storage import get_backend, naive_utc
+
+FORMATS = ('ndjson', 'csv')
+# Submissions read (and compressed as one gzip member) at a time
+PAGE_SIZE = 1000
+COMPRESS_LEVEL = 6
+
+CSV_COLUMNS = ('id', 'category_id', 'week_id', 'week_number', 'student_name', 'project_url',
+               'status', 'admin_comment', 'submitted_at', 'first_submitted_at', 'version',
+               'modified_by')
+
+
+class InvalidExport(Exception):
+    """Raised for an export request that cannot be run (e.g. an unknown format)."""
+
+
+def export_params(fmt: str, class_id: Optional[str] = None, week_id: Optional[str] = None,
+                  read_time: Optional[datetime] = None) -> dict:
+    """Validate an export request and build its job params."""
+    if fmt not in FORMATS:
+        raise InvalidExport(f"format must be one of: {', '.join(FORMATS)}")
+    filters = []
+    if class_id:
+        filters.append(['category_id', '==', class_id])
+    if week_id:
+        filters.append(['week_id', '==', week_id])
+    return {
+        'format': fmt,
+        'filters': filters,
+        'read_time': (read_time or datetime.utcnow()).isoformat(),
+    }
+
+
+def export_path(job_id: str, fmt: str) -> str:
+    """Path of a finished export file."""
+    return os.path.join(current_app.config.get('EXPORT_DIR', 'exports'),
+                        f"submissions-{job_id}.{fmt}.gz")
+
+
+def download_name(job_id: str, fmt: str) -> str:
+    return f"submissions-{job_id}.{fmt}.gz"
+
+
+def remove_export(job_doc: dict) -> None:
+    """Delete an export job's file (finished or partial) before the job itself is purged."""
+    path = export_path(job_doc['id'], job_doc['params']['format'])
+    for p in (path, path + '.part'):
+        try:
+            os.remove(p)
+        except FileNotFoundError:
+            pass
+
+
+def run_export(job) -> dict:
+    """Job handler body: write the export file, checkpointing after each page."""
+    fmt = job.params['format']
+    filters = [tuple(f) for f in job.params.get('filters', [])]
+    read_time = datetime.fromisoformat(job.params['read_time'])
+    path = export_path(job.id, fmt)
+    part_path = path + '.part'
+    checkpoint = job.checkpoint
+
+    if checkpoint.get('done') and os.path.exists(path):
+        return _result(path, checkpoint, read_time)
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    rows = checkpoint.get('rows', 0)
+    offset = checkpoint.get('bytes', 0)
+    cursor = checkpoint.get('cursor')
+    if offset and (not os.path.exists(part_path) or os.path.getsize(part_path) < offset):
+        # The partial file is gone (e.g. resumed on another host): start over
+        rows, offset, cursor = 0, 0, None
+    if not offset:
+        cursor = None
+
+    point_in_time = get_backend().supports_read_time
+    estimate = _estimate(filters)
+    start_after = decode_cursor(cursor) if cursor else None
+    weeks = {}
+    with open(part_path, 'r+b' if offset else 'wb') as f:
+        f.truncate(offset)
+        f.seek(offset)
+        while True:
+            page, position = Submission.get_page(filters, limit=PAGE_SIZE, start_after=start_after,
+                                                 read_time=read_time if point_in_time else None)
+            if not point_in_time:
+                page = [s for s in page if s.get('submitted_at') is None
+                        or naive_utc(s['submitted_at']) <= read_time]
+            missing = {s['week_id'] for s in page if s.get('week_id') and s['week_id'] not in weeks}
+            if missing:
+                weeks.update(Week.get_many(list(missing)))
+            chunk = _encode(fmt, page, weeks, header=not offset and not rows)
+            if chunk:
+                f.write(gzip.compress(chunk, compresslevel=COMPRESS_LEVEL))
+                f.flush()
+                os.fsync(f.fileno())
+            rows += len(page)
+            offset = f.tell()
+            done = position is None
+            cursor = encode_cursor(position) if position else None
+            checkpoint = {'rows': rows, 'bytes': offset, 'cursor': cursor, 'done': done}
+            job.save(checkpoint=checkpoint,
+                     progress={'rows': rows, 'rows_estimate': estimate, 'bytes': offset})
+            if done:
+                break
+            start_after = position
+
+    os.replace(part_path, path)
+    return _result(path, checkpoint, read_time)
+
+
+def _result(path, checkpoint, read_time):
+    return {
+        'rows': checkpoint['rows'],
+        'bytes': checkpoint['bytes'],
+        'file': os.path.basename(path),
+        'read_time': read_time.isoformat(),
+    }
+
+
+def _estimate(filters) -> int:
+    """Expected row count from the submission counters, for progress reporting."""
+    fields = dict((field, value) for field, _, value in filters)
+    if 'week_id' in fields:
+        return SubmissionStats.for_weeks([fields['week_id']])[fields['week_id']]['total']
+    if 'category_id' in fields:
+        return SubmissionStats.for_categories([fields['category_id']])[fields['category_id']]['total']
+    counts = SubmissionStats.for_categories([c['id'] for c in Category.get_all()])
+    return sum(c['total'] for c in counts.values())
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return naive_utc(value).isoformat()
+    return value
+
+
+def _encode(fmt, page, weeks, header=False) -> bytes:
+    """Encode one page of submissions as NDJSON lines or CSV rows."""
+    records = []
+    for submission in page:
+        week = weeks.get(submission.get('week_id'))
+        record = {key: _plain(value) for key, value in submission.items()}
+        record['week_number'] = week.get('week_number') if week else None
+        records.append(record)
+    if fmt == 'ndjson':
+        return ''.join(json.dumps(r, default=str) + '\n' for r in records).encode()
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+    if header:
+        writer.writeheader()
+    writer.writerows(records)
+    return out.getvalue().encode()
@@ -0,0 +1,84 @@
+"""Request-scoped identity map for document reads.
+
+Within one request, each document is fetched at most once: model getters
+consult the map on ``flask.g`` before going to the cache or the backend, and
+model writers keep it up to date. Outside a request (scripts, background
+threads) the map is bypassed.
+"""
+from __future__ import annotations
+import copy
+import logging
+from typing import Any, Callable, Optional
+
+from flask import g, has_request_context
+
+logger = logging.getLogger(__name__)
+
+
+class IdentityMap:
+    """Documents already read (or written) in the current request."""
+
+    def __init__(self):
+        self.documents: dict[tuple[str, str], Optional[dict]] = {}
+        self.reads_saved = 0
+
+
+def _current() -> Optional[IdentityMap]:
+    if not has_request_context():
+        return None
+    if 'identity_map' not in g:
+        g.identity_map = IdentityMap()
+    return g.identity_map
+
+
+def get_or_load(collection: str, doc_id: str, loader: Callable[[], Any]) -> Any:
+    """Return the request's copy of a document, loading it on first access."""
+    identity_map = _current()
+    if identity_map is None:
+        return loader()
+    key = (collection, doc_id)
+    if key in identity_map.documents:
+        identity_map.reads_saved += 1
+        return copy.deepcopy(identity_map.documents[key])
+    document = loader()
+    identity_map.documents[key] = copy.deepcopy(document)
+    return document
+
+
+def put(collection: str, doc_id: str, document: Optional[dict]) -> None:
+    """Record a document just written (None for a deleted document)."""
+    identity_map = _current()
+    if identity_map is not None:
+        identity_map.documents[(collection, doc_id)] = copy.deepcopy(document)
+
+
+def merge(collection: str, doc_id: str, fields: dict) -> None:
+    """Apply an update to the mapped document, if this request has read it."""
+    identity_map = _current()
+    if identity_map is None:
+        return
+    document = identity_map.documents.get((collection, doc_id))
+    if document is not None:
+        document.update(copy.deepcopy(fields))
+
+
+def forget(collection: str, doc_id: str) -> None:
+    """Drop a document so the next access reads it again."""
+    identity_map = _current()
+    if identity_map is not None:
+        identity_map.documents.pop((collection, doc_id), None)
+
+
+def clear() -> None:
+    """Drop every mapped document, e.g. between chunks of a bulk import."""
+    identity_map = _current()
+    if identity_map is not None:
+        identity_map.documents.clear()
+
+
+def log_reads_saved(exc=None) -> None:
+    """Teardown hook: report how many reads the map saved for this request."""
+    identity_map = g.pop('identity_map', None)
+    if identity_map is not None and identity_map.reads_saved:
+        logger.debug(f"Identity map saved {identity_map.reads_saved} document reads "
+                     f"({len(identity_map.documents)} documents loaded)")
@@ -0,0 +1,380 @@
+"""Streaming CSV import of weeks and submissions.
+
+Rows are read one at a time and handled in chunks of ``CHUNK_ROWS``. The
+week (or category) references of a chunk are resolved with one batched
+read, valid rows are written in batched commits, and rows that cannot be
+imported are reported by row number (the header is row 1). Memory use
+depends on the chunk size and the number of distinct weeks, not on the size
+of the file.
+
+Rows are checked with the same rules as the JSON endpoints (see
+validation.py); an empty cell counts as a missing value. Columns other than
+those below are ignored and listed in the report.
+
+Submission files have ``student_name`` and ``project_url`` columns and name
+the week either by ``week_id`` or by ``category_id`` plus ``week_number``.
+Optional ``status`` and ``submitted_at`` (ISO 8601, UTC) columns carry over
+review state and history from another tool.
+
+Week files have ``category_id``, ``week_number`` and ``title`` columns and
+optionally ``display_name``, ``description``, ``assignment_url``,
+``due_date`` and ``is_active``.
+"""
+from __future__ import annotations
+import codecs
+import csv
+import itertools
+from datetime import datetime, timezone
+from typing import Callable, Iterable, Iterator, Optional
+
+from . import identity_map
+from .cache import read_cache
+from .coherence import generations
+from .models import (Category, Week, Submission, new_submission_id, week_number_key,
+                     SUBMISSION_STATUSES, OPS_PER_SUBMISSION, WEEKS_COLLECTION, WEEKS_BY_CATEGORY,
+                     WEEK_NUMBERS_COLLECTION)
+from .storage import get_backend, AlreadyExists, MAX_BATCH_SIZE
+from .validation import submission_error, week_error
+
+# Rows read, validated and resolved together
+CHUNK_ROWS = 500
+# Row errors listed in a report; beyond this they are only counted
+MAX_REPORTED_ERRORS = 1000
+
+SUBMISSION_COLUMNS = ('week_id', 'category_id', 'week_number', 'student_name', 'project_url',
+                      'status', 'submitted_at')
+WEEK_COLUMNS = ('category_id', 'week_number', 'title', 'display_name', 'description',
+                'assignment_url', 'due_date', 'is_active')
+
+# Operations Week.create adds to a batch (week and week_numbers entry)
+OPS_PER_WEEK = 2
+
+
+class InvalidImport(Exception):
+    """Raised when a file cannot be imported at all (empty, or missing columns)."""
+
+
+class ImportReport:
+    """Row counts and the first MAX_REPORTED_ERRORS row errors of an import."""
+
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.failed = 0
+        self.errors: list[dict] = []
+        self.ignored_columns: list[str] = []
+
+    def fail(self, row: int, error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row, 'error': error})
+
+    def to_dict(self) -> dict:
+        return {
+            'rows': self.rows,
+            'imported': self.imported,
+            'failed': self.failed,
+            'errors': sorted(self.errors, key=lambda error: error['row']),
+            'errors_truncated': self.failed > len(self.errors),
+            'ignored_columns': self.ignored_columns,
+        }
+
+
+def decode_lines(stream) -> Iterator[str]:
+    """Text lines of a binary upload, decoded as UTF-8 (with or without a BOM)."""
+    return codecs.iterdecode(stream, 'utf-8-sig')
+
+
+def read_csv(lines: Iterable[str], columns: tuple, report: ImportReport,
+             required: Callable[[set], Optional[str]]) -> Iterator[tuple]:
+    """Yield ``(row_number, row)`` with a dict of the non-empty known cells of each row.
+
+    ``required`` gets the header's known columns and returns why they are not
+    enough, or None. A row that cannot be decoded ends the file and yields
+    ``(row_number, None)`` after recording the error.
+    """
+    reader = csv.reader(lines)
+    try:
+        header = next(reader, None)
+    except (csv.Error, UnicodeDecodeError) as e:
+        raise InvalidImport(f"Could not read the header row: {e}")
+    if header is None:
+        raise InvalidImport("The file is empty")
+    header = [name.strip().lower() for name in header]
+    known = set(header) & set(columns)
+    error = required(known)
+    if error:
+        raise InvalidImport(error)
+    report.ignored_columns = [name for name in header if name and name not in known]
+    number = 1
+    try:
+        for values in reader:
+            number += 1
+            if not any(value.strip() for value in values):
+                continue
+            report.rows += 1
+            yield number, {name: value.strip() for name, value in zip(header, values)
+                           if name in known and value.strip()}
+    except (csv.Error, UnicodeDecodeError) as e:
+        report.rows += 1
+        report.fail(number + 1, f"Could not read the row, import stopped: {e}")
+        yield number + 1, None
+
+
+def _chunks(rows: Iterable, size: int) -> Iterator[list]:
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _parse_int(value: str, field: str) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{field} must be a whole number")
+
+
+def _parse_bool(value: str, field: str) -> bool:
+    if value.lower() in ('true', 'yes', '1'):
+        return True
+    if value.lower() in ('false', 'no', '0'):
+        return False
+    raise ValueError(f"{field} must be true or false")
+
+
+def _parse_datetime(value: str, field: str) -> datetime:
+    """ISO 8601 timestamp as a naive UTC datetime, like the ones the models write."""
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"{field} must be an ISO 8601 date and time")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+class _BatchWriter:
+    """Adds rows to write batches, commits them and reports rows that fail.
+
+    A batch is committed before it could exceed MAX_BATCH_SIZE, and before a
+    row writes a key already in it (a resubmission reads the version it
+    replaces, so that version must be committed first). If a commit fails,
+    its rows are retried one at a time to find the ones at fault.
+    ``committed``, if given, receives what the writes returned for the rows
+    of each successful commit.
+    """
+
+    def __init__(self, report: ImportReport, ops_per_row: int, duplicate_error: str,
+                 committed: Optional[Callable[[list], None]] = None):
+        self.report = report
+        self.ops_per_row = ops_per_row
+        self.duplicate_error = duplicate_error
+        self.committed = committed
+        self._start()
+
+    def _start(self) -> None:
+        self.batch = get_backend().batch()
+        self.rows: list[tuple[int, Callable]] = []
+        self.written: list = []
+        self.keys: set = set()
+
+    def add(self, row: int, key, write: Callable) -> None:
+        """Queue ``write(batch)`` for a row."""
+        if key in self.keys or len(self.batch) > MAX_BATCH_SIZE - self.ops_per_row:
+            self.flush()
+        self.written.append(write(self.batch))
+        self.rows.append((row, write))
+        self.keys.add(key)
+
+    def flush(self) -> None:
+        if not self.rows:
+            return
+        try:
+            self.batch.commit()
+            self.report.imported += len(self.rows)
+            self._committed(self.written)
+        except Exception:
+            for row, write in self.rows:
+                batch = get_backend().batch()
+                try:
+                    written = write(batch)
+                    batch.commit()
+                    self.report.imported += 1
+                    self._committed([written])
+                except AlreadyExists:
+                    self.report.fail(row, self.duplicate_error)
+                except Exception as e:
+                    self.report.fail(row, str(e))
+        self._start()
+
+    def _committed(self, written: list) -> None:
+        if self.committed is not None:
+            self.committed(written)
+
+
+def _require_submission_columns(columns: set) -> Optional[str]:
+    if not {'student_name', 'project_url'} <= columns:
+        return "Missing required columns: student_name and project_url"
+    if 'week_id' not in columns and not {'category_id', 'week_number'} <= columns:
+        return "Missing required columns: week_id, or category_id and week_number"
+    return None
+
+
+def _parse_submission(row: dict) -> dict:
+    error = submission_error(row)
+    if error:
+        raise ValueError(error)
+    if 'week_id' in row:
+        week_ref = row['week_id']
+    elif 'category_id' in row and 'week_number' in row:
+        week_ref = (row['category_id'], _parse_int(row['week_number'], 'week_number'))
+    else:
+        raise ValueError("week_id, or category_id and week_number, are required")
+    status = row.get('status', 'pending').lower()
+    if status not in SUBMISSION_STATUSES:
+        raise ValueError(f"status must be one of: {', '.join(SUBMISSION_STATUSES)}")
+    submitted_at = row.get('submitted_at')
+    return {
+        'week_ref': week_ref,
+        'student_name': row['student_name'],
+        'project_url': row['project_url'],
+        'status': status,
+        'submitted_at': _parse_datetime(submitted_at, 'submitted_at') if submitted_at else None,
+    }
+
+
+def import_submissions(lines: Iterable[str], chunk_rows: int = CHUNK_ROWS) -> dict:
+    """Import submissions from CSV text lines. Returns the report as a dict.
+
+    Raises InvalidImport if the file has no header or lacks required columns.
+    """
+    report = ImportReport()
+    writer = _BatchWriter(report, OPS_PER_SUBMISSION, "Submission already exists",
+                          committed=Submission.add_to_search)
+    # Week references seen so far -> week (None if it does not exist)
+    weeks: dict = {}
+    rows = read_csv(lines, SUBMISSION_COLUMNS, report, _require_submission_columns)
+    for chunk in _chunks(rows, chunk_rows):
+        parsed = []
+        for number, row in chunk:
+            if row is None:
+                continue
+            try:
+                parsed.append((number, _parse_submission(row)))
+            except ValueError as e:
+                report.fail(number, str(e))
+
+        # One batched lookup for the chunk's new week references
+        refs = {fields['week_ref'] for _, fields in parsed} - weeks.keys()
+        ids = [ref for ref in refs if isinstance(ref, str)]
+        pairs = [ref for ref in refs if not isinstance(ref, str)]
+        weeks.update(dict.fromkeys(refs))
+        weeks.update(Week.get_many(ids))
+        weeks.update(Week.get_many_by_number(pairs))
+
+        for number, fields in parsed:
+            week = weeks[fields['week_ref']]
+            if week is None:
+                report.fail(number, "Week not found")
+                continue
+            submission_id = new_submission_id(week['id'], fields['student_name'])
+            writer.add(number, submission_id, lambda batch, week=week, fields=fields,
+                       submission_id=submission_id: Submission.create(
+                week_id=week['id'],
+                student_name=fields['student_name'],
+                project_url=fields['project_url'],
+                status=fields['status'],
+                category_id=week.get('category_id'),
+                submission_id=submission_id,
+                submitted_at=fields['submitted_at'],
+                batch=batch,
+            ))
+        writer.flush()
+        # Created submissions need not stay in this request's identity map
+        identity_map.clear()
+    return report.to_dict()
+
+
+def _require_week_columns(columns: set) -> Optional[str]:
+    if not {'category_id', 'week_number', 'title'} <= columns:
+        return "Missing required columns: category_id, week_number and title"
+    return None
+
+
+def _parse_week(row: dict) -> dict:
+    error = week_error(row)
+    if error:
+        raise ValueError(error)
+    if 'category_id' not in row:
+        raise ValueError("category_id is required")
+    is_active = row.get('is_active')
+    return {
+        'category_id': row['category_id'],
+        'week_number': _parse_int(row['week_number'], 'week_number'),
+        'title': row['title'],
+        'display_name': row.get('display_name'),
+        'description': row.get('description'),
+        'assignment_url': row.get('assignment_url'),
+        'due_date': row.get('due_date'),
+        'is_active': _parse_bool(is_active, 'is_active') if is_active else True,
+    }
+
+
+def import_weeks(lines: Iterable[str], chunk_rows: int = CHUNK_ROWS) -> dict:
+    """Import weeks from CSV text lines. Returns the report as a dict.
+
+    A week whose category and week number already exist, in the database
+    or earlier in the file, is reported and skipped.
+
+    Raises InvalidImport if the file has no header or lacks required columns.
+    """
+    db = get_backend()
+    report = ImportReport()
+    writer = _BatchWriter(report, OPS_PER_WEEK, "Week number already exists for this category")
+    categories: dict = {}
+    taken: set = set()
+    rows = read_csv(lines, WEEK_COLUMNS, report, _require_week_columns)
+    for chunk in _chunks(rows, chunk_rows):
+        parsed = []
+        for number, row in chunk:
+            if row is None:
+                continue
+            try:
+                parsed.append((number, _parse_week(row)))
+            except ValueError as e:
+                report.fail(number, str(e))
+
+        # One batched read each for the chunk's categories and week numbers
+        new_categories = {fields['category_id'] for _, fields in parsed} - categories.keys()
+        found = Category.get_many(new_categories)
+        categories.update({category_id: category_id in found for category_id in new_categories})
+        keys = {week_number_key(fields['category_id'], fields['week_number'])
+                for _, fields in parsed} - taken
+        taken.update(db.get_many(WEEK_NUMBERS_COLLECTION, keys))
+
+        touched, created = set(), []
+        for number, fields in parsed:
+            key = week_number_key(fields['category_id'], fields['week_number'])
+            if not categories[fields['category_id']]:
+                report.fail(number, "Category not found")
+                continue
+            if key in taken:
+                report.fail(number, "Week number already exists for this category")
+                continue
+            taken.add(key)
+            touched.add(fields['category_id'])
+            created.append(key)
+            writer.add(number, key, lambda batch, fields=fields: Week.create(**fields, batch=batch))
+        writer.flush()
+        identity_map.clear()
+        # Week.create leaves cache invalidation and the generation bump to us
+        for key in created:
+            read_cache.invalidate(WEEK_NUMBERS_COLLECTION, key)
+        for category_id in touched:
+            read_cache.invalidate(WEEKS_BY_CATEGORY, category_id)
+        if touched:
+            generations.bump(WEEKS_COLLECTION)
+    return report.to_dict()
@@ -0,0 +1,449 @@
+"""Write-ahead-logged ingestion of public submissions.
+
+With ``INGEST_WAL_ENABLED`` set, the public submission endpoints do not
+write to the database themselves. Each accepted submission is appended to a
+local log file and fsync'd. The endpoint then answers ``202`` with the
+submission as it will be stored. Concurrent requests share one fsync
+(group commit). A background flusher gathers up to ``INGEST_BATCH_SIZE``
+entries, waiting at most ``INGEST_MAX_DELAY_MS`` after the first, and
+commits them in ``WriteBatch`` chunks. If the database is unavailable (an
+error the backend's ``is_retryable`` accepts) it retries with backoff, and
+entries keep accumulating safely on disk. Any other error is not retried: the
+entries are written one at a time, and those the database still rejects
+are appended to ``dead-letter.jsonl`` in ``INGEST_WAL_DIR`` with the error,
+so one bad entry cannot stop ingestion. Committed submissions are added to
+the search index after the commit.
+
+Each worker logs to its own directory under ``INGEST_WAL_DIR``, held with
+an exclusive ``flock``. A directory whose lock is free belongs to a worker
+that stopped or crashed. Whichever worker starts next replays its unflushed
+entries and removes it. Replays are idempotent: in upsert mode an entry
+already applied is recognised by its ``ingest_id``; otherwise the
+submission is written with a create that fails if it already exists.
+
+The log directory must be on local disk that survives a worker restart, and
+gunicorn must fork workers before the pipeline starts (no ``--preload``).
+"""
+from __future__ import annotations
+import fcntl
+import json
+import logging
+import os
+import queue
+import shutil
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Iterable, Optional
+
+from .models import Submission, new_submission_id, normalize_student_name, OPS_PER_SUBMISSION
+from .storage import get_backend, AlreadyExists, MAX_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_BYTES = 16 * 2**20
+# Longest pause between retries while the database is unavailable (seconds)
+MAX_RETRY_DELAY = 30
+
+_SEGMENT_PREFIX = 'segment-'
+_CHECKPOINT = 'checkpoint.json'
+_LOCK = 'lock'
+DEAD_LETTER = 'dead-letter.jsonl'
+
+
+class IngestBacklogFull(Exception):
+    """Raised when too many accepted submissions are waiting to be flushed."""
+
+
+class WriteAheadLog:
+    """Append-only, segmented JSON-lines log in one directory.
+
+    Entries get consecutive ``seq`` numbers. ``checkpoint.json`` records the
+    highest sequence number up to which every entry is in the database;
+    fully flushed segments are deleted. Entries can reach the flusher out of
+    order (``seq`` is assigned under the log lock, queueing happens after
+    it), so a flushed entry above a gap waits in memory until the gap fills.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._lock_file = None
+        self._file = None
+        self._seq = 0
+        self._synced = 0
+        self._flushed = 0
+        # Flushed sequence numbers above the checkpoint, waiting for a gap to fill
+        self._done: set[int] = set()
+
+    def open(self, blocking: bool = True) -> Optional[list]:
+        """Lock the directory and return its unflushed entries, oldest first.
+
+        Returns None if another live process holds the lock and ``blocking``
+        is False.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock_file = open(os.path.join(self.directory, _LOCK), 'a')
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            self._lock_file.close()
+            self._lock_file = None
+            return None
+        try:
+            with open(os.path.join(self.directory, _CHECKPOINT)) as f:
+                self._flushed = json.load(f)['flushed']
+        except FileNotFoundError:
+            self._flushed = 0
+        entries = []
+        for path in self._segments():
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A write torn by a crash; only ever the last line
+                        break
+                    self._seq = max(self._seq, entry['seq'])
+                    if entry['seq'] > self._flushed:
+                        entries.append(entry)
+        self._seq = max(self._seq, self._flushed)
+        self._synced = self._seq
+        return entries
+
+    def start_writing(self) -> None:
+        """Start a fresh segment for appends (never after a possibly torn line)."""
+        self._file = self._open_segment(self._seq + 1)
+
+    def append(self, entry: dict) -> int:
+        """Write an entry durably. Returns its sequence number."""
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            self._file.write(json.dumps({**entry, 'seq': seq}, default=str) + '\n')
+            self._file.flush()
+        self._sync(seq)
+        return seq
+
+    def mark_flushed(self, seqs: Iterable[int]) -> None:
+        """Record that these entries are in the database; checkpoint and drop finished segments.
+
+        The checkpoint only moves past entries that are all done, so
+        reopening the log never skips an entry that is still waiting.
+        """
+        self._done.update(s for s in seqs if s > self._flushed)
+        seq = self._flushed
+        while seq + 1 in self._done:
+            seq += 1
+            self._done.discard(seq)
+        if seq == self._flushed:
+            return
+        path = os.path.join(self.directory, _CHECKPOINT)
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'flushed': seq}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+        self._flushed = seq
+        segments = self._segments()
+        active = self._file.name if self._file else None
+        for path, next_path in zip(segments, segments[1:]):
+            if path != active and _first_seq(next_path) - 1 <= seq:
+                os.remove(path)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _sync(self, seq: int) -> None:
+        # Group commit: one fsync covers every entry written before it, so
+        # threads that arrive while another is syncing usually find their
+        # entry already durable.
+        with self._sync_lock:
+            if self._synced >= seq:
+                return
+            retired = None
+            with self._lock:
+                target = self._seq
+                file = self._file
+                if file.tell() >= SEGMENT_BYTES:
+                    retired = file
+                    self._file = self._open_segment(target + 1)
+            os.fsync(file.fileno())
+            if retired is not None:
+                retired.close()
+            self._synced = target
+
+    def _segments(self) -> list:
+        names = sorted(n for n in os.listdir(self.directory) if n.startswith(_SEGMENT_PREFIX))
+        return [os.path.join(self.directory, n) for n in names]
+
+    def _open_segment(self, first_seq: int):
+        file = open(os.path.join(self.directory, f"{_SEGMENT_PREFIX}{first_seq:012d}.log"), 'a')
+        # Make the new file's directory entry durable too
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        return file
+
+
+def _first_seq(path: str) -> int:
+    return int(os.path.basename(path)[len(_SEGMENT_PREFIX):].split('.')[0])
+
+
+class IngestPipeline:
+    """Accepts submissions into the local log and group-commits them."""
+
+    def __init__(self, directory: str = 'ingest-wal', batch_size: int = 100,
+                 max_delay: float = 0.05, max_pending: int = 10000):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.enabled = False
+        self._log: Optional[WriteAheadLog] = None
+        self._queue: queue.Queue = queue.Queue()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {'accepted': 0, 'flushed': 0, 'commits': 0, 'replayed': 0, 'retries': 0,
+                       'dead_lettered': 0}
+        self._dead_letter_lock = threading.Lock()
+
+    def start(self) -> None:
+        """Open this worker's log, queue its unflushed entries and start the flusher."""
+        self.stop()
+        name = f"{socket.gethostname()}-{os.getpid()}"
+        self._log = WriteAheadLog(os.path.join(self.directory, name))
+        unflushed = self._log.open()
+        self._log.start_writing()
+        for entry in unflushed:
+            self._queue.put(entry)
+        self._stats['replayed'] += len(unflushed)
+        self._stopping.clear()
+        self.enabled = True
+        self._thread = threading.Thread(target=self._run, name="ingest-flusher", daemon=True)
+        self._thread.start()
+        logger.info(f"Ingest pipeline started ({len(unflushed)} entries to replay)")
+
+    def stop(self) -> None:
+        """Stop the flusher after it commits what is queued (best effort) and release the log."""
+        if self._thread is not None:
+            self._stopping.set()
+            self._thread.join(timeout=10)
+            self._thread = None
+        self.enabled = False
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def submit(self, week: dict, student_name: str, project_url: str) -> dict:
+        """Durably accept a pending submission. Returns it as it will be stored."""
+        if self._queue.qsize() >= self.max_pending:
+            raise IngestBacklogFull("Too many submissions waiting to be saved; try again shortly")
+        entry = {
+            'ingest_id': uuid.uuid4().hex,
+            'submission_id': new_submission_id(week['id'], student_name),
+            'week_id': week['id'],
+            'category_id': week.get('category_id'),
+            'student_name': student_name,
+            'project_url': project_url,
+            'submitted_at': datetime.utcnow().isoformat(),
+        }
+        entry['seq'] = self._log.append(entry)
+        self._queue.put(entry)
+        self._stats['accepted'] += 1
+        return {
+            'id': entry['submission_id'],
+            'week_id': entry['week_id'],
+            'category_id': entry['category_id'],
+            'student_name': student_name,
+            'student_key': normalize_student_name(student_name),
+            'project_url': project_url,
+            'status': 'pending',
+            'admin_comment': None,
+            'submitted_at': datetime.fromisoformat(entry['submitted_at']),
+            'modified_by': None,
+        }
+
+    def status(self) -> dict:
+        return {
+            'enabled': self.enabled,
+            'pending': self._queue.qsize(),
+            **self._stats,
+        }
+
+    def _run(self) -> None:
+        try:
+            self._adopt_orphans()
+        except Exception as e:
+            logger.error(f"Replaying orphaned ingest logs failed: {e}")
+        while True:
+            entries = self._collect()
+            if entries:
+                self._flush(entries, self._log)
+            elif self._stopping.is_set():
+                return
+
+    def _collect(self) -> list:
+        """Wait for an entry, then gather more until the batch is full or max_delay passes."""
+        try:
+            entries = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.max_delay
+        while len(entries) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                entries.append(self._queue.get(timeout=remaining) if remaining > 0
+                               else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return entries
+
+    def _flush(self, entries: list, log: WriteAheadLog) -> None:
+        """Commit entries, retrying transient errors until the database takes them."""
+        delay = 0.5
+        while True:
+            try:
+                written = self._commit(entries)
+                break
+            except Exception as e:
+                if not get_backend().is_retryable(e):
+                    raise
+                if self._stopping.is_set():
+                    logger.warning(f"Stopping with {len(entries)} ingest entries unflushed "
+                                   f"(kept in the log): {e}")
+                    return
+                self._stats['retries'] += 1
+                logger.warning(f"Ingest flush of {len(entries)} entries failed, "
+                               f"retrying in {delay:.1f}s: {e}")
+                self._stopping.wait(delay)
+                delay = min(delay * 2, MAX_RETRY_DELAY)
+        log.mark_flushed(entry['seq'] for entry in entries)
+        self._stats['flushed'] += len(entries)
+        Submission.add_to_search(written)
+
+    def _commit(self, entries: list) -> list:
+        """Write entries in batches; a resubmission starts a new batch after its first version.
+
+        Returns the submissions written.
+        """
+        written = []
+        group, ids, batch = [], set(), get_backend().batch()
+        for entry in entries:
+            if entry['submission_id'] in ids or len(batch) > MAX_BATCH_SIZE - OPS_PER_SUBMISSION:
+                written += self._commit_group(group, batch)
+                group, ids, batch = [], set(), get_backend().batch()
+            try:
+                submission = _create(entry, batch)
+            except Exception as e:
+                if get_backend().is_retryable(e):
+                    raise
+                # Rejected while reading what it replaces (nothing added to the batch)
+                self._dead_letter(entry, e)
+                continue
+            group.append((entry, submission))
+            ids.add(entry['submission_id'])
+        written += self._commit_group(group, batch)
+        return written
+
+    def _commit_group(self, group: list, batch) -> list:
+        if not group:
+            return []
+        try:
+            batch.commit()
+            written = [submission for _, submission in group]
+        except Exception as e:
+            if get_backend().is_retryable(e):
+                raise
+            # A replay of entries that were partly written before a crash
+            # (AlreadyExists), a resubmission that raced another one, or an
+            # entry the database rejects: let Submission.create commit them
+            # one at a time (re-reading and retrying a lost upsert race), skip
+            # those already there and set aside the rest. create adds what it
+            # commits to the search index itself.
+            written = []
+            for entry, _ in group:
+                try:
+                    _create(entry, None)
+                except AlreadyExists:
+                    pass
+                except Exception as e:
+                    if get_backend().is_retryable(e):
+                        raise
+                    self._dead_letter(entry, e)
+        self._stats['commits'] += 1
+        return written
+
+    def _dead_letter(self, entry: dict, error: Exception) -> None:
+        """Durably set aside an entry the database rejects, with the error."""
+        logger.error(f"Ingest entry {entry['ingest_id']} rejected, moved to {DEAD_LETTER}: {error}")
+        record = {**entry, 'error': str(error), 'failed_at': datetime.utcnow().isoformat()}
+        with self._dead_letter_lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, DEAD_LETTER), 'a') as f:
+                f.write(json.dumps(record, default=str) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+        self._stats['dead_lettered'] += 1
+
+    def _adopt_orphans(self) -> None:
+        """Replay and remove logs left behind by stopped workers."""
+        if not os.path.isdir(self.directory):
+            return
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            if self._log is not None and path == self._log.directory:
+                continue
+            if not os.path.isdir(path):
+                continue
+            orphan = WriteAheadLog(path)
+            entries = orphan.open(blocking=False)
+            if entries is None:
+                continue  # Its worker is alive
+            try:
+                logger.info(f"Replaying {len(entries)} entries from orphaned ingest log {name}")
+                for start in range(0, len(entries), self.batch_size):
+                    self._flush(entries[start:start + self.batch_size], orphan)
+                    if self._stopping.is_set():
+                        return
+                self._stats['replayed'] += len(entries)
+            finally:
+                orphan.close()
+            if not self._stopping.is_set():
+                shutil.rmtree(path, ignore_errors=True)
+
+
+def _create(entry: dict, batch) -> dict:
+    return Submission.create(
+        week_id=entry['week_id'],
+        student_name=entry['student_name'],
+        project_url=entry['project_url'],
+        category_id=entry.get('category_id'),
+        submission_id=entry['submission_id'],
+        submitted_at=datetime.fromisoformat(entry['submitted_at']),
+        ingest_id=entry['ingest_id'],
+        batch=batch,
+    )
+
+
+# Global ingest pipeline, started from create_app when enabled
+ingest_pipeline = IngestPipeline()
+
+
+def configure_ingest(config) -> IngestPipeline:
+    """Apply ingest settings from a Flask config mapping."""
+    ingest_pipeline.directory = config.get('INGEST_WAL_DIR', 'ingest-wal')
+    ingest_pipeline.batch_size = max(1, config.get('INGEST_BATCH_SIZE', 100))
+    ingest_pipeline.max_delay = config.get('INGEST_MAX_DELAY_MS', 50) / 1000
+    ingest_pipeline.max_pending = config.get('INGEST_MAX_PENDING', 10000)
+    return ingest_pipeline
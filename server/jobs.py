@@ -0,0 +1,380 @@
+"""Persisted background jobs for long-running admin operations.
+
+Admin endpoints submit a job and answer ``202`` with its ID; a small pool of
+worker threads in each process runs it, leaving request threads free for
+interactive traffic. Job state lives in the ``_jobs`` collection, so any
+worker can report progress, and handlers save checkpoints as they go.
+
+While a handler runs, a heartbeat thread refreshes the job every third of
+``JOBS_STALE_AFTER``, however long a single step takes. A job whose worker
+stopped heartbeating for ``JOBS_STALE_AFTER`` seconds (e.g. the worker was
+restarted) is picked up by the recovery sweep of any worker and resumes
+from its last checkpoint. A worker queues a job at most once, skips jobs
+that are running with a fresh heartbeat, and claims the next attempt in a
+transaction that checks the status and attempt count it read, together
+with a create-only lease document per attempt; so a job never runs twice
+at the same time. Handlers must be safe to re-run from their checkpoint.
+
+The recovery sweep also deletes finished jobs and their leases
+``JOBS_RETENTION_DAYS`` after they finished, first calling the cleanup
+registered for the job type (e.g. removing an export file).
+
+Like the catalog mirror, the runner starts threads and must be started after
+gunicorn forks its workers (i.e. without ``--preload``).
+"""
+from __future__ import annotations
+import logging
+import os
+import queue
+import socket
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from .storage import get_backend, naive_utc, AlreadyExists, DESCENDING
+
+logger = logging.getLogger(__name__)
+
+JOBS_COLLECTION = '_jobs'
+LEASES_COLLECTION = '_job_leases'
+
+# Job statuses
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+
+class Job:
+    """Handle passed to a job handler."""
+
+    def __init__(self, doc: dict):
+        self.id = doc['id']
+        self.type = doc['type']
+        self.params = doc.get('params') or {}
+        self.checkpoint = doc.get('checkpoint') or {}
+
+    def save(self, checkpoint: Optional[dict] = None, progress: Optional[dict] = None) -> None:
+        """Persist a checkpoint and/or progress; also refreshes the heartbeat."""
+        now = datetime.utcnow()
+        data = {'heartbeat_at': now, 'updated_at': now}
+        if checkpoint is not None:
+            self.checkpoint = checkpoint
+            data['checkpoint'] = checkpoint
+        if progress is not None:
+            data['progress'] = progress
+        get_backend().update(JOBS_COLLECTION, self.id, data)
+
+
+class JobRunner:
+    """Runs registered job handlers on background threads."""
+
+    def __init__(self, workers: int = 2, stale_after: float = 300, recovery_interval: float = 60,
+                 retention_days: float = 7):
+        self.workers = workers
+        self.stale_after = stale_after
+        self.recovery_interval = recovery_interval
+        self.retention_days = retention_days
+        self.handlers: dict[str, Callable[[Job], dict]] = {}
+        self.cleanups: dict[str, Callable[[dict], None]] = {}
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._queue: queue.Queue = queue.Queue()
+        # Job IDs queued or running in this process, so none is queued twice
+        self._queued: set[str] = set()
+        self._queued_lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+        self._stopping = threading.Event()
+        self._app = None
+
+    def handler(self, job_type: str):
+        """Decorator registering ``fn(job) -> result`` for a job type."""
+        def register(fn):
+            self.handlers[job_type] = fn
+            return fn
+        return register
+
+    def cleanup(self, job_type: str):
+        """Decorator registering ``fn(job_doc)``, run before a finished job is deleted."""
+        def register(fn):
+            self.cleanups[job_type] = fn
+            return fn
+        return register
+
+    def submit(self, job_type: str, params: dict, created_by: Optional[str] = None) -> dict:
+        """Persist a new job and queue it. Returns the job document."""
+        if job_type not in self.handlers:
+            raise ValueError(f"Unknown job type: {job_type!r}")
+        db = get_backend()
+        now = datetime.utcnow()
+        job = {
+            'type': job_type,
+            'params': params,
+            'status': QUEUED,
+            'progress': {},
+            'checkpoint': {},
+            'result': None,
+            'error': None,
+            'attempts': 0,
+            'worker': None,
+            'created_by': created_by,
+            'created_at': now,
+            'updated_at': now,
+            'heartbeat_at': now,
+        }
+        job_id = db.new_id()
+        db.set(JOBS_COLLECTION, job_id, job)
+        # Without worker threads here (JOBS_WORKERS=0, or a script) the job
+        # stays queued until run_pending() or another worker's recovery sweep
+        self._enqueue(job_id)
+        return {'id': job_id, **job}
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Get a job by ID."""
+        return get_backend().get(JOBS_COLLECTION, job_id)
+
+    def get_recent(self, limit: int = 50) -> list:
+        """Most recently created jobs, newest first."""
+        return list(get_backend().query(JOBS_COLLECTION, order_by=[('created_at', DESCENDING)],
+                                        limit=limit))
+
+    def start(self, app=None) -> None:
+        """Start worker threads and the recovery sweep."""
+        self.stop()
+        self._app = app
+        self._stopping.clear()
+        if self.workers <= 0:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._recovery_loop, name="job-recovery", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        logger.info(f"Job runner started with {self.workers} workers")
+
+    def stop(self) -> None:
+        """Stop the threads; running jobs finish their current step first."""
+        if not self._threads:
+            return
+        self._stopping.set()
+        for _ in range(len(self._threads) - 1):
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def run_pending(self) -> int:
+        """Run the jobs queued in this process on the calling thread (tests, scripts).
+
+        Returns how many were taken off the queue.
+        """
+        taken = 0
+        while True:
+            try:
+                job_id = self._queue.get_nowait()
+            except queue.Empty:
+                return taken
+            if job_id is None:
+                continue
+            taken += 1
+            self._execute(job_id)
+
+    def recover(self) -> int:
+        """Queue jobs whose worker stopped heartbeating. Returns how many were queued."""
+        db = get_backend()
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        recovered = 0
+        for status in (QUEUED, RUNNING):
+            for job in db.query(JOBS_COLLECTION, filters=[('status', '==', status)]):
+                if _heartbeat_after(job, cutoff) or not self._enqueue(job['id']):
+                    continue
+                logger.info(f"Recovering {status} job {job['id']} ({job['type']})")
+                recovered += 1
+        return recovered
+
+    def purge(self) -> int:
+        """Delete jobs (and their leases) finished more than retention_days ago. Returns how many."""
+        if not self.retention_days:
+            return 0
+        db = get_backend()
+        cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+        purged = 0
+        # Single-field range query (no composite index); the status is checked here
+        for job in db.query(JOBS_COLLECTION, filters=[('finished_at', '<', cutoff)]):
+            if job.get('status') not in (SUCCEEDED, FAILED):
+                continue
+            cleanup = self.cleanups.get(job.get('type'))
+            if cleanup is not None:
+                try:
+                    cleanup(job)
+                except Exception as e:
+                    logger.warning(f"Cleanup of job {job['id']} failed, keeping it: {e}")
+                    continue
+            leases = [(LEASES_COLLECTION, f"{job['id']}:{attempt}")
+                      for attempt in range(1, job.get('attempts', 0) + 1)]
+            db.bulk_delete([*leases, (JOBS_COLLECTION, job['id'])])
+            purged += 1
+        if purged:
+            logger.info(f"Purged {purged} finished jobs")
+        return purged
+
+    def status(self) -> dict:
+        return {
+            'worker_id': self.worker_id,
+            'workers': self.workers,
+            'running': bool(self._threads),
+            'queued_locally': self._queue.qsize(),
+        }
+
+    def _enqueue(self, job_id: str) -> bool:
+        """Queue a job unless it is already queued or running here."""
+        with self._queued_lock:
+            if job_id in self._queued:
+                return False
+            self._queued.add(job_id)
+        self._queue.put(job_id)
+        return True
+
+    def _work(self) -> None:
+        while not self._stopping.is_set():
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            self._execute(job_id)
+
+    def _execute(self, job_id: str) -> None:
+        try:
+            self._run(job_id)
+        except Exception as e:
+            logger.error(f"Job {job_id} could not be run: {e}")
+        finally:
+            with self._queued_lock:
+                self._queued.discard(job_id)
+
+    def _recovery_loop(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                self.recover()
+            except Exception as e:
+                logger.warning(f"Job recovery sweep failed: {e}")
+            try:
+                if self._app is not None:
+                    with self._app.app_context():
+                        self.purge()
+                else:
+                    self.purge()
+            except Exception as e:
+                logger.warning(f"Purging finished jobs failed: {e}")
+            self._stopping.wait(self.recovery_interval)
+
+    def _claim(self, job: dict) -> bool:
+        """Take the job's next attempt; False if it changed since it was read.
+
+        Runs in a transaction that checks the status and attempt count read
+        in ``job`` and creates the attempt's lease, so of two workers racing
+        for a job only one gets it.
+        """
+        attempt = job.get('attempts', 0) + 1
+        now = datetime.utcnow()
+
+        def claim(transaction):
+            current = transaction.get(JOBS_COLLECTION, job['id'])
+            if (current is None or current['status'] != job['status']
+                    or current.get('attempts', 0) != job.get('attempts', 0)):
+                return False
+            transaction.create(LEASES_COLLECTION, f"{job['id']}:{attempt}", {
+                'worker': self.worker_id,
+                'claimed_at': now,
+            })
+            transaction.update(JOBS_COLLECTION, job['id'], {
+                'status': RUNNING,
+                'attempts': attempt,
+                'worker': self.worker_id,
+                'started_at': now,
+                'updated_at': now,
+                'heartbeat_at': now,
+            })
+            return True
+
+        try:
+            return get_backend().run_transaction(claim)
+        except AlreadyExists:
+            return False
+
+    def _run(self, job_id: str) -> None:
+        db = get_backend()
+        job = db.get(JOBS_COLLECTION, job_id)
+        if job is None or job['status'] in (SUCCEEDED, FAILED):
+            return
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        if job['status'] == RUNNING and _heartbeat_after(job, cutoff):
+            # Another worker is running it and still heartbeating
+            return
+        if not self._claim(job):
+            return
+        if job.get('attempts'):
+            logger.info(f"Resuming job {job_id} from checkpoint {job.get('checkpoint')}")
+        heartbeat = self._start_heartbeat(job_id)
+        try:
+            handler = self.handlers[job['type']]
+            if self._app is not None:
+                with self._app.app_context():
+                    result = handler(Job(job))
+            else:
+                result = handler(Job(job))
+        except Exception as e:
+            heartbeat.set()
+            logger.error(f"Job {job_id} ({job['type']}) failed: {e}")
+            now = datetime.utcnow()
+            db.update(JOBS_COLLECTION, job_id, {
+                'status': FAILED,
+                'error': str(e),
+                'finished_at': now,
+                'updated_at': now,
+            })
+            return
+        heartbeat.set()
+        now = datetime.utcnow()
+        db.update(JOBS_COLLECTION, job_id, {
+            'status': SUCCEEDED,
+            'result': result,
+            'finished_at': now,
+            'updated_at': now,
+        })
+        logger.info(f"Job {job_id} ({job['type']}) succeeded: {result}")
+
+    def _start_heartbeat(self, job_id: str) -> threading.Event:
+        """Refresh the job's heartbeat until the returned event is set."""
+        done = threading.Event()
+        interval = max(self.stale_after / 3, 1)
+
+        def beat():
+            while not done.wait(interval):
+                now = datetime.utcnow()
+                try:
+                    get_backend().update(JOBS_COLLECTION, job_id, {'heartbeat_at': now})
+                except Exception as e:
+                    logger.warning(f"Heartbeat for job {job_id} failed: {e}")
+
+        threading.Thread(target=beat, name=f"job-heartbeat-{job_id}", daemon=True).start()
+        return done
+
+
+def _heartbeat_after(job: dict, cutoff: datetime) -> bool:
+    """True if the job heartbeated after ``cutoff`` (a naive UTC datetime)."""
+    heartbeat_at = job.get('heartbeat_at')
+    return heartbeat_at is not None and naive_utc(heartbeat_at) > cutoff
+
+
+# Global job runner, configured from app config at startup
+job_runner = JobRunner()
+
+
+def configure_jobs(config) -> JobRunner:
+    """Apply job runner settings from a Flask config mapping."""
+    job_runner.workers = config.get('JOBS_WORKERS', 2)
+    job_runner.stale_after = config.get('JOBS_STALE_AFTER', 300)
+    job_runner.recovery_interval = config.get('JOBS_RECOVERY_INTERVAL', 60)
+    job_runner.retention_days = config.get('JOBS_RETENTION_DAYS', 7)
+    return job_runner
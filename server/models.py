@@ -1,13 +1,321 @@
-"""Firestore data models and helper functions for SparkRepo."""
+"""Data models and helper functions for SparkRepo.
+
+Models read and write through the configured storage backend (see
+``storage/``), so they work the same on Firestore, SQLite or in memory.
+"""
+import hashlib
+import heapq
+import itertools
+import logging
+import random
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
-from .firebase_client import get_firestore_client
+from .storage import get_backend, NotFound, AlreadyExists, ASCENDING, DESCENDING, MAX_BATCH_SIZE
+from .cache import read_cache
+from .coherence import generations
+from .singleflight import flights
+from .search import submission_search
+from . import identity_map, query_plans
+
+logger = logging.getLogger(__name__)
 
 # Collection names
 CATEGORIES_COLLECTION = 'categories'
 USERS_COLLECTION = 'users'
 WEEKS_COLLECTION = 'weeks'
 SUBMISSIONS_COLLECTION = 'submissions'
+# Subcollection under a submission holding versions replaced by an upsert
+HISTORY_COLLECTION = 'history'
+# Index documents keyed "{category_id}:{week_number}" -> {'week_id': ...}
+WEEK_NUMBERS_COLLECTION = 'week_numbers'
+# Index documents keyed by normalized username -> {'user_id': ...}
+USERNAMES_COLLECTION = 'usernames'
+# Sharded submission counters keyed "{week|category}:{id}:{shard}"
+SUBMISSION_COUNTS_COLLECTION = '_submission_counts'
+# Per-student index: student_submissions/{student_index_id}/entries/{submission_id}
+# holds a copy of each of the student's submissions in one category
+STUDENT_SUBMISSIONS_COLLECTION = 'student_submissions'
+STUDENT_ENTRIES_COLLECTION = 'entries'
+
+# Statuses always reported by SubmissionStats, even at zero
+SUBMISSION_STATUSES = ('pending', 'submitted', 'reviewed', 'approved', 'rejected')
+
+# Most operations Submission.create adds to a batch (resubmission: history
+# copy, submission, student index entry, week and category counters)
+OPS_PER_SUBMISSION = 5
+# Tries of an upsert that loses a race with a concurrent resubmission
+UPSERT_ATTEMPTS = 3
+
+# Read cache namespace for per-category week lists
+WEEKS_BY_CATEGORY = 'weeks_by_category'
+
+# Submission storage layouts (SUBMISSIONS_LAYOUT config):
+# - 'flat': one top-level submissions collection (default)
+# - 'nested': weeks/{week_id}/submissions subcollections
+# - 'dual': write nested, but still read flat documents during migration
+SUBMISSION_LAYOUTS = ('flat', 'nested', 'dual')
+_submissions_layout = 'flat'
+# Keep one submission per student and week (SUBMISSIONS_UPSERT config)
+_submissions_upsert = False
+# Shard documents per submission counter (COUNTER_SHARDS config)
+_counter_shards = 4
+# Index shards for submissions (SUBMISSION_SHARDS config); 0 = unsharded
+_submission_shards = 0
+
+# Newest-first ordering of submission lists
+NEWEST_FIRST = [('submitted_at', DESCENDING)]
+# Equality filters a page of submissions can send to the database, most
+# selective first. Each has its own declared query shape; a page sends one
+# and checks the rest in Python.
+PAGE_FILTERS = ('week_id', 'category_id', 'status')
+# Submissions read per query while a page is filtered in Python
+PAGE_SCAN = 200
+
+
+def configure_models(config):
+    """Apply model settings from a Flask config mapping."""
+    global _submissions_layout, _submissions_upsert, _counter_shards, _submission_shards
+    layout = config.get('SUBMISSIONS_LAYOUT', 'flat')
+    if layout not in SUBMISSION_LAYOUTS:
+        raise ValueError(f"Unknown SUBMISSIONS_LAYOUT: {layout!r}")
+    _submissions_layout = layout
+    _submissions_upsert = config.get('SUBMISSIONS_UPSERT', False)
+    _counter_shards = max(1, int(config.get('COUNTER_SHARDS', 4)))
+    _submission_shards = max(0, int(config.get('SUBMISSION_SHARDS', 0)))
+
+
+def week_submissions_collection(week_id):
+    """Path of a week's submissions subcollection."""
+    return f"{WEEKS_COLLECTION}/{week_id}/{SUBMISSIONS_COLLECTION}"
+
+
+def normalize_username(username):
+    """Username as stored in the usernames index: trimmed and case-folded."""
+    return username.strip().casefold()
+
+
+def normalize_student_name(student_name):
+    """Student name with whitespace collapsed and case folded."""
+    return ' '.join(student_name.split()).casefold()
+
+
+def student_submission_id(week_id, student_name):
+    """Deterministic ID of a student's canonical submission for a week."""
+    key = f"{week_id}\0{normalize_student_name(student_name)}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def new_submission_id(week_id, student_name):
+    """ID a new submission will be stored under: per student and week in upsert mode."""
+    if _submissions_upsert:
+        return student_submission_id(week_id, student_name)
+    return get_backend().new_id()
+
+
+def submission_shard(submission_id):
+    """Index shard of a submission; derived from its ID so rewrites keep their shard."""
+    digest = hashlib.sha1(submission_id.encode('utf-8')).hexdigest()
+    return int(digest[:8], 16) % _submission_shards
+
+
+def student_index_id(category_id, student_name):
+    """Document ID of a student's entry in the per-student index for a category."""
+    key = f"{category_id}\0{normalize_student_name(student_name)}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def student_entries_collection(category_id, student_name):
+    """Path of the index subcollection listing a student's submissions in a category."""
+    return (f"{STUDENT_SUBMISSIONS_COLLECTION}/{student_index_id(category_id, student_name)}"
+            f"/{STUDENT_ENTRIES_COLLECTION}")
+
+
+def week_number_key(category_id, week_number):
+    """Document ID of a week's entry in the week_numbers index."""
+    return f"{category_id}:{week_number}"
+
+
+def _week_submission_sources(week_id):
+    """(collection, filters) pairs that hold a week's submissions in this layout."""
+    sources = []
+    if _submissions_layout in ('nested', 'dual'):
+        sources.append((week_submissions_collection(week_id), []))
+    if _submissions_layout in ('flat', 'dual'):
+        sources.append((SUBMISSIONS_COLLECTION, [('week_id', '==', week_id)]))
+    return sources
+
+
+def _submission_collection(submission):
+    """Collection a stored submission lives in.
+    
+    Only nested documents carry a submission_id field, so anything without
+    one is still in the flat collection.
+    """
+    if 'submission_id' in submission:
+        return week_submissions_collection(submission['week_id'])
+    return SUBMISSIONS_COLLECTION
+
+
+def _sharded_reads(filters=()):
+    """Whether newest-first reads with these filters go shard by shard.
+    
+    True once SUBMISSION_SHARDS is set and the sharded variant of the query
+    shape can be run (see query_plans).
+    """
+    if not _submission_shards:
+        return False
+    name = query_plans.find(SUBMISSIONS_COLLECTION, [*filters, ('shard', '==', 0)], NEWEST_FIRST)
+    return name is not None and query_plans.order_by(name) is not None
+
+
+def _merge_shards(query, filters, limit=None, group=False):
+    """Run ``query(filters)`` newest first on every shard and merge the results.
+    
+    Each shard's results come back in the backend's order (submitted_at,
+    then document ID, or full path for group queries, descending), so a
+    k-way merge on the same key gives the unsharded order and cursors keep
+    working.
+    """
+    streams = [query([*filters, ('shard', '==', shard)]) for shard in range(_submission_shards)]
+    if group:
+        key = lambda s: (s['submitted_at'], f"{_submission_collection(s)}/{s['id']}")
+    else:
+        key = lambda s: (s['submitted_at'], s['id'])
+    return itertools.islice(heapq.merge(*streams, key=key, reverse=True), limit)
+
+
+def _query_submissions(filters=(), order_by=(), limit=None, start_after=None, read_time=None):
+    """Stream submissions across the whole layout.
+    
+    Outside the flat layout this is a collection-group query, which in
+    Firestore also covers the top-level submissions collection. Copies left
+    behind by the migration are skipped in favour of the nested document.
+    Newest-first queries are merged from per-shard queries when submissions
+    are sharded.
+    """
+    filters = list(filters)
+    if order_by:
+        # Only shapes with an index in the manifest (FAILED_PRECONDITION on Firestore otherwise)
+        query_plans.require(SUBMISSIONS_COLLECTION, filters, order_by)
+    elif _submissions_layout != 'flat' and any(op == '==' for _, op, _ in filters):
+        # Collection-group equality filters need a declared single-field override
+        query_plans.require(SUBMISSIONS_COLLECTION, filters, ())
+    if list(order_by) == NEWEST_FIRST and _sharded_reads(filters):
+        yield from _merge_shards(
+            lambda shard_filters: _query_layout(shard_filters, order_by, limit, start_after,
+                                                read_time),
+            filters, limit, group=_submissions_layout != 'flat')
+        return
+    yield from _query_layout(filters, order_by, limit, start_after, read_time)
+
+
+def _query_layout(filters, order_by, limit, start_after, read_time=None):
+    db = get_backend()
+    if _submissions_layout == 'flat':
+        yield from db.query(SUBMISSIONS_COLLECTION, filters=filters, order_by=order_by,
+                            limit=limit, start_after=start_after, read_time=read_time)
+        return
+    seen = set()
+    for submission in db.query(SUBMISSIONS_COLLECTION, filters=filters, order_by=order_by,
+                               limit=limit, start_after=start_after, group=True,
+                               read_time=read_time):
+        if submission['id'] in seen:
+            continue
+        seen.add(submission['id'])
+        yield submission
+
+
+def _add_submission(batch, submission_data, upsert, submission_id, ingest_id):
+    """Add a submission's writes to ``batch`` (see Submission.create).
+
+    Returns (submission, changed); changed is False for a replayed ingest
+    entry that is already stored, which adds nothing to the batch.
+    """
+    db = get_backend()
+    week_id = submission_data['week_id']
+    status = submission_data['status']
+    current = None
+    create_only = False
+    if upsert:
+        submission_id = student_submission_id(week_id, submission_data['student_name'])
+        current = _stored_submission(week_id, submission_id)
+        if current is not None and ingest_id is not None and current.get('ingest_id') == ingest_id:
+            return current, False
+        # The first version must not exist yet (precondition)
+        create_only = current is None
+    elif submission_id is None:
+        submission_id = db.new_id()
+    else:
+        create_only = True
+    if current is not None:
+        # Resubmission: keep writing where the current version lives. The
+        # history copy is keyed by version and created only if missing, so
+        # only one of two resubmissions of the same version can commit.
+        collection = _submission_collection(current)
+        previous = {k: v for k, v in current.items() if k != 'id'}
+        version = current.get('version', 1)
+        batch.create(f"{collection}/{submission_id}/{HISTORY_COLLECTION}", f"v{version:06d}",
+                     previous)
+        submission_data['version'] = version + 1
+        submission_data['first_submitted_at'] = current.get('first_submitted_at',
+                                                            current.get('submitted_at'))
+        _count_submission(batch, current, status_deltas(removed=current.get('status'),
+                                                        added=status))
+    else:
+        _count_submission(batch, submission_data, status_deltas(total=1, added=status))
+        if upsert:
+            submission_data['version'] = 1
+            submission_data['first_submitted_at'] = submission_data['submitted_at']
+        if _submissions_layout == 'flat':
+            collection = SUBMISSIONS_COLLECTION
+        else:
+            collection = week_submissions_collection(week_id)
+    if collection != SUBMISSIONS_COLLECTION:
+        # Nested documents carry their own ID for collection-group lookups.
+        submission_data['submission_id'] = submission_id
+    if _submission_shards:
+        submission_data['shard'] = submission_shard(submission_id)
+    if create_only:
+        batch.create(collection, submission_id, submission_data)
+    else:
+        batch.set(collection, submission_id, submission_data)
+    _index_student_submission(batch, submission_id, submission_data)
+    return {'id': submission_id, **submission_data}, True
+
+
+def _stored_submission(week_id, submission_id):
+    """Read an upserted submission from storage, bypassing the identity map.
+
+    Upserted IDs belong to one week, so outside the flat layout the nested
+    document is read directly (no collection-group query), then the flat one.
+    """
+    db = get_backend()
+    if _submissions_layout != 'flat':
+        submission = db.get(week_submissions_collection(week_id), submission_id)
+        if submission is not None:
+            return submission
+    return db.get(SUBMISSIONS_COLLECTION, submission_id)
+
+
+def _page_position(submission):
+    """Sort position of a submission, as a newest-first page cursor."""
+    return {
+        'submitted_at': submission['submitted_at'],
+        'id': submission['id'],
+        'path': f"{_submission_collection(submission)}/{submission['id']}",
+    }
+
+
+def _get_document(collection, doc_id, cached=True):
+    """Read one document through the request identity map and the read cache."""
+    db = get_backend()
+
+    def load():
+        if cached:
+            return read_cache.get_or_load(collection, doc_id, lambda: db.get(collection, doc_id))
+        return db.get(collection, doc_id)
+
+    return identity_map.get_or_load(collection, doc_id, load)
 
 
 class Category:
@@ -16,62 +324,77 @@ class Category:
     @staticmethod
     def create(name, description=None):
         """Create a new category."""
-        db = get_firestore_client()
+        db = get_backend()
         category_data = {
             'name': name,
             'description': description,
             'created_at': datetime.utcnow()
         }
-        doc_ref = db.collection(CATEGORIES_COLLECTION).document()
-        doc_ref.set(category_data)
-        return {'id': doc_ref.id, **category_data}
+        category_id = db.add(CATEGORIES_COLLECTION, category_data)
+        identity_map.put(CATEGORIES_COLLECTION, category_id, {'id': category_id, **category_data})
+        read_cache.invalidate(CATEGORIES_COLLECTION, category_id)
+        generations.bump(CATEGORIES_COLLECTION)
+        return {'id': category_id, **category_data}
     
     @staticmethod
     def get_all():
         """Get all categories."""
-        db = get_firestore_client()
-        categories = []
-        docs = db.collection(CATEGORIES_COLLECTION).order_by('name').stream()
-        for doc in docs:
-            data = doc.to_dict()
-            data['id'] = doc.id
-            categories.append(data)
-        return categories
+        db = get_backend()
+        return list(db.query(CATEGORIES_COLLECTION, order_by=[('name', ASCENDING)]))
     
     @staticmethod
     def get_by_id(category_id):
-        """Get category by ID."""
-        db = get_firestore_client()
-        doc = db.collection(CATEGORIES_COLLECTION).document(category_id).get()
-        if doc.exists:
-            data = doc.to_dict()
-            data['id'] = doc.id
-            return data
-        return None
+        """Get category by ID (cached)."""
+        return _get_document(CATEGORIES_COLLECTION, category_id)
+    
+    @staticmethod
+    def get_many(category_ids):
+        """Get several categories by ID in one batched read (cached). Returns {id: category}."""
+        db = get_backend()
+        return read_cache.get_many_or_load(CATEGORIES_COLLECTION, category_ids,
+                                           lambda ids: db.get_many(CATEGORIES_COLLECTION, ids))
     
     @staticmethod
     def update(category_id, name=None, description=None):
         """Update a category."""
-        db = get_firestore_client()
-        doc_ref = db.collection(CATEGORIES_COLLECTION).document(category_id)
+        db = get_backend()
         update_data = {}
         if name is not None:
             update_data['name'] = name
         if description is not None:
             update_data['description'] = description
-        doc_ref.update(update_data)
+        db.update(CATEGORIES_COLLECTION, category_id, update_data)
+        identity_map.merge(CATEGORIES_COLLECTION, category_id, update_data)
+        read_cache.invalidate(CATEGORIES_COLLECTION, category_id)
+        generations.bump(CATEGORIES_COLLECTION)
         return Category.get_by_id(category_id)
     
     @staticmethod
     def delete(category_id):
-        """Delete a category and all its weeks."""
-        db = get_firestore_client()
-        # Delete all weeks for this category
-        weeks = db.collection(WEEKS_COLLECTION).where('category_id', '==', category_id).stream()
+        """Delete a category and all its weeks.
+        
+        The whole cascade goes through one chunked, parallel bulk delete.
+        Returns the number of documents deleted.
+        """
+        db = get_backend()
+        weeks = list(db.query(WEEKS_COLLECTION, filters=[('category_id', '==', category_id)]))
+        deleted = db.bulk_delete(itertools.chain(
+            itertools.chain.from_iterable(_week_documents(week) for week in weeks),
+            ((SUBMISSION_COUNTS_COLLECTION, shard_id)
+             for shard_id in _counter_shard_ids('category', category_id)),
+            [(CATEGORIES_COLLECTION, category_id)],
+        ))
         for week in weeks:
-            Week.delete(week.id)
-        # Delete category
-        db.collection(CATEGORIES_COLLECTION).document(category_id).delete()
+            identity_map.put(WEEKS_COLLECTION, week['id'], None)
+            read_cache.invalidate(WEEKS_COLLECTION, week['id'])
+        identity_map.put(CATEGORIES_COLLECTION, category_id, None)
+        read_cache.invalidate(CATEGORIES_COLLECTION, category_id)
+        read_cache.invalidate(WEEK_NUMBERS_COLLECTION)
+        read_cache.invalidate(WEEKS_BY_CATEGORY)
+        generations.bump(SUBMISSIONS_COLLECTION)
+        generations.bump(WEEKS_COLLECTION)
+        generations.bump(CATEGORIES_COLLECTION)
+        return deleted
 
 
 class User:
@@ -79,8 +402,13 @@ class User:
     
     @staticmethod
     def create(username, password, email=None, is_admin=False):
-        """Create a new user."""
-        db = get_firestore_client()
+        """Create a new user.
+        
+        The user and its usernames index entry are written in one batch, and
+        the entry is create-only, so concurrent signups of the same name
+        cannot both succeed: the loser gets AlreadyExists.
+        """
+        db = get_backend()
         user_data = {
             'username': username,
             'password_hash': generate_password_hash(password),
@@ -88,31 +416,46 @@ class User:
             'is_admin': is_admin,
             'created_at': datetime.utcnow()
         }
-        doc_ref = db.collection(USERS_COLLECTION).document()
-        doc_ref.set(user_data)
-        return {'id': doc_ref.id, 'username': username, 'email': email, 'is_admin': is_admin}
+        user_id = db.new_id()
+        key = normalize_username(username)
+        batch = db.batch()
+        batch.create(USERNAMES_COLLECTION, key, {'user_id': user_id, 'username': username})
+        batch.set(USERS_COLLECTION, user_id, user_data)
+        batch.commit()
+        identity_map.put(USERS_COLLECTION, user_id, {'id': user_id, **user_data})
+        identity_map.forget(USERNAMES_COLLECTION, key)
+        read_cache.invalidate(USERS_COLLECTION, user_id)
+        read_cache.invalidate(USERNAMES_COLLECTION, key)
+        generations.bump(USERS_COLLECTION)
+        return {'id': user_id, 'username': username, 'email': email, 'is_admin': is_admin}
     
     @staticmethod
     def get_by_username(username):
-        """Get user by username."""
-        db = get_firestore_client()
-        users = db.collection(USERS_COLLECTION).where('username', '==', username).limit(1).stream()
-        for user in users:
-            data = user.to_dict()
-            data['id'] = user.id
-            return data
+        """Get user by username (case-insensitive).
+        
+        Resolves through the usernames index. Users created before the index
+        existed are found with a query instead, and their index entry is
+        written on the way out so the next lookup is a plain get.
+        """
+        db = get_backend()
+        key = normalize_username(username)
+        entry = _get_document(USERNAMES_COLLECTION, key)
+        if entry:
+            return User.get_by_id(entry['user_id'])
+        for user in db.query(USERS_COLLECTION, filters=[('username', '==', username)], limit=1):
+            try:
+                db.create(USERNAMES_COLLECTION, key, {'user_id': user['id'], 'username': user['username']})
+            except AlreadyExists:
+                pass
+            identity_map.forget(USERNAMES_COLLECTION, key)
+            read_cache.invalidate(USERNAMES_COLLECTION, key)
+            return user
         return None
     
     @staticmethod
     def get_by_id(user_id):
-        """Get user by ID."""
-        db = get_firestore_client()
-        doc = db.collection(USERS_COLLECTION).document(user_id).get()
-        if doc.exists:
-            data = doc.to_dict()
-            data['id'] = doc.id
-            return data
-        return None
+        """Get user by ID (cached)."""
+        return _get_document(USERS_COLLECTION, user_id)
     
     @staticmethod
     def check_password(user_data, password):
@@ -122,19 +465,31 @@ class User:
     @staticmethod
     def update_password(user_id, new_password):
         """Update user password."""
-        db = get_firestore_client()
-        doc_ref = db.collection(USERS_COLLECTION).document(user_id)
-        doc_ref.update({'password_hash': generate_password_hash(new_password)})
+        db = get_backend()
+        update_data = {'password_hash': generate_password_hash(new_password)}
+        db.update(USERS_COLLECTION, user_id, update_data)
+        identity_map.merge(USERS_COLLECTION, user_id, update_data)
+        read_cache.invalidate(USERS_COLLECTION, user_id)
+        generations.bump(USERS_COLLECTION)
 
 
 class Week:
     """Week model representing a weekly assignment."""
     
     @staticmethod
-    def create(category_id, week_number, title, display_name=None, description=None, 
-               assignment_url=None, due_date=None, is_active=True):
-        """Create a new week."""
-        db = get_firestore_client()
+    def create(category_id, week_number, title, display_name=None, description=None,
+               assignment_url=None, due_date=None, is_active=True, batch=None):
+        """Create a new week.
+        
+        The week and its week_numbers index entry are written in one batch,
+        and the index entry is create-only, so two concurrent creates of the
+        same category/week number cannot both succeed: the loser gets
+        AlreadyExists. Bulk imports pass a ``batch`` to add to instead: the
+        caller commits (AlreadyExists is raised then), and afterwards
+        invalidates the week caches and bumps the weeks generation once for
+        the whole batch.
+        """
+        db = get_backend()
         week_data = {
             'category_id': category_id,
             'week_number': week_number,
@@ -146,151 +501,510 @@ class Week:
             'is_active': is_active,
             'created_at': datetime.utcnow()
         }
-        doc_ref = db.collection(WEEKS_COLLECTION).document()
-        doc_ref.set(week_data)
-        return {'id': doc_ref.id, **week_data}
+        week_id = db.new_id()
+        key = week_number_key(category_id, week_number)
+        commit = batch is None
+        if commit:
+            batch = db.batch()
+        batch.create(WEEK_NUMBERS_COLLECTION, key, {
+            'week_id': week_id,
+            'category_id': category_id,
+            'week_number': week_number,
+        })
+        batch.set(WEEKS_COLLECTION, week_id, week_data)
+        if commit:
+            batch.commit()
+        identity_map.put(WEEKS_COLLECTION, week_id, {'id': week_id, **week_data})
+        identity_map.forget(WEEK_NUMBERS_COLLECTION, key)
+        if commit:
+            read_cache.invalidate(WEEKS_COLLECTION, week_id)
+            read_cache.invalidate(WEEK_NUMBERS_COLLECTION, key)
+            read_cache.invalidate(WEEKS_BY_CATEGORY, category_id)
+            generations.bump(WEEKS_COLLECTION)
+        return {'id': week_id, **week_data}
     
     @staticmethod
     def get_all():
-        """Get all weeks."""
-        db = get_firestore_client()
-        weeks = []
-        # Fetch all weeks without ordering to avoid composite index requirement
-        docs = db.collection(WEEKS_COLLECTION).stream()
-        for doc in docs:
-            data = doc.to_dict()
-            data['id'] = doc.id
-            weeks.append(data)
-        
-        # Sort client-side to avoid Firestore composite index requirement
-        weeks.sort(key=lambda w: (w.get('category_id', ''), w.get('week_number', 0)))
+        """Get all weeks, ordered by category and week number."""
+        db = get_backend()
+        # Ordered by the database once the composite index is deployed
+        # (see query_plans); until then fetch unordered and sort here.
+        order_by = query_plans.order_by('weeks_ordered')
+        weeks = list(db.query(WEEKS_COLLECTION, order_by=order_by or ()))
+        if order_by is None:
+            weeks = query_plans.sort('weeks_ordered', weeks)
         return weeks
     
+    @staticmethod
+    def stream():
+        """Stream all weeks, ordered by category and week number.
+        
+        Sorted in Python (so read in full) until the weeks_ordered index is deployed.
+        """
+        order_by = query_plans.order_by('weeks_ordered')
+        if order_by is None:
+            return iter(Week.get_all())
+        return get_backend().query(WEEKS_COLLECTION, order_by=order_by)
+    
     @staticmethod
     def get_by_category(category_id):
-        """Get all weeks for a category."""
-        db = get_firestore_client()
-        weeks = []
-        # Avoid Firestore composite index requirement by fetching then sorting client-side.
-        docs = db.collection(WEEKS_COLLECTION).where('category_id', '==', category_id).stream()
-        for doc in docs:
-            data = doc.to_dict()
-            data['id'] = doc.id
-            weeks.append(data)
-        # Sort by week_number in Python to preserve expected order.
-        return sorted(weeks, key=lambda w: w.get('week_number', 0))
+        """Get all weeks for a category (cached)."""
+        db = get_backend()
+
+        def load():
+            order_by = query_plans.order_by('weeks_by_category')
+            weeks = list(db.query(WEEKS_COLLECTION, filters=[('category_id', '==', category_id)],
+                                  order_by=order_by or ()))
+            if order_by is None:
+                weeks = query_plans.sort('weeks_by_category', weeks)
+            return weeks
+
+        return read_cache.get_or_load(WEEKS_BY_CATEGORY, category_id, load)
     
     @staticmethod
     def get_by_id(week_id):
-        """Get week by ID."""
-        db = get_firestore_client()
-        doc = db.collection(WEEKS_COLLECTION).document(week_id).get()
-        if doc.exists:
-            data = doc.to_dict()
-            data['id'] = doc.id
-            return data
-        return None
+        """Get week by ID (cached)."""
+        return _get_document(WEEKS_COLLECTION, week_id)
+    
+    @staticmethod
+    def get_many(week_ids):
+        """Get several weeks by ID in one batched read (cached). Returns {id: week}."""
+        db = get_backend()
+        return read_cache.get_many_or_load(WEEKS_COLLECTION, week_ids,
+                                           lambda ids: db.get_many(WEEKS_COLLECTION, ids))
     
     @staticmethod
     def get_by_category_and_number(category_id, week_number):
-        """Get week by category and week number."""
-        db = get_firestore_client()
-        weeks = db.collection(WEEKS_COLLECTION)\
-            .where('category_id', '==', category_id)\
-            .where('week_number', '==', week_number)\
-            .limit(1).stream()
-        for week in weeks:
-            data = week.to_dict()
-            data['id'] = week.id
-            return data
-        return None
+        """Get week by category and week number.
+        
+        Resolves through the week_numbers index (two cached document gets).
+        Weeks created before the index existed fall back to a query until
+        migrate_week_numbers has run.
+        """
+        db = get_backend()
+
+        def load():
+            entry = _get_document(WEEK_NUMBERS_COLLECTION, week_number_key(category_id, week_number))
+            if entry:
+                return Week.get_by_id(entry['week_id'])
+            weeks = db.query(WEEKS_COLLECTION, filters=[
+                ('category_id', '==', category_id),
+                ('week_number', '==', week_number),
+            ], limit=1)
+            for week in weeks:
+                return week
+            return None
+
+        return flights.do(('week_by_number', category_id, week_number), load)
+    
+    @staticmethod
+    def get_many_by_number(pairs):
+        """Resolve (category_id, week_number) pairs with batched reads. Returns {pair: week}.
+        
+        Reads the week_numbers index entries and then the weeks in one
+        call each; pairs missing from the index (weeks created before it)
+        fall back to get_by_category_and_number.
+        """
+        db = get_backend()
+        pairs = list(dict.fromkeys(pairs))
+        keys = {week_number_key(*pair): pair for pair in pairs}
+        entries = read_cache.get_many_or_load(WEEK_NUMBERS_COLLECTION, keys,
+                                              lambda ids: db.get_many(WEEK_NUMBERS_COLLECTION, ids))
+        weeks = Week.get_many(entry['week_id'] for entry in entries.values())
+        found = {}
+        for key, pair in keys.items():
+            entry = entries.get(key)
+            week = weeks.get(entry['week_id']) if entry else Week.get_by_category_and_number(*pair)
+            if week is not None:
+                found[pair] = week
+        return found
     
     @staticmethod
     def update(week_id, **kwargs):
-        """Update a week."""
-        db = get_firestore_client()
-        doc_ref = db.collection(WEEKS_COLLECTION).document(week_id)
+        """Update a week.
+        
+        Moving a week to another category also rewrites the denormalized
+        category_id on its submissions. Changing category or week number
+        moves the week_numbers index entry in the same batch, raising
+        AlreadyExists if the target slot is taken.
+        """
+        db = get_backend()
         update_data = {k: v for k, v in kwargs.items() if v is not None}
         if update_data:
-            doc_ref.update(update_data)
+            current = Week.get_by_id(week_id)
+            if current is None:
+                raise NotFound(f"{WEEKS_COLLECTION}/{week_id}")
+            old_key = week_number_key(current.get('category_id'), current.get('week_number'))
+            category_id = update_data.get('category_id', current.get('category_id'))
+            week_number = update_data.get('week_number', current.get('week_number'))
+            new_key = week_number_key(category_id, week_number)
+            batch = db.batch()
+            if category_id != current.get('category_id'):
+                # Move the week's submission counts to the new category
+                counts = SubmissionStats.for_weeks([week_id])[week_id]
+                _count_submission(batch, {'category_id': current.get('category_id')},
+                                  _count_deltas(counts, -1))
+                _count_submission(batch, {'category_id': category_id}, _count_deltas(counts, 1))
+            if new_key != old_key:
+                batch.create(WEEK_NUMBERS_COLLECTION, new_key, {
+                    'week_id': week_id,
+                    'category_id': category_id,
+                    'week_number': week_number,
+                })
+                batch.delete(WEEK_NUMBERS_COLLECTION, old_key)
+            batch.update(WEEKS_COLLECTION, week_id, update_data)
+            batch.commit()
+            for key in {old_key, new_key}:
+                identity_map.forget(WEEK_NUMBERS_COLLECTION, key)
+                read_cache.invalidate(WEEK_NUMBERS_COLLECTION, key)
+            if 'category_id' in update_data:
+                Submission.set_category_for_week(week_id, update_data['category_id'])
+            identity_map.merge(WEEKS_COLLECTION, week_id, update_data)
+            read_cache.invalidate(WEEKS_COLLECTION, week_id)
+            # The week may have moved category; per-category lists are cheap to rebuild.
+            read_cache.invalidate(WEEKS_BY_CATEGORY)
+            generations.bump(WEEKS_COLLECTION)
         return Week.get_by_id(week_id)
     
     @staticmethod
     def delete(week_id):
-        """Delete a week and all its submissions."""
-        db = get_firestore_client()
-        # Delete all submissions for this week
-        submissions = db.collection(SUBMISSIONS_COLLECTION).where('week_id', '==', week_id).stream()
-        for submission in submissions:
-            submission.reference.delete()
-        # Delete week
-        db.collection(WEEKS_COLLECTION).document(week_id).delete()
+        """Delete a week and all its submissions.
+        
+        Returns the number of documents deleted (see Category.delete).
+        """
+        db = get_backend()
+        week = Week.get_by_id(week_id) or {'id': week_id}
+        counts = SubmissionStats.for_weeks([week_id])[week_id]
+        deleted = db.bulk_delete(_week_documents(week))
+        if week.get('category_id') and counts['total']:
+            # The week's submissions no longer count towards its category
+            batch = db.batch()
+            _count_submission(batch, {'category_id': week['category_id']}, _count_deltas(counts, -1))
+            batch.commit()
+        identity_map.put(WEEKS_COLLECTION, week_id, None)
+        read_cache.invalidate(WEEKS_COLLECTION, week_id)
+        read_cache.invalidate(WEEK_NUMBERS_COLLECTION)
+        read_cache.invalidate(WEEKS_BY_CATEGORY)
+        generations.bump(SUBMISSIONS_COLLECTION)
+        generations.bump(WEEKS_COLLECTION)
+        return deleted
 
 
 class Submission:
-    """Submission model for student work."""
+    """Submission model for student work.
+    
+    Where documents live depends on SUBMISSIONS_LAYOUT (see configure_models).
+    """
     
     @staticmethod
-    def create(week_id, student_name, project_url, status='pending'):
-        """Create a new submission."""
-        db = get_firestore_client()
+    def create(week_id, student_name, project_url, status='pending', category_id=None,
+               upsert=None, submission_id=None, submitted_at=None, ingest_id=None, batch=None):
+        """Create a new submission.
+        
+        category_id is denormalized from the week so submissions can be
+        filtered by class with an indexed query.
+        
+        In upsert mode (``upsert=True``, default from SUBMISSIONS_UPSERT) a
+        student has one submission per week, stored under an ID derived from
+        the week and normalized student name. A resubmission replaces it and
+        the previous version is copied to its history subcollection.
+        
+        The ingest pipeline (see ingest.py) passes the ID, time and its log
+        entry ID it already acknowledged, plus a ``batch`` to group-commit
+        into. The caller commits it and then passes the returned submissions
+        to ``add_to_search``, so nothing but the batch runs before the
+        commit. Replaying an entry that was already
+        written is a no-op in upsert mode and fails with AlreadyExists at
+        commit otherwise, so counters are never applied twice.
+        
+        Upserts are written with preconditions: a first version is created
+        only if the document does not exist, and a resubmission creates the
+        history copy under its version number. Of two concurrent
+        resubmissions that read the same version, the second fails with
+        AlreadyExists and nothing of it is applied. When create commits
+        itself it then re-reads and retries (UPSERT_ATTEMPTS in all).
+        """
+        db = get_backend()
+        if upsert is None:
+            upsert = _submissions_upsert
+        if category_id is None:
+            week = Week.get_by_id(week_id)
+            category_id = week.get('category_id') if week else None
         submission_data = {
             'week_id': week_id,
+            'category_id': category_id,
             'student_name': student_name,
+            'student_key': normalize_student_name(student_name),
             'project_url': project_url,
             'status': status,
             'admin_comment': None,
-            'submitted_at': datetime.utcnow(),
+            'submitted_at': submitted_at or datetime.utcnow(),
             'modified_by': None
         }
-        doc_ref = db.collection(SUBMISSIONS_COLLECTION).document()
-        doc_ref.set(submission_data)
-        return {'id': doc_ref.id, **submission_data}
+        if ingest_id is not None:
+            submission_data['ingest_id'] = ingest_id
+        if batch is not None:
+            submission, changed = _add_submission(batch, dict(submission_data), upsert,
+                                                  submission_id, ingest_id)
+            if changed:
+                identity_map.put(SUBMISSIONS_COLLECTION, submission['id'], submission)
+            return submission
+        for attempt in range(UPSERT_ATTEMPTS):
+            batch = db.batch()
+            submission, changed = _add_submission(batch, dict(submission_data), upsert,
+                                                  submission_id, ingest_id)
+            if not changed:
+                return submission
+            try:
+                batch.commit()
+                break
+            except AlreadyExists:
+                # Upsert: a concurrent submission by the same student committed
+                # first; re-read it and apply this one on top
+                if not upsert or attempt == UPSERT_ATTEMPTS - 1:
+                    raise
+        identity_map.put(SUBMISSIONS_COLLECTION, submission['id'], submission)
+        _update_search(submission_search.put, submission)
+        # New submissions do not bump the generation: at deadline time every
+        # student would contend on one counter document (the sharded
+        # submission counters exist for the same reason). Caches of submission
+        # data must treat creates as append-only and rely on their TTL.
+        return submission
+    
+    @staticmethod
+    def add_to_search(submissions):
+        """Index submissions created with a caller's ``batch``, once it has committed."""
+        for submission in submissions:
+            _update_search(submission_search.put, submission)
     
     @staticmethod
     def get_all():
         """Get all submissions."""
-        db = get_firestore_client()
-        submissions = []
-        docs = db.collection(SUBMISSIONS_COLLECTION).order_by('submitted_at', direction='DESCENDING').stream()
-        for doc in docs:
-            data = doc.to_dict()
-            data['id'] = doc.id
-            submissions.append(data)
-        return submissions
+        return list(_query_submissions(order_by=NEWEST_FIRST))
+    
+    @staticmethod
+    def stream(since=None, filters=()):
+        """Stream submissions newest first, optionally only those submitted after ``since``.
+        
+        ``filters`` are equality filters such as [('week_id', '==', week_id)].
+        If the composite index for them is not deployed yet (see
+        query_plans), the matches are read in full and sorted here instead.
+        """
+        filters = list(filters)
+        shape = query_plans.find(SUBMISSIONS_COLLECTION, filters, NEWEST_FIRST)
+        if since is not None:
+            filters.append(('submitted_at', '>', since))
+        if (shape is not None and query_plans.QUERY_SHAPES[shape].equality
+                and query_plans.order_by(shape) is None and not _sharded_reads(filters)):
+            return iter(query_plans.sort(shape, _query_submissions(filters=filters)))
+        return _query_submissions(filters=filters, order_by=NEWEST_FIRST)
     
     @staticmethod
-    def get_by_week(week_id):
-        """Get all submissions for a week."""
-        db = get_firestore_client()
+    def get_page(filters=(), limit=50, start_after=None, read_time=None):
+        """Get one page of submissions, newest first.
+        
+        ``filters`` are equality filters on PAGE_FILTERS fields, e.g.
+        [('week_id', '==', week_id)]. Returns (submissions, next_position);
+        next_position is the sort position to pass as ``start_after`` for the
+        following page, or None on the last page. With ``read_time``, pages
+        show the data as of that moment on backends that support it (see
+        StorageBackend.query).
+        
+        Only the first filter in PAGE_FILTERS order goes to the database, so
+        every page runs as a declared (field, submitted_at DESC) query shape
+        whatever the combination; the others are checked here, reading on in
+        batches of PAGE_SCAN until the page is full.
+        """
+        if any(op != '==' or field not in PAGE_FILTERS for field, op, _ in filters):
+            raise ValueError(f"Submission pages filter by equality on {', '.join(PAGE_FILTERS)} only")
+        filters = sorted(filters, key=lambda f: PAGE_FILTERS.index(f[0]))
+        pushed, checked = filters[:1], filters[1:]
+        scan = limit + 1 if not checked else max(limit + 1, PAGE_SCAN)
         submissions = []
-        # NOTE: Avoid Firestore composite index requirements by not combining
-        # a filter (where) with an order_by on another field. We'll sort in Python.
-        docs = db.collection(SUBMISSIONS_COLLECTION)\
-            .where('week_id', '==', week_id).stream()
-        for doc in docs:
-            data = doc.to_dict()
-            data['id'] = doc.id
-            submissions.append(data)
+        while len(submissions) <= limit:
+            batch = list(_query_submissions(
+                filters=pushed,
+                order_by=NEWEST_FIRST,
+                limit=scan,
+                start_after=start_after,
+                read_time=read_time,
+            ))
+            submissions += [s for s in batch if all(s.get(field) == value for field, _, value in checked)]
+            if len(batch) < scan:
+                break
+            start_after = _page_position(batch[-1])
+        if len(submissions) <= limit:
+            return submissions, None
+        submissions = submissions[:limit]
+        return submissions, _page_position(submissions[-1])
+    
+    @staticmethod
+    def get_by_week(week_id, limit=None):
+        """Get a week's submissions, newest first (the newest ``limit`` if given)."""
+        db = get_backend()
+
+        def load():
+            submissions = {}
+            for collection, filters in _week_submission_sources(week_id):
+                if _sharded_reads(filters):
+                    found = _merge_shards(
+                        lambda shard_filters: db.query(collection, filters=shard_filters,
+                                                       order_by=NEWEST_FIRST, limit=limit),
+                        filters, limit)
+                    for submission in found:
+                        submissions.setdefault(submission['id'], submission)
+                    continue
+                # A week's own subcollection orders on a single-field index;
+                # the flat collection needs the composite one (see query_plans).
+                if filters:
+                    order_by = query_plans.order_by('submissions_by_week')
+                else:
+                    order_by = NEWEST_FIRST
+                found = db.query(collection, filters=filters, order_by=order_by or (),
+                                 limit=limit if order_by else None)
+                for submission in found:
+                    submissions.setdefault(submission['id'], submission)
+            # Also merges the two sources in the dual layout
+            return query_plans.sort('submissions_by_week', submissions.values(), limit)
+
+        return flights.do(('submissions_by_week', week_id, limit), load)
+    
+    @staticmethod
+    def get_by_category(category_id, limit=None):
+        """Get a category's (class's) submissions, newest first (the newest ``limit`` if given)."""
+        filters = [('category_id', '==', category_id)]
+        order_by = query_plans.order_by('submissions_by_category')
+        if _sharded_reads(filters):
+            order_by = NEWEST_FIRST
+        submissions = _query_submissions(filters=filters, order_by=order_by or (),
+                                         limit=limit if order_by else None)
+        if order_by is None:
+            return query_plans.sort('submissions_by_category', submissions, limit)
+        return list(submissions)
+    
+    @staticmethod
+    def get_by_category_since(category_id, since):
+        """Get a category's submissions submitted after ``since``, newest first.
+        
+        Uses the same (category_id, submitted_at DESC) index as get_page;
+        without it, reads the whole category and filters here.
+        """
+        if (query_plans.order_by('submissions_by_category') is None
+                and not _sharded_reads([('category_id', '==', category_id)])):
+            return [s for s in Submission.get_by_category(category_id)
+                    if s.get('submitted_at') is not None and s['submitted_at'] > since]
+        return list(_query_submissions(
+            filters=[('category_id', '==', category_id), ('submitted_at', '>', since)],
+            order_by=NEWEST_FIRST,
+        ))
+    
+    @staticmethod
+    def get_by_student(category_id, student_name):
+        """Get a student's submissions across all weeks of a category, newest first.
+        
+        One query on the student's index subcollection; the student name is
+        matched after normalization (whitespace and case do not matter).
+        """
+        db = get_backend()
+        submissions = list(db.query(student_entries_collection(category_id, student_name)))
         submissions.sort(key=lambda s: s.get('submitted_at') or datetime.min, reverse=True)
         return submissions
     
+    @staticmethod
+    def index_week(week_id):
+        """Add a week's submissions to the per-student index. Returns the number indexed.
+        
+        Also fills in student_key on submissions created before it existed.
+        Safe to re-run.
+        """
+        db = get_backend()
+        indexed = 0
+        batch = db.batch()
+        for collection, filters in _week_submission_sources(week_id):
+            for submission in db.query(collection, filters=filters):
+                submission_data = {k: v for k, v in submission.items() if k != 'id'}
+                if submission.get('student_name') and 'student_key' not in submission:
+                    submission_data['student_key'] = normalize_student_name(submission['student_name'])
+                    batch.update(collection, submission['id'],
+                                 {'student_key': submission_data['student_key']})
+                    identity_map.forget(SUBMISSIONS_COLLECTION, submission['id'])
+                if _index_student_submission(batch, submission['id'], submission_data):
+                    indexed += 1
+                if len(batch) >= MAX_BATCH_SIZE - 1:
+                    batch.commit()
+        batch.commit()
+        return indexed
+    
+    @staticmethod
+    def assign_shards(week_id):
+        """Set the index shard on a week's submissions. Returns the number updated.
+        
+        Needed once for submissions created before SUBMISSION_SHARDS was set,
+        and again after changing it. Safe to re-run.
+        """
+        db = get_backend()
+        updated = 0
+        batch = db.batch()
+        for collection, filters in _week_submission_sources(week_id):
+            for submission in db.query(collection, filters=filters):
+                shard = submission_shard(submission['id'])
+                if submission.get('shard') == shard:
+                    continue
+                batch.update(collection, submission['id'], {'shard': shard})
+                identity_map.forget(SUBMISSIONS_COLLECTION, submission['id'])
+                updated += 1
+                if len(batch) >= MAX_BATCH_SIZE:
+                    batch.commit()
+        batch.commit()
+        return updated
+    
+    @staticmethod
+    def set_category_for_week(week_id, category_id):
+        """Rewrite category_id on every submission of a week. Returns the number updated."""
+        db = get_backend()
+        updated = 0
+        batch = db.batch()
+        for collection, filters in _week_submission_sources(week_id):
+            for submission in db.query(collection, filters=filters):
+                if submission.get('category_id') == category_id:
+                    continue
+                batch.update(collection, submission['id'], {'category_id': category_id})
+                # Move the student index entry to the new category
+                _unindex_student_submission(batch, submission)
+                _index_student_submission(batch, submission['id'], {
+                    **{k: v for k, v in submission.items() if k != 'id'},
+                    'category_id': category_id,
+                })
+                identity_map.forget(SUBMISSIONS_COLLECTION, submission['id'])
+                _update_search(submission_search.put, {**submission, 'category_id': category_id})
+                updated += 1
+                if len(batch) >= MAX_BATCH_SIZE - 2:
+                    batch.commit()
+        batch.commit()
+        if updated:
+            generations.bump(SUBMISSIONS_COLLECTION)
+        return updated
+    
     @staticmethod
     def get_by_id(submission_id):
         """Get submission by ID."""
-        db = get_firestore_client()
-        doc = db.collection(SUBMISSIONS_COLLECTION).document(submission_id).get()
-        if doc.exists:
-            data = doc.to_dict()
-            data['id'] = doc.id
-            return data
-        return None
+        db = get_backend()
+
+        def load():
+            if _submissions_layout != 'flat':
+                nested = db.query(SUBMISSIONS_COLLECTION, group=True, limit=1,
+                                  filters=[('submission_id', '==', submission_id)])
+                for submission in nested:
+                    return submission
+            # Flat layout, or a document not migrated yet
+            return db.get(SUBMISSIONS_COLLECTION, submission_id)
+
+        return identity_map.get_or_load(SUBMISSIONS_COLLECTION, submission_id, load)
     
     @staticmethod
     def update(submission_id, status=None, admin_comment=None, modified_by=None):
         """Update a submission."""
-        db = get_firestore_client()
-        doc_ref = db.collection(SUBMISSIONS_COLLECTION).document(submission_id)
+        db = get_backend()
         update_data = {}
         if status is not None:
             update_data['status'] = status
@@ -299,11 +1013,249 @@ class Submission:
         if modified_by is not None:
             update_data['modified_by'] = modified_by
         if update_data:
-            doc_ref.update(update_data)
+            current = Submission.get_by_id(submission_id)
+            if current is None:
+                raise NotFound(f"{SUBMISSIONS_COLLECTION}/{submission_id}")
+            batch = db.batch()
+            batch.update(_submission_collection(current), submission_id, update_data)
+            _index_student_submission(batch, submission_id, {
+                **{k: v for k, v in current.items() if k != 'id'},
+                **update_data,
+            })
+            if status is not None:
+                _count_submission(batch, current, status_deltas(removed=current.get('status'),
+                                                                added=status))
+            batch.commit()
+            identity_map.merge(SUBMISSIONS_COLLECTION, submission_id, update_data)
+            _update_search(submission_search.put, {**current, **update_data})
+            generations.bump(SUBMISSIONS_COLLECTION)
         return Submission.get_by_id(submission_id)
     
     @staticmethod
     def delete(submission_id):
         """Delete a submission."""
-        db = get_firestore_client()
-        db.collection(SUBMISSIONS_COLLECTION).document(submission_id).delete()
+        db = get_backend()
+        current = Submission.get_by_id(submission_id)
+        if current is None:
+            return
+        collection = _submission_collection(current)
+        db.bulk_delete(_history_documents(current, collection))
+        batch = db.batch()
+        batch.delete(collection, submission_id)
+        _unindex_student_submission(batch, current)
+        _count_submission(batch, current, status_deltas(total=-1, removed=current.get('status')))
+        batch.commit()
+        identity_map.put(SUBMISSIONS_COLLECTION, submission_id, None)
+        _update_search(submission_search.discard, submission_id)
+        generations.bump(SUBMISSIONS_COLLECTION)
+    
+    @staticmethod
+    def get_history(submission_id):
+        """Get the earlier versions of an upserted submission, newest first."""
+        db = get_backend()
+        current = Submission.get_by_id(submission_id)
+        if current is None or current.get('version', 1) <= 1:
+            return []
+        collection = f"{_submission_collection(current)}/{submission_id}/{HISTORY_COLLECTION}"
+        history = list(db.query(collection))
+        history.sort(key=lambda s: s.get('submitted_at') or datetime.min, reverse=True)
+        return history
+
+
+def _update_search(apply, arg):
+    """Apply a write to the search index, which must never fail a committed write."""
+    try:
+        apply(arg)
+    except Exception as e:
+        logger.warning(f"Search index update failed: {e}")
+
+
+def _history_documents(submission, collection):
+    """Yield (collection, doc_id) for the history of an upserted submission."""
+    if submission.get('version', 1) <= 1:
+        return
+    history_collection = f"{collection}/{submission['id']}/{HISTORY_COLLECTION}"
+    for version in get_backend().query(history_collection):
+        yield history_collection, version['id']
+
+
+def _week_documents(week):
+    """Yield (collection, doc_id) for a week and everything stored under it.
+    
+    Used to feed cascade deletes; submissions are dropped from the request
+    identity map as they are listed.
+    """
+    db = get_backend()
+    week_id = week['id']
+    for collection, filters in _week_submission_sources(week_id):
+        for submission in db.query(collection, filters=filters):
+            yield from _history_documents(submission, collection)
+            if submission.get('category_id') and submission.get('student_name'):
+                yield (student_entries_collection(submission['category_id'],
+                                                  submission['student_name']), submission['id'])
+            identity_map.forget(SUBMISSIONS_COLLECTION, submission['id'])
+            _update_search(submission_search.discard, submission['id'])
+            yield collection, submission['id']
+    if 'week_number' in week:
+        key = week_number_key(week.get('category_id'), week['week_number'])
+        entry = db.get(WEEK_NUMBERS_COLLECTION, key)
+        if entry and entry.get('week_id') == week_id:
+            identity_map.forget(WEEK_NUMBERS_COLLECTION, key)
+            yield WEEK_NUMBERS_COLLECTION, key
+    for shard_id in _counter_shard_ids('week', week_id):
+        yield SUBMISSION_COUNTS_COLLECTION, shard_id
+    yield WEEKS_COLLECTION, week_id
+
+
+def _index_student_submission(batch, submission_id, submission_data):
+    """Add a set of the submission's per-student index entry to a batch.
+    
+    The entry is a full copy, so a student's submissions come back from one
+    read. Returns False for submissions without a category or student name.
+    """
+    if not submission_data.get('category_id') or not submission_data.get('student_name'):
+        return False
+    collection = student_entries_collection(submission_data['category_id'],
+                                            submission_data['student_name'])
+    batch.set(collection, submission_id, submission_data)
+    return True
+
+
+def _unindex_student_submission(batch, submission):
+    """Add a delete of the submission's per-student index entry to a batch."""
+    if submission.get('category_id') and submission.get('student_name'):
+        batch.delete(student_entries_collection(submission['category_id'],
+                                                submission['student_name']), submission['id'])
+
+
+def status_deltas(total=0, removed=None, added=None):
+    """Counter deltas for a submission added/removed (total) or changing status."""
+    deltas = {'total': total}
+    if removed != added:
+        if removed is not None:
+            deltas[f"status_{removed}"] = -1
+        if added is not None:
+            deltas[f"status_{added}"] = 1
+    return {field: amount for field, amount in deltas.items() if amount}
+
+
+def _counter_shard_ids(scope, scope_id):
+    return [f"{scope}:{scope_id}:{shard}" for shard in range(_counter_shards)]
+
+
+def _count_submission(batch, submission, deltas):
+    """Add the week and category counter increments for a submission to a batch."""
+    if not deltas:
+        return
+    shard = random.randrange(_counter_shards)
+    if submission.get('week_id'):
+        batch.increment(SUBMISSION_COUNTS_COLLECTION, f"week:{submission['week_id']}:{shard}", deltas)
+    if submission.get('category_id'):
+        batch.increment(SUBMISSION_COUNTS_COLLECTION,
+                        f"category:{submission['category_id']}:{shard}", deltas)
+
+
+class SubmissionStats:
+    """Per-week and per-category submission counts by status.
+    
+    Counters are kept up to date by the Submission write methods, in the same
+    batch as the submission itself. Each counter is spread over COUNTER_SHARDS
+    documents so a deadline rush does not contend on one document; readers
+    sum the shards. ``reconcile_*`` recounts with count() aggregations.
+    """
+    
+    @staticmethod
+    def _read(scope, scope_ids):
+        """Sum the counter shards of several weeks or categories. Returns {id: counts}."""
+        scope_ids = list(dict.fromkeys(scope_ids))
+        shard_ids = [shard_id for scope_id in scope_ids for shard_id in _counter_shard_ids(scope, scope_id)]
+        shards = get_backend().get_many(SUBMISSION_COUNTS_COLLECTION, shard_ids)
+        totals = {scope_id: {} for scope_id in scope_ids}
+        for shard_id, shard in shards.items():
+            fields = totals[shard_id.split(':', 1)[1].rsplit(':', 1)[0]]
+            for field, amount in shard.items():
+                if field != 'id':
+                    fields[field] = fields.get(field, 0) + amount
+        return {scope_id: _format_counts(fields) for scope_id, fields in totals.items()}
+    
+    @staticmethod
+    def for_weeks(week_ids):
+        """Counts for several weeks. Returns {week_id: counts}."""
+        return SubmissionStats._read('week', week_ids)
+    
+    @staticmethod
+    def for_categories(category_ids):
+        """Counts for several categories. Returns {category_id: counts}."""
+        return SubmissionStats._read('category', category_ids)
+    
+    @staticmethod
+    def _store(scope, scope_id, counts):
+        """Replace a counter with exact counts (shard 0 holds them, the rest are cleared)."""
+        db = get_backend()
+        batch = db.batch()
+        fields = {'total': counts['total']}
+        fields.update({f"status_{status}": n for status, n in counts['by_status'].items()})
+        for shard, shard_id in enumerate(_counter_shard_ids(scope, scope_id)):
+            if shard == 0:
+                batch.set(SUBMISSION_COUNTS_COLLECTION, shard_id, fields)
+            else:
+                batch.delete(SUBMISSION_COUNTS_COLLECTION, shard_id)
+        batch.commit()
+    
+    @staticmethod
+    def reconcile_week(week_id):
+        """Recount a week's submissions with count() aggregations and store the result.
+        
+        Writes landing while this runs may be lost from the counter; run it
+        again if that matters. In the dual layout, submissions copied but not
+        yet deleted from the flat collection are counted twice.
+        """
+        db = get_backend()
+        current = SubmissionStats.for_weeks([week_id])[week_id]
+        statuses = dict.fromkeys(SUBMISSION_STATUSES + tuple(current['by_status']))
+        counts = {'total': 0, 'by_status': {status: 0 for status in statuses}}
+        for collection, filters in _week_submission_sources(week_id):
+            counts['total'] += db.count(collection, filters=filters)
+            for status in statuses:
+                counts['by_status'][status] += db.count(
+                    collection, filters=[*filters, ('status', '==', status)])
+        SubmissionStats._store('week', week_id, counts)
+        return counts
+    
+    @staticmethod
+    def reconcile_category(category_id):
+        """Reconcile every week of a category; the category counter becomes their sum."""
+        counts = {'total': 0, 'by_status': {status: 0 for status in SUBMISSION_STATUSES}}
+        for week in Week.get_by_category(category_id):
+            week_counts = SubmissionStats.reconcile_week(week['id'])
+            counts['total'] += week_counts['total']
+            for status, n in week_counts['by_status'].items():
+                counts['by_status'][status] = counts['by_status'].get(status, 0) + n
+        SubmissionStats._store('category', category_id, counts)
+        return counts
+
+
+def _count_deltas(counts, sign):
+    """Counter deltas adding (sign=1) or subtracting (sign=-1) a set of counts."""
+    deltas = {'total': sign * counts['total']}
+    deltas.update({f"status_{status}": sign * n for status, n in counts['by_status'].items()})
+    return {field: amount for field, amount in deltas.items() if amount}
+
+
+def _format_counts(fields):
+    """Turn counter fields into {'total': n, 'by_status': {status: n}}."""
+    by_status = {status: 0 for status in SUBMISSION_STATUSES}
+    for field, amount in fields.items():
+        if field.startswith('status_'):
+            by_status[field[len('status_'):]] = amount
+    return {'total': fields.get('total', 0), 'by_status': by_status}
+
+
+def load_related(records, foreign_key, model):
+    """Batch-load the documents referenced by ``record[foreign_key]``.
+    
+    Collects and de-duplicates the referenced IDs and fetches them with a
+    single multi-document read via ``model.get_many``, instead of one lookup
+    per record. Returns {id: document} for handlers to attach as needed.
+    """
+    return model.get_many(record.get(foreign_key) for record in records)
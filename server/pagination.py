@@ -0,0 +1,65 @@
+"""Opaque cursor pagination helpers for list endpoints.
+
+A cursor encodes the sort position of the last item on a page (its
+``submitted_at`` and document ID) as URL-safe base64 JSON. Clients treat it
+as an opaque string and pass it back as ``?cursor=`` to fetch the next page.
+"""
+from __future__ import annotations
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+
+from flask import current_app, request
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a malformed cursor or page size."""
+
+
+def encode_cursor(position: dict) -> str:
+    """Encode a sort position (field values plus ``id``) as an opaque cursor."""
+    payload = {}
+    for key, value in position.items():
+        if isinstance(value, datetime):
+            payload[key] = {'dt': value.isoformat()}
+        else:
+            payload[key] = value
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> dict:
+    """Decode a cursor produced by ``encode_cursor``."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, dict) or 'id' not in payload:
+            raise ValueError('missing id')
+        position = {}
+        for key, value in payload.items():
+            if isinstance(value, dict) and 'dt' in value:
+                value = datetime.fromisoformat(value['dt'])
+            position[key] = value
+        return position
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor('Invalid cursor') from e
+
+
+def wants_page() -> bool:
+    """True when the client asked for a paginated response."""
+    return 'limit' in request.args or 'cursor' in request.args
+
+
+def page_args() -> tuple[int, Optional[dict]]:
+    """Parse ``limit`` and ``cursor`` query params within configured bounds."""
+    default_size = current_app.config.get('PAGE_SIZE_DEFAULT', 50)
+    max_size = current_app.config.get('PAGE_SIZE_MAX', 200)
+    try:
+        limit = int(request.args.get('limit', default_size))
+    except ValueError as e:
+        raise InvalidCursor('limit must be an integer') from e
+    if limit < 1 or limit > max_size:
+        raise InvalidCursor(f'limit must be between 1 and {max_size}')
+    cursor = request.args.get('cursor')
+    return limit, decode_cursor(cursor) if cursor else None
@@ -0,0 +1,191 @@
+"""Declared query shapes and the Firestore indexes they need.
+
+Every query that filters on one field and orders by another, or orders by
+several fields, is declared here as a ``QueryShape``. The shapes are the
+single source for the checked-in ``firestore.indexes.json``; regenerate it
+after changing them:
+
+  python -m server.scripts.generate_firestore_indexes
+
+Firestore rejects such a query until its composite index has been built,
+so a shape is only run with server-side ``order_by`` and ``limit`` once it
+is listed in ``FIRESTORE_INDEXES`` (or that is ``all``), i.e. after
+``firebase deploy --only firestore:indexes`` has finished. Until then the
+models fetch the full result set and sort it in Python, as they always
+have. Backends without composite index requirements (SQLite, memory)
+always use the ordered query.
+
+Ordered submission queries, and equality-filtered collection-group reads
+(which need a single-field override), are checked against the declared
+shapes on every backend (see ``require``), so a query with no index in the
+manifest fails with UndeclaredQuery in development and tests instead of
+with FAILED_PRECONDITION on Firestore. Callers that combine filters (submission
+pages) send one declared shape and check the other filters in Python.
+
+Each newest-first submissions shape also has a ``_sharded`` variant with an
+equality filter on ``shard`` (see ``SUBMISSION_SHARDS`` in models.py).
+Prefixing the index with the shard spreads deadline-time writes over several
+key ranges instead of appending them all at the end of one. A sharded
+deployment generates its manifest with ``--sharded``, which leaves out the
+unsharded submission indexes and exempts ``submitted_at`` from single-field
+indexing, so no index is ordered by submission time alone.
+"""
+from __future__ import annotations
+from typing import NamedTuple, Optional
+
+from .storage import get_backend, ASCENDING, DESCENDING
+
+class UndeclaredQuery(ValueError):
+    """Raised for an ordered query that matches no declared shape (and so has no index)."""
+
+
+# Index scopes: one collection, or every collection with that ID (collection group)
+COLLECTION = 'COLLECTION'
+COLLECTION_GROUP = 'COLLECTION_GROUP'
+
+
+class QueryShape(NamedTuple):
+    """Equality filters plus ordering on a collection ID, and the scopes it runs in."""
+    collection: str
+    equality: tuple = ()
+    order_by: tuple = ()
+    scopes: tuple = (COLLECTION,)
+
+
+# Submissions are queried as a collection group outside the flat layout
+_SUBMISSION_SCOPES = (COLLECTION, COLLECTION_GROUP)
+
+QUERY_SHAPES = {
+    # Week.get_all
+    'weeks_ordered': QueryShape('weeks', (), (('category_id', ASCENDING), ('week_number', ASCENDING))),
+    # Week.get_by_category
+    'weeks_by_category': QueryShape('weeks', ('category_id',), (('week_number', ASCENDING),)),
+    # Submission.get_all / get_page / stream across the collection group
+    'submissions_newest': QueryShape('submissions', (), (('submitted_at', DESCENDING),),
+                                     (COLLECTION_GROUP,)),
+    # Submission.get_by_week and week-filtered pages
+    'submissions_by_week': QueryShape('submissions', ('week_id',), (('submitted_at', DESCENDING),),
+                                      _SUBMISSION_SCOPES),
+    # Submission.get_by_category / get_by_category_since and class-filtered pages
+    'submissions_by_category': QueryShape('submissions', ('category_id',),
+                                          (('submitted_at', DESCENDING),), _SUBMISSION_SCOPES),
+    # Status-filtered pages
+    'submissions_by_status': QueryShape('submissions', ('status',), (('submitted_at', DESCENDING),),
+                                        _SUBMISSION_SCOPES),
+    # Submission.get_by_id in the nested layout
+    'submissions_by_id': QueryShape('submissions', ('submission_id',), (), (COLLECTION_GROUP,)),
+    # Unordered reads across the collection group: Submission.stream and
+    # get_by_category while their composite index is not deployed
+    'submissions_week_group': QueryShape('submissions', ('week_id',), (), (COLLECTION_GROUP,)),
+    'submissions_category_group': QueryShape('submissions', ('category_id',), (),
+                                             (COLLECTION_GROUP,)),
+}
+
+# Shard-prefixed variants of the newest-first submission shapes, read one
+# shard at a time and merged
+SHARDED_SUFFIX = '_sharded'
+for _name in ('submissions_newest', 'submissions_by_week', 'submissions_by_category',
+              'submissions_by_status'):
+    _shape = QUERY_SHAPES[_name]
+    QUERY_SHAPES[_name + SHARDED_SUFFIX] = _shape._replace(equality=('shard', *_shape.equality),
+                                                           scopes=_SUBMISSION_SCOPES)
+del _name, _shape
+
+# Shapes whose indexes are deployed (FIRESTORE_INDEXES config)
+_available: set = set()
+
+
+def configure_query_plans(config) -> None:
+    """Apply the list of deployed index shapes from a Flask config mapping."""
+    global _available
+    value = config.get('FIRESTORE_INDEXES', '') or ''
+    names = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = names - set(QUERY_SHAPES) - {'all'}
+    if unknown:
+        raise ValueError(f"Unknown FIRESTORE_INDEXES shapes: {', '.join(sorted(unknown))}")
+    _available = names
+
+
+def order_by(name: str) -> Optional[list]:
+    """The shape's ordering if the database can run it, else None (sort in Python)."""
+    shape = QUERY_SHAPES[name]
+    if (not get_backend().requires_composite_indexes or 'all' in _available
+            or name in _available):
+        return list(shape.order_by)
+    return None
+
+
+def find(collection: str, filters, order_by) -> Optional[str]:
+    """Name of the declared shape a query on a collection ID runs as, or None."""
+    equality = sorted(field for field, op, _ in filters if op == '==')
+    order_by = tuple(order_by)
+    for name, shape in QUERY_SHAPES.items():
+        if (shape.collection == collection and sorted(shape.equality) == equality
+                and shape.order_by == order_by):
+            return name
+    return None
+
+
+def require(collection: str, filters, order_by) -> str:
+    """Name of the declared shape an ordered query runs as; raises UndeclaredQuery if none."""
+    name = find(collection, filters, order_by)
+    if name is None:
+        equality = ', '.join(sorted(field for field, op, _ in filters if op == '=='))
+        raise UndeclaredQuery(f"No declared query shape for {collection} filtered on "
+                              f"({equality}) ordered by {list(order_by)}")
+    return name
+
+
+def sort(name: str, documents: list, limit: Optional[int] = None) -> list:
+    """Sort documents in Python the way the shape orders them (the fallback path)."""
+    documents = list(documents)
+    for field, direction in reversed(QUERY_SHAPES[name].order_by):
+        # Missing values sort first, like the 0 / datetime.min defaults did
+        documents.sort(key=lambda d: (d.get(field) is not None, d.get(field)),
+                       reverse=direction == DESCENDING)
+    return documents if limit is None else documents[:limit]
+
+
+def index_manifest(sharded: bool = False) -> dict:
+    """Contents of firestore.indexes.json for the declared shapes.
+    
+    With ``sharded``, shapes that have a sharded variant are left out and
+    ``submitted_at`` on submissions gets no single-field indexes.
+    """
+    indexes = []
+    overrides = set()
+    for name, shape in QUERY_SHAPES.items():
+        if sharded and name + SHARDED_SUFFIX in QUERY_SHAPES:
+            continue
+        fields = [(field, ASCENDING) for field in shape.equality] + list(shape.order_by)
+        for scope in shape.scopes:
+            if len(fields) > 1:
+                entry = {
+                    'collectionGroup': shape.collection,
+                    'queryScope': scope,
+                    'fields': [{'fieldPath': f, 'order': d} for f, d in fields],
+                }
+                if entry not in indexes:
+                    indexes.append(entry)
+            elif fields and scope == COLLECTION_GROUP:
+                # Single-field indexes are automatic for collections only
+                overrides.add((shape.collection, fields[0][0]))
+    field_overrides = []
+    for collection, field in sorted(overrides):
+        field_overrides.append({
+            'collectionGroup': collection,
+            'fieldPath': field,
+            'indexes': [
+                {'order': order, 'queryScope': scope}
+                # Overriding a field replaces its automatic indexes, so keep those too
+                for scope in (COLLECTION, COLLECTION_GROUP)
+                for order in (ASCENDING, DESCENDING)
+            ],
+        })
+    if sharded:
+        field_overrides.append({
+            'collectionGroup': 'submissions',
+            'fieldPath': 'submitted_at',
+            'indexes': [],
+        })
+    return {'indexes': indexes, 'fieldOverrides': field_overrides}
@@ -0,0 +1,70 @@
+"""Build the per-student submission index for submissions created before it existed.
+
+Walks the weeks in ID order and indexes each week's submissions (also
+filling in their student_key). Progress is checkpointed in the
+``_migrations`` collection after every week, so an interrupted run picks up
+where it stopped. Safe to re-run with --restart.
+
+  python -m server.scripts.backfill_student_index [--restart]
+"""
+import argparse
+from datetime import datetime
+
+from ..app import create_app
+from ..models import Week, Submission
+from ..storage import get_backend
+
+MIGRATIONS_COLLECTION = '_migrations'
+CHECKPOINT_ID = 'backfill_student_index'
+
+
+def backfill(restart=False):
+    db = get_backend()
+    checkpoint = None if restart else db.get(MIGRATIONS_COLLECTION, CHECKPOINT_ID)
+    if checkpoint and checkpoint.get('done'):
+        print("[backfill] Already complete; use --restart to run again.")
+        return
+    last_id = checkpoint.get('last_id') if checkpoint else None
+    weeks_done = checkpoint.get('weeks', 0) if checkpoint else 0
+    indexed = checkpoint.get('indexed', 0) if checkpoint else 0
+    if last_id:
+        print(f"[backfill] Resuming after week {last_id} ({weeks_done} weeks, {indexed} indexed)")
+
+    for week in sorted(Week.get_all(), key=lambda w: w['id']):
+        if last_id and week['id'] <= last_id:
+            continue
+        indexed += Submission.index_week(week['id'])
+        weeks_done += 1
+        last_id = week['id']
+        db.set(MIGRATIONS_COLLECTION, CHECKPOINT_ID, {
+            'last_id': last_id,
+            'weeks': weeks_done,
+            'indexed': indexed,
+            'done': False,
+            'updated_at': datetime.utcnow(),
+        })
+        print(f"[backfill] {weeks_done} weeks, {indexed} indexed")
+
+    db.set(MIGRATIONS_COLLECTION, CHECKPOINT_ID, {
+        'last_id': last_id,
+        'weeks': weeks_done,
+        'indexed': indexed,
+        'done': True,
+        'updated_at': datetime.utcnow(),
+    })
+    print(f"[backfill] Complete: {weeks_done} weeks, {indexed} submissions indexed.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--restart', action='store_true',
+                        help="ignore the saved checkpoint and start from the beginning")
+    args = parser.parse_args()
+
+    app = create_app({'BACKGROUND_SERVICES': False})
+    with app.app_context():
+        backfill(restart=args.restart)
+
+
+if __name__ == "__main__":
+    main()
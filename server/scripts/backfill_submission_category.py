@@ -0,0 +1,87 @@
+"""Backfill category_id onto submissions created before it was denormalized.
+
+Walks the submissions collection in document-ID order, one page at a time,
+and writes each page's fixes in a single batch. Progress is checkpointed in
+the ``_migrations`` collection after every page, so an interrupted run picks
+up where it stopped.
+
+  python -m server.scripts.backfill_submission_category [--batch-size 400] [--restart]
+"""
+import argparse
+from datetime import datetime
+
+from ..app import create_app
+from ..models import Week, SUBMISSIONS_COLLECTION
+from ..storage import get_backend, MAX_BATCH_SIZE
+
+MIGRATIONS_COLLECTION = '_migrations'
+CHECKPOINT_ID = 'backfill_submission_category'
+
+
+def backfill(batch_size=400, restart=False):
+    db = get_backend()
+    checkpoint = None if restart else db.get(MIGRATIONS_COLLECTION, CHECKPOINT_ID)
+    if checkpoint and checkpoint.get('done'):
+        print("[backfill] Already complete; use --restart to run again.")
+        return
+    last_id = checkpoint.get('last_id') if checkpoint else None
+    scanned = checkpoint.get('scanned', 0) if checkpoint else 0
+    updated = checkpoint.get('updated', 0) if checkpoint else 0
+    if last_id:
+        print(f"[backfill] Resuming after {last_id} ({scanned} scanned, {updated} updated)")
+
+    while True:
+        page = list(db.query(
+            SUBMISSIONS_COLLECTION,
+            limit=batch_size,
+            start_after={'id': last_id} if last_id else None,
+        ))
+        if not page:
+            break
+
+        weeks = Week.get_many(s.get('week_id') for s in page)
+        batch = db.batch()
+        for submission in page:
+            week = weeks.get(submission.get('week_id'))
+            if week and submission.get('category_id') != week.get('category_id'):
+                batch.update(SUBMISSIONS_COLLECTION, submission['id'],
+                             {'category_id': week.get('category_id')})
+        updated += len(batch)
+        batch.commit()
+
+        scanned += len(page)
+        last_id = page[-1]['id']
+        db.set(MIGRATIONS_COLLECTION, CHECKPOINT_ID, {
+            'last_id': last_id,
+            'scanned': scanned,
+            'updated': updated,
+            'done': False,
+            'updated_at': datetime.utcnow(),
+        })
+        print(f"[backfill] {scanned} scanned, {updated} updated")
+
+    db.set(MIGRATIONS_COLLECTION, CHECKPOINT_ID, {
+        'last_id': last_id,
+        'scanned': scanned,
+        'updated': updated,
+        'done': True,
+        'updated_at': datetime.utcnow(),
+    })
+    print(f"[backfill] Complete: {scanned} scanned, {updated} updated.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--batch-size', type=int, default=400,
+                        help=f"submissions per page/batch (max {MAX_BATCH_SIZE})")
+    parser.add_argument('--restart', action='store_true',
+                        help="ignore the saved checkpoint and start from the beginning")
+    args = parser.parse_args()
+
+    app = create_app({'BACKGROUND_SERVICES': False})
+    with app.app_context():
+        backfill(batch_size=min(args.batch_size, MAX_BATCH_SIZE), restart=args.restart)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Set the index shard on submissions created before SUBMISSION_SHARDS was set.
+
+Walks the weeks in ID order and assigns each week's submissions their shard.
+Progress is checkpointed in the ``_migrations`` collection after every week,
+so an interrupted run picks up where it stopped. A checkpoint saved for a
+different shard count is ignored, so after changing SUBMISSION_SHARDS just
+run it again. Safe to re-run with --restart.
+
+  python -m server.scripts.backfill_submission_shards [--restart]
+"""
+import argparse
+import sys
+from datetime import datetime
+
+from ..app import create_app
+from ..models import Week, Submission
+from ..storage import get_backend
+
+MIGRATIONS_COLLECTION = '_migrations'
+CHECKPOINT_ID = 'backfill_submission_shards'
+
+
+def backfill(shards, restart=False):
+    db = get_backend()
+    checkpoint = None if restart else db.get(MIGRATIONS_COLLECTION, CHECKPOINT_ID)
+    if checkpoint and checkpoint.get('shards') != shards:
+        print(f"[shards] Checkpoint is for {checkpoint.get('shards')} shards; starting over.")
+        checkpoint = None
+    if checkpoint and checkpoint.get('done'):
+        print("[shards] Already complete; use --restart to run again.")
+        return
+    last_id = checkpoint.get('last_id') if checkpoint else None
+    weeks_done = checkpoint.get('weeks', 0) if checkpoint else 0
+    updated = checkpoint.get('updated', 0) if checkpoint else 0
+    if last_id:
+        print(f"[shards] Resuming after week {last_id} ({weeks_done} weeks, {updated} updated)")
+
+    for week in sorted(Week.get_all(), key=lambda w: w['id']):
+        if last_id and week['id'] <= last_id:
+            continue
+        updated += Submission.assign_shards(week['id'])
+        weeks_done += 1
+        last_id = week['id']
+        db.set(MIGRATIONS_COLLECTION, CHECKPOINT_ID, {
+            'shards': shards,
+            'last_id': last_id,
+            'weeks': weeks_done,
+            'updated': updated,
+            'done': False,
+            'updated_at': datetime.utcnow(),
+        })
+        print(f"[shards] {weeks_done} weeks, {updated} updated")
+
+    db.set(MIGRATIONS_COLLECTION, CHECKPOINT_ID, {
+        'shards': shards,
+        'last_id': last_id,
+        'weeks': weeks_done,
+        'updated': updated,
+        'done': True,
+        'updated_at': datetime.utcnow(),
+    })
+    print(f"[shards] Complete: {weeks_done} weeks, {updated} submissions updated.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--restart', action='store_true',
+                        help="ignore the saved checkpoint and start from the beginning")
+    args = parser.parse_args()
+
+    app = create_app({'BACKGROUND_SERVICES': False})
+    shards = app.config.get('SUBMISSION_SHARDS', 0)
+    if not shards:
+        print("[shards] SUBMISSION_SHARDS is not set; nothing to do.")
+        sys.exit(1)
+    with app.app_context():
+        backfill(shards, restart=args.restart)
+
+
+if __name__ == "__main__":
+    main()
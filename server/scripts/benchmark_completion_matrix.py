@@ -0,0 +1,108 @@
+"""Benchmark the completion matrix against a dict-loop baseline.
+
+Builds synthetic submissions for a roster of students across a category's
+weeks (no storage involved) and times the naive per-submission dict loop,
+the vectorized CompletionMatrix build, and an incremental apply of one new
+week's submissions. --aware uses timezone-aware submission times, as
+Firestore returns them.
+
+  python -m server.scripts.benchmark_completion_matrix [--students 10000] [--weeks 40] [--fill 0.8] [--aware]
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from ..analytics import CompletionMatrix, MISSING, ON_TIME, LATE
+from ..models import normalize_student_name
+
+
+def synthetic(students, weeks, fill, aware=False, seed=1):
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 6)
+    week_docs = [{
+        'id': f"week{n}",
+        'week_number': n,
+        'title': f"Week {n}",
+        'due_date': (start + timedelta(weeks=n)).isoformat(),
+    } for n in range(1, weeks + 1)]
+    submissions = []
+    for s in range(students):
+        name = f"Student {s:05d}"
+        for week in week_docs:
+            if rng.random() >= fill:
+                continue
+            due = datetime.fromisoformat(week['due_date'])
+            submitted_at = due + timedelta(hours=rng.uniform(-96, 24))
+            submissions.append({
+                'week_id': week['id'],
+                'student_name': name,
+                'submitted_at': submitted_at.replace(tzinfo=timezone.utc) if aware else submitted_at,
+            })
+    return week_docs, submissions
+
+
+def naive(weeks, submissions):
+    """The straightforward version: nested dicts filled one submission at a time."""
+    due = {w['id']: datetime.fromisoformat(w['due_date']) for w in weeks}
+    if submissions and submissions[0]['submitted_at'].tzinfo is not None:
+        due = {week_id: at.replace(tzinfo=timezone.utc) for week_id, at in due.items()}
+    first = {}
+    for submission in submissions:
+        if submission['week_id'] not in due:
+            continue
+        row = first.setdefault(normalize_student_name(submission['student_name']), {})
+        at = submission['submitted_at']
+        if submission['week_id'] not in row or at < row[submission['week_id']]:
+            row[submission['week_id']] = at
+    grid = {}
+    for student, row in first.items():
+        grid[student] = [
+            MISSING if w['id'] not in row else ON_TIME if row[w['id']] <= due[w['id']] else LATE
+            for w in weeks
+        ]
+    return grid
+
+
+def timed(label, fn):
+    started = time.perf_counter()
+    result = fn()
+    print(f"[benchmark] {label}: {(time.perf_counter() - started) * 1000:.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=10000)
+    parser.add_argument('--weeks', type=int, default=40)
+    parser.add_argument('--fill', type=float, default=0.8,
+                        help="fraction of student/week cells with a submission")
+    parser.add_argument('--aware', action='store_true', help="timezone-aware submission times")
+    args = parser.parse_args()
+
+    weeks, submissions = synthetic(args.students, args.weeks, args.fill, aware=args.aware)
+    last_week = weeks[-1]['id']
+    backlog = [s for s in submissions if s['week_id'] != last_week]
+    latest = [s for s in submissions if s['week_id'] == last_week]
+    print(f"[benchmark] {args.students} students x {args.weeks} weeks, {len(submissions)} submissions")
+
+    grid = timed("naive dict loop", lambda: naive(weeks, submissions))
+
+    def build():
+        matrix = CompletionMatrix(weeks)
+        matrix.apply(submissions)
+        return matrix.states()
+    states = timed("vectorized build", build)
+
+    matrix = CompletionMatrix(weeks)
+    matrix.apply(backlog)
+    timed(f"incremental apply ({len(latest)} new)", lambda: (matrix.apply(latest), matrix.states()))
+    timed("to_dict", matrix.to_dict)
+
+    expected = [grid[normalize_student_name(f"Student {s:05d}")] for s in range(args.students)
+                if normalize_student_name(f"Student {s:05d}") in grid]
+    print(f"[benchmark] Results match: {states.tolist() == expected}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Benchmark the admin search index on synthetic submissions.
+
+Builds the in-memory index (no storage involved) from generated
+submissions and reports build time, size and per-query latency for exact,
+prefix, multi-word and fuzzy queries.
+
+  python -m server.scripts.benchmark_search_index [--submissions 100000] [--queries 2000]
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from ..search import SubmissionSearchIndex, _Index
+
+FIRST = ['ada', 'alan', 'grace', 'linus', 'margaret', 'dennis', 'barbara', 'ken', 'radia', 'edsger',
+         'frances', 'john', 'katherine', 'tim', 'guido', 'bjarne', 'donald', 'hedy', 'shafi', 'niklaus']
+WORDS = ['game', 'portfolio', 'weather', 'chat', 'todo', 'tracker', 'quiz', 'blog', 'calculator',
+         'maze', 'snake', 'recipes', 'budget', 'timer', 'gallery', 'music', 'paint', 'notes']
+COMMENTS = ['great work', 'needs tests', 'broken link', 'nice styling', 'missing readme', None, None]
+
+
+def synthetic(count, seed=1):
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 6)
+    for i in range(count):
+        first = rng.choice(FIRST)
+        last = f"{rng.choice(FIRST)}son{rng.randrange(500)}"
+        yield {
+            'id': f"sub{i:07d}",
+            'week_id': f"week{rng.randrange(40)}",
+            'category_id': f"cat{rng.randrange(5)}",
+            'student_name': f"{first.title()} {last.title()}",
+            'project_url': f"https://github.com/{first}{last}/{rng.choice(WORDS)}-{rng.choice(WORDS)}",
+            'status': rng.choice(['pending', 'approved', 'reviewed']),
+            'admin_comment': rng.choice(COMMENTS),
+            'submitted_at': start + timedelta(seconds=i * 30),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--submissions', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=2000)
+    args = parser.parse_args()
+
+    search = SubmissionSearchIndex(max_documents=args.submissions)
+    search.enabled = True
+    tracemalloc.start()
+    started = time.perf_counter()
+    index = _Index()
+    # The startup scan streams newest first
+    index.load(reversed(list(synthetic(args.submissions))), args.submissions)
+    search._index = index
+    built = time.perf_counter() - started
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"[benchmark] Indexed {len(index.docs)} submissions in {built:.1f} s, "
+          f"{len(index.vocabulary)} tokens, ~{memory / 2**20:.0f} MiB")
+
+    rng = random.Random(2)
+    kinds = {
+        'exact': lambda: f"{rng.choice(FIRST)}son{rng.randrange(500)}",
+        'prefix': lambda: rng.choice(WORDS)[:3],
+        'two words': lambda: f"{rng.choice(FIRST)} {rng.choice(WORDS)}",
+        'fuzzy': lambda: rng.choice(WORDS)[::-1][1:][::-1] + 'x',
+    }
+    for kind, make in kinds.items():
+        queries = [make() for _ in range(args.queries)]
+        started = time.perf_counter()
+        totals = 0
+        for query in queries:
+            totals += search.search(query, limit=20)[1]
+        elapsed = (time.perf_counter() - started) / len(queries)
+        print(f"[benchmark] {kind}: {elapsed * 1000:.3f} ms/query, "
+              f"{totals / len(queries):.0f} matches on average")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Write firestore.indexes.json from the query shapes declared in query_plans.
+
+Deploy the result with ``firebase deploy --only firestore:indexes``, wait for
+the indexes to finish building, then list the shapes in FIRESTORE_INDEXES
+(or set it to ``all``).
+
+With SUBMISSION_SHARDS set, generate with --sharded: the submission indexes
+are then all shard-prefixed and nothing is indexed on submitted_at alone.
+
+  python -m server.scripts.generate_firestore_indexes [--output firestore.indexes.json] [--sharded] [--check]
+"""
+import argparse
+import json
+import os
+import sys
+
+from ..query_plans import index_manifest
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(__file__), '..', '..', 'firestore.indexes.json')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', default=os.path.normpath(DEFAULT_OUTPUT),
+                        help="path of the manifest (default: repository root)")
+    parser.add_argument('--check', action='store_true',
+                        help="exit with status 1 if the manifest is out of date instead of writing it")
+    parser.add_argument('--sharded', action='store_true',
+                        help="index submissions by shard only (for SUBMISSION_SHARDS deployments)")
+    args = parser.parse_args()
+
+    manifest = json.dumps(index_manifest(sharded=args.sharded), indent=2) + '\n'
+    if args.check:
+        try:
+            with open(args.output) as f:
+                current = f.read()
+        except FileNotFoundError:
+            current = None
+        if current != manifest:
+            print(f"[indexes] {args.output} is out of date; regenerate it.")
+            sys.exit(1)
+        print(f"[indexes] {args.output} is up to date.")
+        return
+
+    with open(args.output, 'w') as f:
+        f.write(manifest)
+    print(f"[indexes] Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
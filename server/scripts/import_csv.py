@@ -0,0 +1,61 @@
+"""Import weeks or submissions from a CSV file (see server/imports.py for the columns).
+
+Streams the file in chunks, so large files run in bounded memory. Rows that
+cannot be imported are listed with their row number; --report writes the
+full report as JSON. Importing the same file twice creates the submissions
+twice (or, with SUBMISSIONS_UPSERT, resubmits them), so check the report
+before re-running.
+
+  python -m server.scripts.import_csv weeks weeks.csv
+  python -m server.scripts.import_csv submissions submissions.csv [--report report.json]
+"""
+import argparse
+import json
+import sys
+import time
+
+from ..app import create_app
+from ..imports import InvalidImport, import_submissions, import_weeks
+
+IMPORTERS = {
+    'weeks': import_weeks,
+    'submissions': import_submissions,
+}
+# Row errors printed to the console; --report has all reported errors
+PRINTED_ERRORS = 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('kind', choices=sorted(IMPORTERS), help="what the file contains")
+    parser.add_argument('path', help="CSV file with a header row")
+    parser.add_argument('--report', help="write the import report to this JSON file")
+    args = parser.parse_args()
+
+    app = create_app({'BACKGROUND_SERVICES': False})
+    started = time.monotonic()
+    with app.app_context(), open(args.path, newline='', encoding='utf-8-sig') as f:
+        try:
+            report = IMPORTERS[args.kind](f)
+        except InvalidImport as e:
+            print(f"[import] {e}")
+            sys.exit(1)
+
+    print(f"[import] {report['rows']} rows: {report['imported']} imported, "
+          f"{report['failed']} failed ({time.monotonic() - started:.1f}s)")
+    if report['ignored_columns']:
+        print(f"[import] Ignored columns: {', '.join(report['ignored_columns'])}")
+    for error in report['errors'][:PRINTED_ERRORS]:
+        print(f"[import] Row {error['row']}: {error['error']}")
+    if report['failed'] > PRINTED_ERRORS:
+        print(f"[import] ... {report['failed'] - PRINTED_ERRORS} more")
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"[import] Report written to {args.report}")
+    if report['failed']:
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
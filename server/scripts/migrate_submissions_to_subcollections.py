@@ -0,0 +1,95 @@
+"""Copy flat submissions into weeks/{week_id}/submissions subcollections.
+
+Run with SUBMISSIONS_LAYOUT=dual so readers see both copies while this runs,
+then switch to ``nested``. Walks the flat collection in document-ID order and
+writes each page in a single batch, keeping the document ID and adding the
+``submission_id`` field collection-group lookups use. Progress is checkpointed
+in the ``_migrations`` collection after every page.
+
+  python -m server.scripts.migrate_submissions_to_subcollections [--batch-size 200] [--delete-source] [--restart]
+"""
+import argparse
+from datetime import datetime
+
+from ..app import create_app
+from ..models import SUBMISSIONS_COLLECTION, week_submissions_collection
+from ..storage import get_backend, MAX_BATCH_SIZE
+
+MIGRATIONS_COLLECTION = '_migrations'
+CHECKPOINT_ID = 'migrate_submissions_to_subcollections'
+
+
+def migrate(batch_size=200, delete_source=False, restart=False):
+    db = get_backend()
+    checkpoint = None if restart else db.get(MIGRATIONS_COLLECTION, CHECKPOINT_ID)
+    if checkpoint and checkpoint.get('done'):
+        print("[migrate] Already complete; use --restart to run again.")
+        return
+    last_id = checkpoint.get('last_id') if checkpoint else None
+    copied = checkpoint.get('copied', 0) if checkpoint else 0
+    skipped = checkpoint.get('skipped', 0) if checkpoint else 0
+    if last_id:
+        print(f"[migrate] Resuming after {last_id} ({copied} copied, {skipped} skipped)")
+
+    while True:
+        page = list(db.query(
+            SUBMISSIONS_COLLECTION,
+            limit=batch_size,
+            start_after={'id': last_id} if last_id else None,
+        ))
+        if not page:
+            break
+
+        # A copy and a delete per document: keep both inside one batch
+        batch = db.batch()
+        for submission in page:
+            week_id = submission.get('week_id')
+            if not week_id:
+                skipped += 1
+                continue
+            data = {k: v for k, v in submission.items() if k != 'id'}
+            data['submission_id'] = submission['id']
+            batch.set(week_submissions_collection(week_id), submission['id'], data)
+            if delete_source:
+                batch.delete(SUBMISSIONS_COLLECTION, submission['id'])
+            copied += 1
+        batch.commit()
+
+        last_id = page[-1]['id']
+        db.set(MIGRATIONS_COLLECTION, CHECKPOINT_ID, {
+            'last_id': last_id,
+            'copied': copied,
+            'skipped': skipped,
+            'done': False,
+            'updated_at': datetime.utcnow(),
+        })
+        print(f"[migrate] {copied} copied, {skipped} skipped")
+
+    db.set(MIGRATIONS_COLLECTION, CHECKPOINT_ID, {
+        'last_id': last_id,
+        'copied': copied,
+        'skipped': skipped,
+        'done': True,
+        'updated_at': datetime.utcnow(),
+    })
+    print(f"[migrate] Complete: {copied} copied, {skipped} skipped (no week_id).")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--batch-size', type=int, default=200,
+                        help=f"submissions per page (max {MAX_BATCH_SIZE // 2})")
+    parser.add_argument('--delete-source', action='store_true',
+                        help="delete each flat document once it has been copied")
+    parser.add_argument('--restart', action='store_true',
+                        help="ignore the saved checkpoint and start from the beginning")
+    args = parser.parse_args()
+
+    app = create_app({'BACKGROUND_SERVICES': False})
+    with app.app_context():
+        migrate(batch_size=min(args.batch_size, MAX_BATCH_SIZE // 2),
+                delete_source=args.delete_source, restart=args.restart)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Build the week_numbers index for weeks created before it existed.
+
+Writes one ``{category_id}:{week_number}`` entry per week, in batches.
+Entries that already exist are left alone; if two weeks share a category and
+week number, the first one keeps the slot and the others are reported so an
+admin can renumber or delete them. Safe to re-run.
+
+  python -m server.scripts.migrate_week_numbers [--batch-size 400]
+"""
+import argparse
+
+from ..app import create_app
+from ..models import WEEKS_COLLECTION, WEEK_NUMBERS_COLLECTION, week_number_key
+from ..storage import get_backend, MAX_BATCH_SIZE
+
+
+def migrate(batch_size=400):
+    db = get_backend()
+    # Oldest week wins a contested slot
+    weeks = sorted(db.query(WEEKS_COLLECTION),
+                   key=lambda w: (str(w.get('created_at') or ''), w['id']))
+    created = 0
+    duplicates = []
+    for start in range(0, len(weeks), batch_size):
+        page = weeks[start:start + batch_size]
+        keys = {w['id']: week_number_key(w.get('category_id'), w.get('week_number')) for w in page}
+        entries = db.get_many(WEEK_NUMBERS_COLLECTION, keys.values())
+        batch = db.batch()
+        for week in page:
+            key = keys[week['id']]
+            entry = entries.get(key)
+            if entry is None:
+                entry = {
+                    'week_id': week['id'],
+                    'category_id': week.get('category_id'),
+                    'week_number': week.get('week_number'),
+                }
+                batch.set(WEEK_NUMBERS_COLLECTION, key, entry)
+                entries[key] = entry
+                created += 1
+            elif entry['week_id'] != week['id']:
+                duplicates.append((key, week['id'], entry['week_id']))
+        batch.commit()
+        print(f"[migrate] {min(start + batch_size, len(weeks))}/{len(weeks)} weeks, {created} entries created")
+
+    for key, week_id, owner in duplicates:
+        print(f"[migrate] Duplicate {key}: week {week_id} (slot kept by {owner})")
+    print(f"[migrate] Complete: {created} entries created, {len(duplicates)} duplicates.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--batch-size', type=int, default=400,
+                        help=f"index entries per batch (max {MAX_BATCH_SIZE})")
+    args = parser.parse_args()
+
+    app = create_app({'BACKGROUND_SERVICES': False})
+    with app.app_context():
+        migrate(batch_size=min(args.batch_size, MAX_BATCH_SIZE))
+
+
+if __name__ == "__main__":
+    main()
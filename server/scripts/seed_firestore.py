@@ -10,7 +10,7 @@ from ..models import Category, Week, Submission
 
 
 def seed():
-    app = create_app()
+    app = create_app({'BACKGROUND_SERVICES': False})
     with app.app_context():
         categories = Category.get_all()
         if categories:
@@ -66,12 +66,14 @@ def seed():
                 student_name="John Doe",
                 project_url="https://scratch.mit.edu/projects/123",
                 status="pending",
+                category_id=scratch['id'],
             )
             Submission.create(
                 week_id=week1['id'],
                 student_name="Jane Smith",
                 project_url="https://scratch.mit.edu/projects/456",
                 status="pending",
+                category_id=scratch['id'],
             )
 
         print("[seed] Firestore seed complete.")
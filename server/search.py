@@ -0,0 +1,403 @@
+"""In-memory search index over submissions for the admin search endpoint.
+
+Each worker keeps an inverted index from tokens of ``student_name``,
+``project_url`` and ``admin_comment`` to submission IDs, plus a sorted
+vocabulary for prefix lookups. A query matches a submission when every query
+term matches one of its tokens. A term matches exactly, or as a prefix of
+the token. If neither finds anything, a token one edit away also matches.
+
+The index is built on startup by a background thread that streams the
+submissions newest first. The Submission model then keeps it current on
+this worker's writes. Other workers' new submissions are picked up every
+``SEARCH_REFRESH_INTERVAL`` seconds. Their edits and deletes move the
+submissions generation, and that triggers a full rebuild at most every
+``SEARCH_REBUILD_INTERVAL`` seconds. Memory is bounded by
+``SEARCH_MAX_DOCUMENTS``: beyond it the oldest submissions drop out of the
+index. Text per field and tokens per submission are capped as well.
+
+Like the catalog mirror, the index runs a background thread and must be
+started after gunicorn forks its workers (i.e. without ``--preload``).
+"""
+from __future__ import annotations
+import bisect
+import heapq
+import logging
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Optional
+
+from .coherence import generations
+from .storage import naive_utc
+
+logger = logging.getLogger(__name__)
+
+# Fields that are tokenized, and the fields kept for results and filters
+SEARCH_FIELDS = ('student_name', 'project_url', 'admin_comment')
+STORED_FIELDS = ('id', 'week_id', 'category_id', 'student_name', 'project_url', 'status',
+                 'admin_comment', 'submitted_at')
+_POSITION = {field: i for i, field in enumerate(STORED_FIELDS)}
+_SEARCH_POSITIONS = tuple(_POSITION[field] for field in SEARCH_FIELDS)
+_SUBMITTED_AT = _POSITION['submitted_at']
+
+# Bounds on what one submission contributes
+MAX_FIELD_LENGTH = 256
+MAX_TOKEN_LENGTH = 32
+MAX_TOKENS_PER_DOCUMENT = 64
+# Vocabulary tokens a prefix may expand to
+MAX_PREFIX_EXPANSIONS = 64
+# Shortest term that is matched fuzzily
+MIN_FUZZY_LENGTH = 4
+# Matching at least 1 in this many submissions counts as a broad query, whose
+# newest matches are found by probing numbers downwards instead of a full pass
+BROAD_MATCH_RATIO = 50
+
+_TOKEN = re.compile(r'[^\W_]+')
+# URL noise that would match nearly every submission
+_STOP_TOKENS = frozenset({'http', 'https', 'www', 'com'})
+_ALPHABET = 'abcdefghijklmnopqrstuvwxyz0123456789'
+
+# Catch-up scans re-read this far behind the newest indexed submission
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+
+def tokenize(text) -> list:
+    """Case-folded alphanumeric tokens of a value, without URL noise."""
+    if not text:
+        return []
+    tokens = _TOKEN.findall(str(text)[:MAX_FIELD_LENGTH].casefold())
+    return [t[:MAX_TOKEN_LENGTH] for t in tokens if t not in _STOP_TOKENS]
+
+
+def _edits1(term: str) -> set:
+    """Strings one deletion, transposition, substitution or insertion away."""
+    splits = [(term[:i], term[i:]) for i in range(len(term) + 1)]
+    deletes = [a + b[1:] for a, b in splits if b]
+    transposes = [a + b[1] + b[0] + b[2:] for a, b in splits if len(b) > 1]
+    replaces = [a + c + b[1:] for a, b in splits if b for c in _ALPHABET]
+    inserts = [a + c + b for a, b in splits for c in _ALPHABET]
+    return set(deletes + transposes + replaces + inserts)
+
+
+def _document_tokens(doc: tuple) -> tuple:
+    tokens = []
+    for position in _SEARCH_POSITIONS:
+        tokens.extend(tokenize(doc[position]))
+    return tuple(dict.fromkeys(tokens))[:MAX_TOKENS_PER_DOCUMENT]
+
+
+class _Index:
+    """The index data; swapped wholesale when rebuilt.
+    
+    Submissions are numbered so that a higher number is newer: a rebuild
+    numbers its newest-first scan -1, -2, ... and later writes count up from
+    0. Postings hold these numbers, so the newest matches are simply the
+    largest, and the oldest submission is the lowest number still present.
+    Documents are stored as tuples of STORED_FIELDS to keep memory down.
+    """
+
+    def __init__(self):
+        self.docs: dict[int, tuple] = {}
+        self.numbers: dict[str, int] = {}
+        self.postings: dict[str, set] = {}
+        self.vocabulary: list[str] = []
+        self.watermark: Optional[datetime] = None
+        self._next = 0
+        self._oldest = 0
+
+    def load(self, submissions: Iterable[dict], limit: int) -> None:
+        """Bulk-index a newest-first stream, keeping at most ``limit`` submissions."""
+        number = 0
+        for submission in submissions:
+            if len(self.docs) >= limit:
+                break
+            if submission['id'] in self.numbers:
+                continue
+            number -= 1
+            self._insert(submission, number, sort=False)
+        self.vocabulary.sort()
+        self._oldest = number
+
+    def put(self, submission: dict) -> None:
+        """Index a new or changed submission; a resubmission counts as newest."""
+        number = self.numbers.get(submission['id'])
+        if number is not None and self.docs[number][_SUBMITTED_AT] != naive_utc(submission.get('submitted_at')):
+            self.discard(submission['id'])
+            number = None
+        if number is None:
+            number = self._next
+            self._next += 1
+        else:
+            self._unlink(number)
+        self._insert(submission, number)
+
+    def discard(self, doc_id: str) -> None:
+        number = self.numbers.pop(doc_id, None)
+        if number is None:
+            return
+        self._unlink(number)
+        del self.docs[number]
+
+    def evict(self, max_documents: int) -> int:
+        """Drop the oldest submissions beyond max_documents. Returns how many."""
+        evicted = 0
+        while len(self.docs) > max_documents:
+            while self._oldest not in self.docs:
+                self._oldest += 1
+            self.discard(self.docs[self._oldest][0])
+            evicted += 1
+        return evicted
+
+    def match(self, term: str, prefix: bool) -> set:
+        """Numbers of submissions with a token matching ``term``. Do not modify."""
+        sets = []
+        if prefix:
+            start = bisect.bisect_left(self.vocabulary, term)
+            for token in self.vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+                if not token.startswith(term):
+                    break
+                sets.append(self.postings[token])
+        elif term in self.postings:
+            sets.append(self.postings[term])
+        if not sets and len(term) >= MIN_FUZZY_LENGTH:
+            sets = [self.postings[c] for c in _edits1(term) if c in self.postings]
+        if len(sets) == 1:
+            return sets[0]
+        return set().union(*sets)
+
+    def newest(self, numbers: set, limit: int) -> list:
+        """The ``limit`` highest of ``numbers``, probing downwards from the newest."""
+        found = []
+        for number in range(self._next - 1, self._oldest - 1, -1):
+            if number in numbers:
+                found.append(number)
+                if len(found) == limit:
+                    break
+        return found
+
+    def _insert(self, submission: dict, number: int, sort: bool = True) -> None:
+        # Firestore returns aware datetimes, the models write naive UTC ones
+        doc = tuple(naive_utc(submission.get(field)) for field in STORED_FIELDS)
+        self.docs[number] = doc
+        self.numbers[doc[0]] = number
+        for token in _document_tokens(doc):
+            numbers = self.postings.get(token)
+            if numbers is None:
+                numbers = self.postings[token] = set()
+                if sort:
+                    bisect.insort(self.vocabulary, token)
+                else:
+                    self.vocabulary.append(token)
+            numbers.add(number)
+        submitted_at = doc[_SUBMITTED_AT]
+        if isinstance(submitted_at, datetime) and (self.watermark is None or submitted_at > self.watermark):
+            self.watermark = submitted_at
+
+    def _unlink(self, number: int) -> None:
+        """Remove a submission's numbers from the postings (the document stays)."""
+        for token in _document_tokens(self.docs[number]):
+            numbers = self.postings.get(token)
+            if numbers is None:
+                continue
+            numbers.discard(number)
+            if not numbers:
+                del self.postings[token]
+                i = bisect.bisect_left(self.vocabulary, token)
+                if i < len(self.vocabulary) and self.vocabulary[i] == token:
+                    del self.vocabulary[i]
+
+
+class SubmissionSearchIndex:
+    """Worker-local search index over submissions."""
+
+    def __init__(self, max_documents: int = 200000, refresh_interval: float = 30,
+                 rebuild_interval: float = 600):
+        self.max_documents = max_documents
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self.enabled = False
+        self._index = _Index()
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._scan: Optional[Callable[..., Iterable[dict]]] = None
+        self._collection: Optional[str] = None
+        # Writes seen while a rebuild is scanning, replayed onto the new index
+        self._pending: Optional[list] = None
+        self._built_at: Optional[float] = None
+        self._built_generation = None
+        self._stats = {'queries': 0, 'rebuilds': 0, 'refreshes': 0, 'evicted': 0}
+
+    @property
+    def ready(self) -> bool:
+        """True once the initial build has completed."""
+        return self.enabled and self._ready.is_set()
+
+    def start(self, scan: Callable[..., Iterable[dict]], collection: str) -> None:
+        """Build the index in the background and keep it refreshed.
+
+        ``scan(since=None)`` streams submissions newest first, optionally
+        only those submitted after ``since``. ``collection`` names the
+        generation counter whose moves trigger rebuilds.
+        """
+        self.stop()
+        self._scan = scan
+        self._collection = collection
+        self.enabled = True
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="search-index", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the refresh thread and drop the index."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.enabled = False
+        self._ready.clear()
+        with self._lock:
+            self._index = _Index()
+            self._pending = None
+
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until the initial build completes or ``timeout`` elapses."""
+        return self._ready.wait(timeout) and self.enabled
+
+    def put(self, submission: dict) -> None:
+        """Index a created or updated submission (a full document with ``id``)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(('put', submission))
+            self._index.put(submission)
+            self._stats['evicted'] += self._index.evict(self.max_documents)
+
+    def discard(self, submission_id: str) -> None:
+        """Remove a deleted submission."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(('discard', submission_id))
+            self._index.discard(submission_id)
+
+    def search(self, query: str, limit: int = 20, category_id: Optional[str] = None,
+               week_id: Optional[str] = None, status: Optional[str] = None) -> tuple:
+        """Submissions matching every term of ``query``, newest first.
+
+        The last term also matches as a prefix (search as you type).
+        Returns (submissions, total_matches).
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return [], 0
+        checks = [(_POSITION[field], value) for field, value in
+                  (('category_id', category_id), ('week_id', week_id), ('status', status)) if value]
+        with self._lock:
+            self._stats['queries'] += 1
+            index = self._index
+            matched = None
+            # Intersect from the rarest term so the working set stays small
+            for numbers in sorted((index.match(term, prefix=(i == len(terms) - 1))
+                                   for i, term in enumerate(terms)), key=len):
+                matched = numbers if matched is None else matched & numbers
+                if not matched:
+                    return [], 0
+            if checks:
+                docs = index.docs
+                matched = [n for n in matched if all(docs[n][p] == v for p, v in checks)]
+                newest = heapq.nlargest(limit, matched)
+            elif len(matched) * BROAD_MATCH_RATIO >= len(index.docs):
+                newest = index.newest(matched, limit)
+            else:
+                newest = heapq.nlargest(limit, matched)
+            return [dict(zip(STORED_FIELDS, index.docs[n])) for n in newest], len(matched)
+
+    def status(self) -> dict:
+        """Readiness and size summary for health checks."""
+        index = self._index
+        return {
+            'enabled': self.enabled,
+            'ready': self.ready,
+            'documents': len(index.docs),
+            'tokens': len(index.vocabulary),
+            **self._stats,
+        }
+
+    def rebuild(self) -> int:
+        """Rebuild from a full streamed scan and swap it in. Returns the documents indexed."""
+        generation = generations.current(self._collection)
+        with self._lock:
+            self._pending = []
+        try:
+            index = _Index()
+            # Newest first, so the oldest are the ones left out
+            index.load(self._scan(), self.max_documents)
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+        with self._lock:
+            for op, arg in self._pending:
+                if op == 'put':
+                    index.put(arg)
+                else:
+                    index.discard(arg)
+            index.evict(self.max_documents)
+            self._pending = None
+            self._index = index
+        self._built_at = time.monotonic()
+        self._built_generation = generation
+        self._stats['rebuilds'] += 1
+        self._ready.set()
+        logger.info(f"Search index built: {len(index.docs)} submissions, "
+                    f"{len(index.vocabulary)} tokens")
+        return len(index.docs)
+
+    def refresh(self) -> None:
+        """Catch up on submissions created elsewhere, or rebuild when due."""
+        if self._built_at is None:
+            self.rebuild()
+            return
+        if time.monotonic() - self._built_at >= self.rebuild_interval:
+            generation = generations.current(self._collection)
+            # With coherence disabled the generation never moves; rebuild on age alone
+            if generation != self._built_generation or not generations.enabled:
+                self.rebuild()
+                return
+        watermark = self._index.watermark
+        since = watermark - REFRESH_OVERLAP if watermark else None
+        for submission in self._scan(since=since):
+            with self._lock:
+                number = self._index.numbers.get(submission['id'])
+                # Already indexed unless it was resubmitted (upsert) since
+                if (number is None or self._index.docs[number][_SUBMITTED_AT]
+                        != naive_utc(submission.get('submitted_at'))):
+                    self._index.put(submission)
+        with self._lock:
+            self._stats['evicted'] += self._index.evict(self.max_documents)
+        self._stats['refreshes'] += 1
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"Search index refresh failed: {e}")
+            self._stopping.wait(self.refresh_interval)
+
+
+# Global search index, started from create_app when enabled
+submission_search = SubmissionSearchIndex()
+
+
+def configure_search(config) -> SubmissionSearchIndex:
+    """Apply search index settings from a Flask config mapping."""
+    submission_search.max_documents = config.get('SEARCH_MAX_DOCUMENTS', 200000)
+    submission_search.refresh_interval = config.get('SEARCH_REFRESH_INTERVAL', 30)
+    submission_search.rebuild_interval = config.get('SEARCH_REBUILD_INTERVAL', 600)
+    return submission_search
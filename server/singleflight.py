@@ -0,0 +1,79 @@
+"""Coalescing of identical concurrent reads within one worker process.
+
+When several threads ask for the same query at once (e.g. a whole class
+opening the same week page), only the first caller runs it; the others wait
+for that result instead of issuing their own reads. This matters with
+threaded gunicorn workers (``--threads``); sync workers serve one request at
+a time and never coalesce.
+"""
+from __future__ import annotations
+import copy
+import threading
+from typing import Any, Callable, Hashable
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.waiters = 0
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs at most one in-flight call per key and shares its result."""
+
+    def __init__(self):
+        self._calls: dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'executions': 0, 'coalesced': 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Return ``fn()``, sharing one execution among concurrent callers.
+
+        Waiting callers receive a deep copy so no two callers share mutable
+        results. Errors from the shared execution are re-raised to all callers.
+        """
+        with self._lock:
+            self._stats['calls'] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self._stats['executions'] += 1
+            else:
+                call.waiters += 1
+                self._stats['coalesced'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                shared = call.waiters > 0
+            call.done.set()
+        # Waiters copy from call.result, so the leader must not hand it out.
+        return copy.deepcopy(call.result) if shared else call.result
+
+    def stats(self) -> dict:
+        """Return call, execution and coalesced counters."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+        return stats
+
+
+# Global single-flight group shared by the model layer
+flights = SingleFlight()
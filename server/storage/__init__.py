@@ -0,0 +1,72 @@
+"""Pluggable storage backends for SparkRepo.
+
+The models talk to a small document-store interface (see ``base.py``)
+rather than to the Firestore client, so the same code can run against:
+
+- ``firestore``: Google Cloud Firestore (default)
+- ``sqlite``: a local SQLite file with JSON expression indexes
+- ``memory``: a process-local store for tests and benchmarks
+
+The backend is chosen with the ``STORAGE_BACKEND`` config value.
+"""
+from __future__ import annotations
+import logging
+from typing import Optional
+
+from .base import (StorageBackend, StorageError, NotFound, AlreadyExists, WriteBatch, Transaction,
+                   ASCENDING, DESCENDING, MAX_BATCH_SIZE, naive_utc)
+
+logger = logging.getLogger(__name__)
+
+# Global storage backend
+_backend: Optional[StorageBackend] = None
+
+
+def create_backend(name: str, sqlite_path: Optional[str] = None) -> StorageBackend:
+    """Build a storage backend by name."""
+    if name == 'firestore':
+        from .firestore import FirestoreBackend
+        return FirestoreBackend()
+    if name == 'sqlite':
+        from .sqlite import SQLiteBackend
+        return SQLiteBackend(sqlite_path or 'sparkrepo.db')
+    if name == 'memory':
+        from .memory import MemoryBackend
+        return MemoryBackend()
+    raise ValueError(f"Unknown storage backend: {name!r}")
+
+
+def init_backend(config) -> StorageBackend:
+    """Initialize the global backend from a Flask config mapping."""
+    global _backend
+    if _backend is not None:
+        _backend.close()
+    _backend = create_backend(config.get('STORAGE_BACKEND', 'firestore'),
+                              sqlite_path=config.get('SQLITE_PATH'))
+    logger.info(f"Storage backend initialized: {_backend.name}")
+    return _backend
+
+
+def set_backend(backend: StorageBackend) -> None:
+    """Replace the global backend (e.g. with a MemoryBackend in tests)."""
+    global _backend
+    _backend = backend
+
+
+def get_backend() -> StorageBackend:
+    """Get the storage backend, initializing it from config if needed."""
+    if _backend is None:
+        from ..config import get_config
+        ConfigClass = get_config()
+        init_backend({
+            'STORAGE_BACKEND': ConfigClass.STORAGE_BACKEND,
+            'SQLITE_PATH': ConfigClass.SQLITE_PATH,
+        })
+    return _backend
+
+
+__all__ = [
+    'StorageBackend', 'StorageError', 'NotFound', 'AlreadyExists', 'WriteBatch', 'Transaction',
+    'ASCENDING', 'DESCENDING', 'MAX_BATCH_SIZE', 'naive_utc',
+    'create_backend', 'init_backend', 'set_backend', 'get_backend',
+]
@@ -0,0 +1,368 @@
+"""Backend-neutral document storage interface for SparkRepo.
+
+Documents are plain dicts. Reads return the stored fields plus an ``id`` key,
+matching the shape the models have always handed to the API layer.
+"""
+from __future__ import annotations
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+ASCENDING = 'ASCENDING'
+DESCENDING = 'DESCENDING'
+
+FILTER_OPERATORS = ('==', '!=', '<', '<=', '>', '>=', 'in')
+
+# Firestore's limit on operations per atomic batch
+MAX_BATCH_SIZE = 500
+
+
+class StorageError(Exception):
+    """Base class for storage backend errors."""
+
+
+class NotFound(StorageError):
+    """Raised when updating a document that does not exist."""
+
+
+class AlreadyExists(StorageError):
+    """Raised when creating a document that already exists."""
+
+
+class WriteBatch:
+    """Collects writes and applies them atomically on ``commit()``.
+
+    Keep batches to ``MAX_BATCH_SIZE`` operations; Firestore rejects larger ones.
+    """
+
+    def __init__(self, backend: 'StorageBackend'):
+        self.backend = backend
+        self.operations: list[tuple] = []
+        # (collection, doc_id) -> position of its increment in operations
+        self._increments: dict[tuple[str, str], int] = {}
+
+    def create(self, collection: str, doc_id: str, data: dict) -> 'WriteBatch':
+        self.operations.append(('create', collection, doc_id, data))
+        return self
+
+    def set(self, collection: str, doc_id: str, data: dict) -> 'WriteBatch':
+        self.operations.append(('set', collection, doc_id, data))
+        return self
+
+    def update(self, collection: str, doc_id: str, data: dict) -> 'WriteBatch':
+        self.operations.append(('update', collection, doc_id, data))
+        return self
+
+    def delete(self, collection: str, doc_id: str) -> 'WriteBatch':
+        self.operations.append(('delete', collection, doc_id, None))
+        return self
+
+    def increment(self, collection: str, doc_id: str, deltas: dict) -> 'WriteBatch':
+        # Fold repeated increments of one document (e.g. a counter shard hit
+        # by several submissions in a group commit) into a single write
+        i = self._increments.get((collection, doc_id))
+        if i is not None:
+            merged = dict(self.operations[i][3])
+            for field, amount in deltas.items():
+                merged[field] = merged.get(field, 0) + amount
+            self.operations[i] = ('increment', collection, doc_id, merged)
+            return self
+        self._increments[(collection, doc_id)] = len(self.operations)
+        self.operations.append(('increment', collection, doc_id, deltas))
+        return self
+
+    def __len__(self) -> int:
+        return len(self.operations)
+
+    def commit(self) -> None:
+        if self.operations:
+            self.backend.commit(self.operations)
+        self.operations = []
+        self._increments = {}
+
+
+class Transaction(WriteBatch):
+    """Reads plus buffered writes, applied atomically by ``run_transaction``.
+
+    Writes are collected like a WriteBatch and committed when the
+    transaction function returns. Firestore re-runs the function when a
+    document it read changed before the commit, so it must not have side
+    effects other than its writes.
+    """
+
+    def __init__(self, backend: 'StorageBackend', reader: Callable[[str, str], Optional[dict]]):
+        super().__init__(backend)
+        self._reader = reader
+
+    def get(self, collection: str, doc_id: str) -> Optional[dict]:
+        """Read a document as part of the transaction."""
+        return self._reader(collection, doc_id)
+
+    def commit(self) -> None:
+        raise StorageError("A transaction commits when its function returns")
+
+
+class StorageBackend:
+    """Interface implemented by every storage backend.
+
+    ``filters`` are ``(field, operator, value)`` tuples and ``order_by`` is a
+    list of ``(field, direction)`` tuples, mirroring the Firestore query API
+    the models were originally written against. Results are always ordered
+    by document ID after the given fields, in the direction of the last one,
+    so ``start_after`` cursors (a dict of the ordered field values plus
+    ``id``) identify a unique position.
+
+    Collections may be nested paths such as ``weeks/{id}/submissions``. With
+    ``group=True`` a query spans every collection with that ID, top-level or
+    nested, like a Firestore collection-group query; ties are then broken by
+    full document path, so group cursors carry ``path`` instead of ``id``.
+    """
+
+    name = 'base'
+    display_name = 'Unknown'
+
+    # Errors worth retrying in bulk writes (contention, transient unavailability);
+    # is_retryable() can narrow them down further
+    retryable_errors: tuple = ()
+    # True when queries that filter and order by another field, or order by
+    # several fields, fail without a declared composite index (Firestore)
+    requires_composite_indexes = False
+    # True when query() honours read_time (point-in-time reads, Firestore)
+    supports_read_time = False
+
+    def is_retryable(self, error: BaseException) -> bool:
+        """True if ``error`` is transient and the write is worth retrying."""
+        return isinstance(error, self.retryable_errors)
+
+    def new_id(self) -> str:
+        """Return a fresh random document ID."""
+        return uuid.uuid4().hex[:20]
+
+    def get(self, collection: str, doc_id: str) -> Optional[dict]:
+        """Return a document by ID, or None if it does not exist."""
+        raise NotImplementedError
+
+    def get_many(self, collection: str, doc_ids: Iterable[str]) -> dict:
+        """Fetch several documents in one round trip; missing IDs are omitted."""
+        result = {}
+        for doc_id in dict.fromkeys(doc_ids):
+            doc = self.get(collection, doc_id)
+            if doc is not None:
+                result[doc_id] = doc
+        return result
+
+    def create(self, collection: str, doc_id: str, data: dict) -> None:
+        """Create a document; raise AlreadyExists if the ID is taken."""
+        self.commit([('create', collection, doc_id, data)])
+
+    def set(self, collection: str, doc_id: str, data: dict) -> None:
+        """Create or overwrite a document."""
+        raise NotImplementedError
+
+    def update(self, collection: str, doc_id: str, data: dict) -> None:
+        """Merge fields into an existing document; raise NotFound if missing."""
+        raise NotImplementedError
+
+    def delete(self, collection: str, doc_id: str) -> None:
+        """Delete a document. Deleting a missing document is not an error."""
+        raise NotImplementedError
+
+    def query(self, collection: str, filters: Iterable[tuple] = (),
+              order_by: Iterable[tuple] = (), limit: Optional[int] = None,
+              start_after: Optional[dict] = None, group: bool = False,
+              read_time: Optional[datetime] = None) -> Iterator[dict]:
+        """Stream documents matching all filters, optionally resuming after a cursor.
+
+        With ``read_time`` (a UTC datetime), backends that support it
+        (``supports_read_time``) return the documents as they were at that
+        moment; the others ignore it and read current data.
+        """
+        raise NotImplementedError
+
+    def count(self, collection: str, filters: Iterable[tuple] = (), group: bool = False) -> int:
+        """Count documents matching all filters without returning them."""
+        return sum(1 for _ in self.query(collection, filters=filters, group=group))
+
+    def increment(self, collection: str, doc_id: str, deltas: dict) -> None:
+        """Atomically add ``deltas`` to numeric fields, creating the document if needed."""
+        raise NotImplementedError
+
+    def batch(self) -> WriteBatch:
+        """Start an atomic batch of writes."""
+        return WriteBatch(self)
+
+    def commit(self, operations: list) -> None:
+        """Apply ``(op, collection, doc_id, data)`` tuples atomically.
+
+        ``op`` is 'create', 'set', 'update', 'delete' or 'increment' (data
+        holds the deltas, as for ``increment()``). A failing create
+        (AlreadyExists) or update (NotFound) applies none of the operations.
+        """
+        raise NotImplementedError
+
+    def run_transaction(self, fn: Callable[[Transaction], Any]) -> Any:
+        """Run ``fn(transaction)`` and apply its writes atomically; return its result.
+
+        Documents read through ``transaction.get`` cannot change between the
+        read and the commit, so ``fn`` can check a document and write based
+        on what it saw. If ``fn`` raises, none of its writes are applied.
+        """
+        raise NotImplementedError
+
+    def bulk_delete(self, documents: Iterable[tuple], parallelism: int = 4,
+                    retries: int = 3) -> int:
+        """Delete many ``(collection, doc_id)`` pairs; return how many existed.
+
+        Deletes are committed in ``MAX_BATCH_SIZE`` chunks by up to
+        ``parallelism`` threads. A chunk failing with one of
+        ``retryable_errors`` is retried with exponential backoff. Each chunk
+        is atomic; the whole call is not. Pairs naming documents that do not
+        exist (e.g. counter shards never written) are not counted.
+        """
+        chunks = []
+        chunk = []
+        for collection, doc_id in documents:
+            chunk.append(('delete', collection, doc_id, None))
+            if len(chunk) >= MAX_BATCH_SIZE:
+                chunks.append(chunk)
+                chunk = []
+        if chunk:
+            chunks.append(chunk)
+
+        def commit_chunk(operations):
+            for attempt in range(retries + 1):
+                try:
+                    return self._delete_chunk(operations)
+                except Exception as e:
+                    if attempt == retries or not self.is_retryable(e):
+                        raise
+                    time.sleep(0.2 * 2 ** attempt)
+
+        if parallelism <= 1 or len(chunks) <= 1:
+            return sum(commit_chunk(c) for c in chunks)
+        with ThreadPoolExecutor(max_workers=min(parallelism, len(chunks))) as pool:
+            return sum(pool.map(commit_chunk, chunks))
+
+    def _delete_chunk(self, operations: list) -> int:
+        """Commit one chunk of deletes; return how many of the documents existed.
+
+        This default reads the chunk first, so a document created or deleted
+        concurrently can be miscounted; backends that can tell from the
+        delete itself override it.
+        """
+        existing = 0
+        by_collection = {}
+        for _, collection, doc_id, _ in operations:
+            by_collection.setdefault(collection, []).append(doc_id)
+        for collection, doc_ids in by_collection.items():
+            existing += len(self.get_many(collection, doc_ids))
+        self.commit(operations)
+        return existing
+
+    def add(self, collection: str, data: dict) -> str:
+        """Store a document under a generated ID and return the ID."""
+        doc_id = self.new_id()
+        self.set(collection, doc_id, data)
+        return doc_id
+
+    def watch(self, collection: str, on_change: Callable[[list, list], None]):
+        """Subscribe to changes in a collection.
+
+        ``on_change(upserted_docs, removed_ids)`` is called from a background
+        thread, first with the full collection and then with each change.
+        Returns a handle with an ``unsubscribe()`` method. Local backends do
+        not support watching; they are fast enough to read directly.
+        """
+        raise NotImplementedError(f"{self.name} backend does not support watch()")
+
+    def ping(self) -> None:
+        """Raise if the backend is unreachable."""
+        list(self.query('categories', limit=1))
+
+    def close(self) -> None:
+        """Release any held resources."""
+
+
+def document_path(collection: str, doc_id: str) -> str:
+    """Full slash-separated path of a document."""
+    return f"{collection}/{doc_id}"
+
+
+def in_group(collection: str, group: str) -> bool:
+    """True if ``collection`` (a possibly nested path) has the collection ID ``group``."""
+    return collection == group or collection.endswith('/' + group)
+
+
+def with_id(doc_id: str, data: dict) -> dict:
+    """Return a copy of ``data`` with the document ID attached."""
+    result = dict(data)
+    result['id'] = doc_id
+    return result
+
+
+def naive_utc(value: Any) -> Any:
+    """Normalize aware datetimes (as Firestore returns them) to the naive UTC the models write."""
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.replace(tzinfo=None) - value.utcoffset()
+    return value
+
+
+def matches(data: dict, filters: Iterable[tuple]) -> bool:
+    """Evaluate Firestore-style filters against a document in Python."""
+    for field, op, expected in filters:
+        if field not in data:
+            return False
+        actual = naive_utc(data[field])
+        if op == 'in':
+            if actual not in [naive_utc(v) for v in expected]:
+                return False
+            continue
+        expected = naive_utc(expected)
+        try:
+            if op == '==' and not actual == expected:
+                return False
+            if op == '!=' and not actual != expected:
+                return False
+            if op == '<' and not actual < expected:
+                return False
+            if op == '<=' and not actual <= expected:
+                return False
+            if op == '>' and not actual > expected:
+                return False
+            if op == '>=' and not actual >= expected:
+                return False
+        except TypeError:
+            return False
+    return True
+
+
+def sort_documents(docs: list, order_by: Iterable[tuple]) -> list:
+    """Sort ``(doc_id, data)`` pairs by the given order, breaking ties by ID.
+
+    As in Firestore, documents missing an ordered field are excluded.
+    """
+    order_by = list(order_by)
+    docs = [d for d in docs if all(field in d[1] for field, _ in order_by)]
+    last_direction = order_by[-1][1] if order_by else ASCENDING
+    docs.sort(key=lambda d: d[0], reverse=last_direction == DESCENDING)
+    for field, direction in reversed(order_by):
+        docs.sort(key=lambda d: naive_utc(d[1][field]), reverse=direction == DESCENDING)
+    return docs
+
+
+def after_cursor(doc_id: str, data: dict, order_by: Iterable[tuple], cursor: dict) -> bool:
+    """True if the document sorts strictly after ``cursor`` in the given order."""
+    order_by = list(order_by)
+    last_direction = order_by[-1][1] if order_by else ASCENDING
+    keys = [(data[field], cursor[field], direction) for field, direction in order_by]
+    keys.append((doc_id, cursor['id'], last_direction))
+    for actual, position, direction in keys:
+        actual, position = naive_utc(actual), naive_utc(position)
+        if actual == position:
+            continue
+        if direction == DESCENDING:
+            return actual < position
+        return actual > position
+    return False
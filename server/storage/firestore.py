@@ -0,0 +1,200 @@
+"""Google Cloud Firestore storage backend (the default)."""
+from __future__ import annotations
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Iterable, Iterator, Optional
+
+from google.api_core import exceptions as google_exceptions
+from google.cloud import firestore
+from google.rpc import code_pb2
+
+from ..firebase_client import get_firestore_client
+from .base import (StorageBackend, StorageError, Transaction, NotFound, AlreadyExists, ASCENDING,
+                   with_id)
+
+
+class FirestoreBackend(StorageBackend):
+    """Thin adapter from the storage interface to the Firestore client."""
+
+    name = 'firestore'
+    display_name = 'Firebase Firestore'
+    requires_composite_indexes = True
+    supports_read_time = True
+    retryable_errors = (google_exceptions.Aborted, google_exceptions.DeadlineExceeded,
+                        google_exceptions.InternalServerError, google_exceptions.ResourceExhausted,
+                        google_exceptions.ServiceUnavailable)
+
+    def __init__(self, client=None):
+        self.client = client or get_firestore_client()
+
+    def new_id(self) -> str:
+        return self.client.collection('_').document().id
+
+    def get(self, collection: str, doc_id: str) -> Optional[dict]:
+        doc = self.client.collection(collection).document(doc_id).get()
+        if doc.exists:
+            return with_id(doc.id, doc.to_dict())
+        return None
+
+    def get_many(self, collection: str, doc_ids: Iterable[str]) -> dict:
+        col = self.client.collection(collection)
+        refs = [col.document(doc_id) for doc_id in dict.fromkeys(doc_ids)]
+        if not refs:
+            return {}
+        return {doc.id: with_id(doc.id, doc.to_dict())
+                for doc in self.client.get_all(refs) if doc.exists}
+
+    def set(self, collection: str, doc_id: str, data: dict) -> None:
+        self.client.collection(collection).document(doc_id).set(data)
+
+    def update(self, collection: str, doc_id: str, data: dict) -> None:
+        try:
+            self.client.collection(collection).document(doc_id).update(data)
+        except google_exceptions.NotFound as e:
+            raise NotFound(f"{collection}/{doc_id}") from e
+
+    def delete(self, collection: str, doc_id: str) -> None:
+        self.client.collection(collection).document(doc_id).delete()
+
+    def _write(self, writer, operations: list) -> None:
+        """Add batch operations to a Firestore WriteBatch or Transaction."""
+        for op, collection, doc_id, data in operations:
+            ref = self.client.collection(collection).document(doc_id)
+            if op == 'create':
+                writer.create(ref, data)
+            elif op == 'set':
+                writer.set(ref, data)
+            elif op == 'update':
+                writer.update(ref, data)
+            elif op == 'delete':
+                writer.delete(ref)
+            elif op == 'increment':
+                writer.set(ref, {field: firestore.Increment(amount) for field, amount in data.items()},
+                           merge=True)
+
+    def commit(self, operations: list) -> None:
+        batch = self.client.batch()
+        self._write(batch, operations)
+        try:
+            batch.commit()
+        except google_exceptions.NotFound as e:
+            raise NotFound(str(e)) from e
+        except google_exceptions.AlreadyExists as e:
+            raise AlreadyExists(str(e)) from e
+
+    def run_transaction(self, fn):
+        @firestore.transactional
+        def attempt(firestore_transaction):
+            def read(collection, doc_id):
+                doc = self.client.collection(collection).document(doc_id).get(
+                    transaction=firestore_transaction)
+                return with_id(doc.id, doc.to_dict()) if doc.exists else None
+
+            transaction = Transaction(self, read)
+            result = fn(transaction)
+            self._write(firestore_transaction, transaction.operations)
+            return result
+
+        # Firestore retries the attempt when a document it read changed first
+        try:
+            return attempt(self.client.transaction())
+        except google_exceptions.NotFound as e:
+            raise NotFound(str(e)) from e
+        except google_exceptions.AlreadyExists as e:
+            raise AlreadyExists(str(e)) from e
+
+    def bulk_delete(self, documents: Iterable[tuple], parallelism: int = 4,
+                    retries: int = 3) -> int:
+        """Delete through a BulkWriter.
+
+        BulkWriter packs deletes into batches, sends them in parallel under
+        Firestore's 500/50/5 ramp-up rule (so ``parallelism`` is not used)
+        and retries contended writes itself. Each delete carries an
+        ``exists`` precondition, so documents that were never there fail
+        with NOT_FOUND and are left out of the count.
+        """
+        writer = self.client.bulk_writer()
+        must_exist = self.client.write_option(exists=True)
+        lock = threading.Lock()
+        deleted = 0
+        failures = []
+
+        def on_result(reference, result, bulk_writer):
+            nonlocal deleted
+            with lock:
+                deleted += 1
+
+        def on_error(failure, bulk_writer):
+            if failure.code == code_pb2.NOT_FOUND:
+                return False
+            if failure.attempts < retries:
+                return True
+            with lock:
+                failures.append(failure)
+            return False
+
+        writer.on_write_result(on_result)
+        writer.on_write_error(on_error)
+        for collection, doc_id in documents:
+            writer.delete(self.client.collection(collection).document(doc_id), option=must_exist)
+        writer.close()
+        if failures:
+            raise StorageError(f"{len(failures)} deletes failed: {failures[0].message}")
+        return deleted
+
+    def increment(self, collection: str, doc_id: str, deltas: dict) -> None:
+        self.client.collection(collection).document(doc_id).set(
+            {field: firestore.Increment(amount) for field, amount in deltas.items()},
+            merge=True)
+
+    def count(self, collection: str, filters: Iterable[tuple] = (), group: bool = False) -> int:
+        """Server-side count() aggregation: billed per 1000 index entries, not per document."""
+        ref = self.client.collection_group(collection) if group else self.client.collection(collection)
+        for field, op, value in filters:
+            ref = ref.where(field, op, value)
+        result = ref.count().get()
+        return int(result[0][0].value)
+
+    def query(self, collection: str, filters: Iterable[tuple] = (),
+              order_by: Iterable[tuple] = (), limit: Optional[int] = None,
+              start_after: Optional[dict] = None, group: bool = False,
+              read_time: Optional[datetime] = None) -> Iterator[dict]:
+        if group:
+            ref = self.client.collection_group(collection)
+        else:
+            ref = self.client.collection(collection)
+        for field, op, value in filters:
+            ref = ref.where(field, op, value)
+        order_by = list(order_by)
+        for field, direction in order_by:
+            ref = ref.order_by(field, direction=direction)
+        if start_after is not None:
+            # Order by document ID explicitly so the cursor can include it.
+            last_direction = order_by[-1][1] if order_by else ASCENDING
+            ref = ref.order_by('__name__', direction=last_direction)
+            cursor = {field: start_after[field] for field, _ in order_by}
+            if group:
+                cursor['__name__'] = self.client.document(start_after['path'])
+            else:
+                cursor['__name__'] = start_after['id']
+            ref = ref.start_after(cursor)
+        if limit is not None:
+            ref = ref.limit(limit)
+        if read_time is not None and read_time.tzinfo is None:
+            read_time = read_time.replace(tzinfo=timezone.utc)
+        # Point-in-time reads must fall within Firestore's version retention
+        # (one hour, or seven days with point-in-time recovery)
+        for doc in ref.stream(read_time=read_time):
+            yield with_id(doc.id, doc.to_dict())
+
+    def watch(self, collection: str, on_change: Callable[[list, list], None]):
+        def on_snapshot(docs, changes, read_time):
+            upserted, removed = [], []
+            for change in changes:
+                if change.type.name == 'REMOVED':
+                    removed.append(change.document.id)
+                else:
+                    upserted.append(with_id(change.document.id, change.document.to_dict()))
+            on_change(upserted, removed)
+
+        return self.client.collection(collection).on_snapshot(on_snapshot)
@@ -0,0 +1,119 @@
+"""Process-local in-memory storage backend.
+
+Useful for tests, demos and offline benchmarking. Data lives only as long as
+the process, and is not shared between gunicorn workers.
+"""
+from __future__ import annotations
+import copy
+import threading
+from datetime import datetime
+from typing import Iterable, Iterator, Optional
+
+from .base import (StorageBackend, Transaction, NotFound, AlreadyExists, after_cursor, document_path,
+                   in_group, matches, sort_documents, with_id)
+
+
+class MemoryBackend(StorageBackend):
+    """Stores documents in nested dicts guarded by a single lock."""
+
+    name = 'memory'
+    display_name = 'In-memory'
+
+    def __init__(self):
+        self._collections: dict[str, dict[str, dict]] = {}
+        self._lock = threading.RLock()
+
+    def get(self, collection: str, doc_id: str) -> Optional[dict]:
+        with self._lock:
+            data = self._collections.get(collection, {}).get(doc_id)
+            if data is None:
+                return None
+            return with_id(doc_id, copy.deepcopy(data))
+
+    def get_many(self, collection: str, doc_ids) -> dict:
+        with self._lock:
+            docs = self._collections.get(collection, {})
+            return {doc_id: with_id(doc_id, copy.deepcopy(docs[doc_id]))
+                    for doc_id in dict.fromkeys(doc_ids) if doc_id in docs}
+
+    def set(self, collection: str, doc_id: str, data: dict) -> None:
+        with self._lock:
+            self._collections.setdefault(collection, {})[doc_id] = copy.deepcopy(data)
+
+    def update(self, collection: str, doc_id: str, data: dict) -> None:
+        with self._lock:
+            existing = self._collections.get(collection, {}).get(doc_id)
+            if existing is None:
+                raise NotFound(f"{collection}/{doc_id}")
+            existing.update(copy.deepcopy(data))
+
+    def delete(self, collection: str, doc_id: str) -> None:
+        with self._lock:
+            self._collections.get(collection, {}).pop(doc_id, None)
+
+    def commit(self, operations: list) -> None:
+        with self._lock:
+            # Validate first so a failing batch leaves nothing applied
+            for op, collection, doc_id, _ in operations:
+                if op == 'update' and doc_id not in self._collections.get(collection, {}):
+                    raise NotFound(f"{collection}/{doc_id}")
+                if op == 'create' and doc_id in self._collections.get(collection, {}):
+                    raise AlreadyExists(f"{collection}/{doc_id}")
+            for op, collection, doc_id, data in operations:
+                if op in ('create', 'set'):
+                    self.set(collection, doc_id, data)
+                elif op == 'update':
+                    self.update(collection, doc_id, data)
+                elif op == 'delete':
+                    self.delete(collection, doc_id)
+                elif op == 'increment':
+                    self.increment(collection, doc_id, data)
+
+    def _delete_chunk(self, operations: list) -> int:
+        with self._lock:
+            return sum(self._collections.get(collection, {}).pop(doc_id, None) is not None
+                       for _, collection, doc_id, _ in operations)
+
+    def run_transaction(self, fn):
+        # The lock is re-entrant, so fn's reads and the commit happen under it
+        with self._lock:
+            transaction = Transaction(self, self.get)
+            result = fn(transaction)
+            self.commit(transaction.operations)
+            return result
+
+    def increment(self, collection: str, doc_id: str, deltas: dict) -> None:
+        with self._lock:
+            doc = self._collections.setdefault(collection, {}).setdefault(doc_id, {})
+            for field, amount in deltas.items():
+                doc[field] = doc.get(field, 0) + amount
+
+    def query(self, collection: str, filters: Iterable[tuple] = (),
+              order_by: Iterable[tuple] = (), limit: Optional[int] = None,
+              start_after: Optional[dict] = None, group: bool = False,
+              read_time: Optional[datetime] = None) -> Iterator[dict]:
+        filters = list(filters)
+        with self._lock:
+            if group:
+                sources = [(name, docs) for name, docs in self._collections.items()
+                           if in_group(name, collection)]
+            else:
+                sources = [(collection, self._collections.get(collection, {}))]
+            # (sort key, data, id): group queries break ties by full path
+            docs = [(document_path(name, doc_id) if group else doc_id, copy.deepcopy(data), doc_id)
+                    for name, source in sources
+                    for doc_id, data in source.items()
+                    if matches(data, filters)]
+        docs = sort_documents(docs, order_by)
+        if start_after is not None:
+            position = dict(start_after, id=start_after['path']) if group else start_after
+            docs = [d for d in docs if after_cursor(d[0], d[1], order_by, position)]
+        if limit is not None:
+            docs = docs[:limit]
+        for _, data, doc_id in docs:
+            yield with_id(doc_id, data)
+
+    def clear(self) -> None:
+        """Drop every collection."""
+        with self._lock:
+            self._collections.clear()
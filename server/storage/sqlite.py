@@ -0,0 +1,335 @@
+"""SQLite storage backend for self-hosted and offline deployments.
+
+Documents are stored as JSON in a single table keyed by (collection, id).
+Fields the models filter and sort on are covered by JSON expression indexes,
+so lookups by week, category, username and submission time never scan.
+"""
+from __future__ import annotations
+import json
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Iterable, Iterator, Optional
+
+from .base import StorageBackend, Transaction, NotFound, AlreadyExists, StorageError, ASCENDING, DESCENDING, FILTER_OPERATORS, with_id
+
+_FIELD_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+# index name -> indexed fields (in index column order)
+INDEXES = {
+    'week_id': ('week_id', 'submitted_at'),
+    'category_id': ('category_id', 'week_number'),
+    'username': ('username',),
+    'submitted_at': ('submitted_at',),
+}
+
+
+def _field_sql(field: str) -> str:
+    """SQL expression for a document field; datetimes compare as ISO text."""
+    if not _FIELD_RE.match(field):
+        raise StorageError(f"Unsupported field name: {field!r}")
+    return (f"COALESCE(json_extract(data, '$.{field}.__dt__'), "
+            f"json_extract(data, '$.{field}'))")
+
+
+def _normalize_datetime(value: datetime) -> str:
+    if value.tzinfo is not None:
+        value = value.replace(tzinfo=None) - value.utcoffset()
+    return value.isoformat(timespec='microseconds')
+
+
+def _encode_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {'__dt__': _normalize_datetime(value)}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _decode_hook(obj: dict) -> Any:
+    if len(obj) == 1 and '__dt__' in obj:
+        return datetime.fromisoformat(obj['__dt__'])
+    return obj
+
+
+def _encode(data: dict) -> str:
+    return json.dumps(data, default=_encode_default, separators=(',', ':'))
+
+
+def _decode(text: str) -> dict:
+    return json.loads(text, object_hook=_decode_hook)
+
+
+def _param(value: Any) -> Any:
+    """Convert a filter value to the form produced by ``_field_sql``."""
+    if isinstance(value, datetime):
+        return _normalize_datetime(value)
+    if isinstance(value, (dict, list)):
+        return _encode(value)
+    return value
+
+
+# OperationalError messages for lock contention; anything else (no such
+# table, a read-only database, bad SQL) will not go away by retrying
+_BUSY_MESSAGES = ('database is locked', 'database table is locked', 'busy')
+
+
+class SQLiteBackend(StorageBackend):
+    """Stores documents in a local SQLite database file."""
+
+    name = 'sqlite'
+    display_name = 'SQLite'
+    # "database is locked" once the busy timeout runs out; is_retryable() checks
+    # the message, since OperationalError also covers permanent errors
+    retryable_errors = (sqlite3.OperationalError,)
+
+    def __init__(self, path: str = 'sparkrepo.db'):
+        self.path = path
+        self._local = threading.local()
+        self._create_schema()
+
+    def is_retryable(self, error: BaseException) -> bool:
+        return (isinstance(error, sqlite3.OperationalError)
+                and any(message in str(error) for message in _BUSY_MESSAGES))
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _create_schema(self) -> None:
+        conn = self._connection()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS documents ('
+            ' collection TEXT NOT NULL,'
+            ' id TEXT NOT NULL,'
+            ' data TEXT NOT NULL,'
+            ' PRIMARY KEY (collection, id)'
+            ') WITHOUT ROWID'
+        )
+        for name, fields in INDEXES.items():
+            columns = ', '.join(_field_sql(f) for f in fields)
+            conn.execute(f'CREATE INDEX IF NOT EXISTS documents_{name} '
+                         f'ON documents (collection, {columns})')
+
+    def get(self, collection: str, doc_id: str) -> Optional[dict]:
+        row = self._connection().execute(
+            'SELECT data FROM documents WHERE collection = ? AND id = ?',
+            (collection, doc_id)).fetchone()
+        if row is None:
+            return None
+        return with_id(doc_id, _decode(row[0]))
+
+    def get_many(self, collection: str, doc_ids: Iterable[str]) -> dict:
+        doc_ids = list(dict.fromkeys(doc_ids))
+        result = {}
+        conn = self._connection()
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(doc_ids), 500):
+            chunk = doc_ids[start:start + 500]
+            rows = conn.execute(
+                f"SELECT id, data FROM documents WHERE collection = ? "
+                f"AND id IN ({', '.join('?' * len(chunk))})",
+                [collection, *chunk])
+            for doc_id, text in rows:
+                result[doc_id] = with_id(doc_id, _decode(text))
+        return result
+
+    def set(self, collection: str, doc_id: str, data: dict) -> None:
+        self._connection().execute(
+            'INSERT OR REPLACE INTO documents (collection, id, data) VALUES (?, ?, ?)',
+            (collection, doc_id, _encode(data)))
+
+    def _modify(self, collection: str, doc_id: str, apply, create: bool = False) -> None:
+        """Read-modify-write one document inside an immediate transaction."""
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT data FROM documents WHERE collection = ? AND id = ?',
+                (collection, doc_id)).fetchone()
+            if row is None and not create:
+                raise NotFound(f"{collection}/{doc_id}")
+            doc = _decode(row[0]) if row else {}
+            apply(doc)
+            conn.execute(
+                'INSERT OR REPLACE INTO documents (collection, id, data) VALUES (?, ?, ?)',
+                (collection, doc_id, _encode(doc)))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def update(self, collection: str, doc_id: str, data: dict) -> None:
+        self._modify(collection, doc_id, lambda doc: doc.update(data))
+
+    def delete(self, collection: str, doc_id: str) -> None:
+        self._connection().execute(
+            'DELETE FROM documents WHERE collection = ? AND id = ?', (collection, doc_id))
+
+    def commit(self, operations: list) -> None:
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._apply(conn, operations)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def run_transaction(self, fn):
+        # BEGIN IMMEDIATE takes the write lock up front, so nothing fn reads can change
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            transaction = Transaction(self, self.get)
+            result = fn(transaction)
+            self._apply(conn, transaction.operations)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return result
+
+    def _apply(self, conn: sqlite3.Connection, operations: list) -> None:
+        """Apply batch operations inside the caller's transaction."""
+        for op, collection, doc_id, data in operations:
+            if op == 'create':
+                try:
+                    conn.execute(
+                        'INSERT INTO documents (collection, id, data) VALUES (?, ?, ?)',
+                        (collection, doc_id, _encode(data)))
+                except sqlite3.IntegrityError as e:
+                    raise AlreadyExists(f"{collection}/{doc_id}") from e
+            elif op == 'set':
+                self.set(collection, doc_id, data)
+            elif op == 'update':
+                row = conn.execute(
+                    'SELECT data FROM documents WHERE collection = ? AND id = ?',
+                    (collection, doc_id)).fetchone()
+                if row is None:
+                    raise NotFound(f"{collection}/{doc_id}")
+                merged = _decode(row[0])
+                merged.update(data)
+                self.set(collection, doc_id, merged)
+            elif op == 'delete':
+                self.delete(collection, doc_id)
+            elif op == 'increment':
+                row = conn.execute(
+                    'SELECT data FROM documents WHERE collection = ? AND id = ?',
+                    (collection, doc_id)).fetchone()
+                doc = _decode(row[0]) if row else {}
+                for field, amount in data.items():
+                    doc[field] = doc.get(field, 0) + amount
+                self.set(collection, doc_id, doc)
+
+    def bulk_delete(self, documents: Iterable[tuple], parallelism: int = 4,
+                    retries: int = 3) -> int:
+        # SQLite has a single writer; parallel chunks would only queue on its lock.
+        return super().bulk_delete(documents, parallelism=1, retries=retries)
+
+    def _delete_chunk(self, operations: list) -> int:
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            deleted = sum(conn.execute(
+                'DELETE FROM documents WHERE collection = ? AND id = ?', (collection, doc_id)).rowcount
+                for _, collection, doc_id, _ in operations)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return deleted
+
+    def increment(self, collection: str, doc_id: str, deltas: dict) -> None:
+        def apply(doc):
+            for field, amount in deltas.items():
+                doc[field] = doc.get(field, 0) + amount
+
+        self._modify(collection, doc_id, apply, create=True)
+
+    @staticmethod
+    def _where(select: str, collection: str, filters: Iterable[tuple], group: bool):
+        """Build ``SELECT ... WHERE`` for a collection and filters.
+
+        Returns (sql parts, params), or None when a filter can match nothing.
+        """
+        if group:
+            sql = [f'SELECT {select} FROM documents WHERE (collection = ? OR collection GLOB ?)']
+            params: list = [collection, f'*/{collection}']
+        else:
+            sql = [f'SELECT {select} FROM documents WHERE collection = ?']
+            params = [collection]
+        for field, op, value in filters:
+            if op not in FILTER_OPERATORS:
+                raise StorageError(f"Unsupported operator: {op!r}")
+            if op == 'in':
+                values = list(value)
+                if not values:
+                    return None
+                sql.append(f"AND {_field_sql(field)} IN ({', '.join('?' * len(values))})")
+                params.extend(_param(v) for v in values)
+            else:
+                sql.append(f"AND {_field_sql(field)} {'=' if op == '==' else op} ?")
+                params.append(_param(value))
+        return sql, params
+
+    def count(self, collection: str, filters: Iterable[tuple] = (), group: bool = False) -> int:
+        where = self._where('COUNT(*)', collection, filters, group)
+        if where is None:
+            return 0
+        sql, params = where
+        return self._connection().execute(' '.join(sql), params).fetchone()[0]
+
+    def query(self, collection: str, filters: Iterable[tuple] = (),
+              order_by: Iterable[tuple] = (), limit: Optional[int] = None,
+              start_after: Optional[dict] = None, group: bool = False,
+              read_time: Optional[datetime] = None) -> Iterator[dict]:
+        where = self._where('id, data', collection, filters, group)
+        if where is None:
+            return
+        sql, params = where
+        if group:
+            tiebreak, cursor_key = "collection || '/' || id", 'path'
+        else:
+            tiebreak, cursor_key = 'id', 'id'
+        order_by = list(order_by)
+        orders = []
+        for field, direction in order_by:
+            sql.append(f"AND {_field_sql(field)} IS NOT NULL")
+            orders.append(f"{_field_sql(field)} {'DESC' if direction == DESCENDING else 'ASC'}")
+        last_direction = order_by[-1][1] if order_by else ASCENDING
+        orders.append(f"{tiebreak} {'DESC' if last_direction == DESCENDING else 'ASC'}")
+        if start_after is not None:
+            # (a, b, id) strictly after the cursor, honouring each direction:
+            # a > ? OR (a = ? AND (b > ? OR (b = ? AND id > ?)))
+            keys = [(_field_sql(f), start_after[f], d) for f, d in order_by]
+            keys.append((tiebreak, start_after[cursor_key], last_direction))
+            condition, condition_params = '', []
+            for expr, value, direction in reversed(keys):
+                op = '<' if direction == DESCENDING else '>'
+                if condition:
+                    condition = f"({expr} {op} ? OR ({expr} = ? AND {condition}))"
+                    condition_params = [_param(value), _param(value), *condition_params]
+                else:
+                    condition = f"{expr} {op} ?"
+                    condition_params = [_param(value)]
+            sql.append(f"AND {condition}")
+            params.extend(condition_params)
+        sql.append('ORDER BY ' + ', '.join(orders))
+        if limit is not None:
+            sql.append('LIMIT ?')
+            params.append(int(limit))
+        cursor = self._connection().execute(' '.join(sql), params)
+        for doc_id, text in cursor:
+            yield with_id(doc_id, _decode(text))
+
+    def close(self) -> None:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
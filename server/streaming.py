@@ -0,0 +1,65 @@
+"""Streamed JSON responses for large list endpoints.
+
+``stream_json("submissions", documents)`` answers with the same body as
+``jsonify({"submissions": list(documents)})``, but encodes the documents as
+they come out of the backend iterator and sends them in chunks of about
+``CHUNK_BYTES``. The worker holds one chunk instead of the whole list plus
+its encoding, and the first bytes go out as soon as the first chunk is
+ready.
+
+The response status is sent before the body, so an error after the first
+document cannot become a JSON error response; the stream is cut off
+instead and the client sees an incomplete body. Errors while reading the
+first document are raised to the caller as usual.
+
+Enabled with ``STREAM_LIST_RESPONSES``; paginated requests (``limit`` /
+``cursor``) are small and keep using ``jsonify``.
+"""
+from __future__ import annotations
+import itertools
+import logging
+from typing import Iterable
+
+from flask import Response, current_app, stream_with_context
+
+logger = logging.getLogger(__name__)
+
+# Encoded bytes collected before a chunk is sent
+CHUNK_BYTES = 64 * 1024
+
+_END = object()
+
+
+def streaming_enabled() -> bool:
+    """Whether list endpoints should stream their full (unpaginated) responses."""
+    return current_app.config.get('STREAM_LIST_RESPONSES', False)
+
+
+def stream_json(key: str, documents: Iterable, status: int = 200) -> Response:
+    """Chunked ``{key: [documents...]}`` response, encoded as documents are read."""
+    documents = iter(documents)
+    first = next(documents, _END)
+    dumps = current_app.json.dumps
+
+    def generate():
+        parts = ['{', dumps(key), ':[']
+        size = 0
+        count = 0
+        try:
+            if first is not _END:
+                for document in itertools.chain((first,), documents):
+                    encoded = dumps(document)
+                    parts.append(',' + encoded if count else encoded)
+                    size += len(encoded)
+                    count += 1
+                    if size >= CHUNK_BYTES:
+                        yield ''.join(parts)
+                        parts, size = [], 0
+        except Exception as e:
+            logger.error(f"Streaming {key} failed after {count} documents: {e}")
+            raise
+        parts.append(']}')
+        yield ''.join(parts)
+
+    return Response(stream_with_context(generate()), status=status,
+                    mimetype=current_app.json.mimetype)
@@ -0,0 +1,16 @@
+"""Field rules shared by the JSON endpoints and the CSV importer."""
+from typing import Optional
+
+
+def submission_error(data: dict) -> Optional[str]:
+    """Why a submission payload is invalid, or None if it is valid."""
+    if not data.get('student_name') or not data.get('project_url'):
+        return 'student_name and project_url are required'
+    return None
+
+
+def week_error(data: dict) -> Optional[str]:
+    """Why a new-week payload is invalid, or None if it is valid."""
+    if 'week_number' not in data or 'title' not in data:
+        return 'Missing required fields: week_number and title'
+    return None
@@ -0,0 +1,24 @@
+"""Shared fixtures: a Flask app on the memory backend, without background services."""
+import pytest
+
+from server.app import create_app
+
+
+@pytest.fixture
+def make_app():
+    """Build an app with extra config, e.g. ``make_app(SUBMISSIONS_UPSERT=True)``."""
+    def build(**config):
+        return create_app({
+            'TESTING': True,
+            'STORAGE_BACKEND': 'memory',
+            'BACKGROUND_SERVICES': False,
+            **config,
+        })
+    return build
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.app_context():
+        yield app
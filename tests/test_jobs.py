@@ -0,0 +1,169 @@
+"""Job runner behaviour: claiming, recovery, resuming, heartbeats and purging."""
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from server.jobs import (JobRunner, JOBS_COLLECTION, LEASES_COLLECTION, QUEUED, RUNNING,
+                         SUCCEEDED, FAILED)
+from server.storage import get_backend, set_backend
+from server.storage.memory import MemoryBackend
+
+
+@pytest.fixture
+def db():
+    backend = MemoryBackend()
+    set_backend(backend)
+    yield backend
+    set_backend(None)
+
+
+@pytest.fixture
+def runner(db):
+    runner = JobRunner(workers=0, stale_after=60, recovery_interval=60, retention_days=7)
+    runner.runs = []
+
+    @runner.handler('count')
+    def count(job):
+        runner.runs.append(dict(job.checkpoint))
+        return {'ok': True}
+
+    return runner
+
+
+def stale_job(db, job_id='j1', status=RUNNING, attempts=1, **fields):
+    db.set(JOBS_COLLECTION, job_id, {
+        'type': 'count', 'params': {}, 'status': status, 'attempts': attempts,
+        'checkpoint': {}, 'heartbeat_at': datetime.utcnow() - timedelta(minutes=5), **fields,
+    })
+
+
+def test_submit_leaves_the_job_queued_without_worker_threads(runner, db):
+    job = runner.submit('count', {})
+
+    assert db.get(JOBS_COLLECTION, job['id'])['status'] == QUEUED
+    assert runner.runs == []
+    assert runner.run_pending() == 1
+    assert db.get(JOBS_COLLECTION, job['id'])['status'] == SUCCEEDED
+    assert runner.runs == [{}]
+
+
+def test_two_recovery_sweeps_run_a_stale_job_once(runner, db):
+    stale_job(db)
+
+    assert runner.recover() == 1
+    assert runner.recover() == 0
+    runner.run_pending()
+
+    job = db.get(JOBS_COLLECTION, 'j1')
+    assert len(runner.runs) == 1
+    assert job['status'] == SUCCEEDED
+    assert job['attempts'] == 2
+    assert db.get(LEASES_COLLECTION, 'j1:2') is not None
+
+
+def test_second_worker_skips_a_job_that_is_running(runner, db):
+    started, release = threading.Event(), threading.Event()
+    other = JobRunner(workers=0, stale_after=60)
+
+    @runner.handler('slow')
+    @other.handler('slow')
+    def slow(job):
+        runner.runs.append(job.id)
+        started.set()
+        release.wait(5)
+        return {}
+
+    stale_job(db, type='slow')
+    runner.recover()
+    other.recover()
+    first = threading.Thread(target=runner.run_pending)
+    first.start()
+    assert started.wait(5)
+    other.run_pending()
+    release.set()
+    first.join(5)
+
+    assert runner.runs == ['j1']
+    assert db.get(JOBS_COLLECTION, 'j1')['attempts'] == 2
+
+
+def test_claim_fails_when_the_job_changed_since_it_was_read(runner, db):
+    stale_job(db)
+    read = db.get(JOBS_COLLECTION, 'j1')
+    db.update(JOBS_COLLECTION, 'j1', {'attempts': 2})
+
+    assert runner._claim(read) is False
+    assert db.get(LEASES_COLLECTION, 'j1:2') is None
+
+
+def test_recovered_job_resumes_from_its_checkpoint(runner, db):
+    stale_job(db, checkpoint={'weeks_done': 3})
+
+    runner.recover()
+    runner.run_pending()
+
+    assert runner.runs == [{'weeks_done': 3}]
+
+
+def test_failed_job_keeps_its_last_checkpoint(runner, db):
+    @runner.handler('broken')
+    def broken(job):
+        job.save(checkpoint={'step': 1})
+        raise RuntimeError('boom')
+
+    job = runner.submit('broken', {})
+    runner.run_pending()
+
+    stored = db.get(JOBS_COLLECTION, job['id'])
+    assert stored['status'] == FAILED
+    assert stored['error'] == 'boom'
+    assert stored['checkpoint'] == {'step': 1}
+
+
+def test_heartbeat_is_refreshed_while_a_step_runs(db):
+    runner = JobRunner(workers=0, stale_after=3)
+    beats = []
+
+    @runner.handler('long')
+    def long_step(job):
+        claimed = get_backend().get(JOBS_COLLECTION, job.id)['heartbeat_at']
+        time.sleep(1.5)
+        beats.append((claimed, get_backend().get(JOBS_COLLECTION, job.id)['heartbeat_at']))
+        return {}
+
+    runner.submit('long', {})
+    runner.run_pending()
+
+    claimed, later = beats[0]
+    assert later > claimed
+
+
+def test_purge_deletes_old_finished_jobs_leases_and_runs_cleanup(runner, db):
+    cleaned = []
+    runner.cleanup('count')(lambda job: cleaned.append(job['id']))
+    old = datetime.utcnow() - timedelta(days=8)
+    stale_job(db, 'old', status=SUCCEEDED, attempts=2, finished_at=old)
+    stale_job(db, 'recent', status=FAILED, finished_at=datetime.utcnow())
+    stale_job(db, 'running', status=RUNNING, finished_at=old)
+    for lease in ('old:1', 'old:2', 'recent:1'):
+        db.set(LEASES_COLLECTION, lease, {})
+
+    assert runner.purge() == 1
+
+    assert cleaned == ['old']
+    assert db.get(JOBS_COLLECTION, 'old') is None
+    assert db.get(LEASES_COLLECTION, 'old:1') is None
+    assert db.get(LEASES_COLLECTION, 'old:2') is None
+    assert db.get(JOBS_COLLECTION, 'recent') is not None
+    assert db.get(LEASES_COLLECTION, 'recent:1') is not None
+    assert db.get(JOBS_COLLECTION, 'running') is not None
+
+
+def test_purge_keeps_everything_with_zero_retention(runner, db):
+    runner.retention_days = 0
+    stale_job(db, 'old', status=SUCCEEDED, finished_at=datetime.utcnow() - timedelta(days=30))
+
+    assert runner.purge() == 0
+    assert db.get(JOBS_COLLECTION, 'old') is not None
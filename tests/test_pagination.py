@@ -0,0 +1,120 @@
+"""Cursor pagination of submission lists (Submission.get_page and the list endpoints)."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from server import models
+from server.models import Category, Submission, Week
+from server.pagination import InvalidCursor, decode_cursor, encode_cursor
+
+START = datetime(2026, 3, 1, 12, 0)
+
+
+@pytest.fixture(params=['flat', 'nested'])
+def layout(request, make_app):
+    app = make_app(SUBMISSIONS_LAYOUT=request.param)
+    with app.app_context():
+        category = Category.create('Pages')
+        other = Category.create('Other')
+        weeks = [Week.create(category['id'], n, f'Week {n}') for n in (1, 2)]
+        weeks.append(Week.create(other['id'], 1, 'Other week'))
+        for i in range(12):
+            week = weeks[i % 3]
+            # Four submissions share each timestamp, so ties need the ID or path
+            Submission.create(week['id'], f'Student {i}', f'https://example.com/{i}',
+                              status='approved' if i % 2 else 'pending',
+                              category_id=week['category_id'],
+                              submitted_at=START + timedelta(minutes=i // 4))
+        yield app, weeks
+
+
+def all_pages(filters, limit, through_cursor=False):
+    pages, position = [], None
+    while True:
+        page, position = Submission.get_page(filters, limit=limit, start_after=position)
+        pages.append(page)
+        if position is None:
+            return pages
+        if through_cursor:
+            position = decode_cursor(encode_cursor(position))
+
+
+def expected(filters):
+    everything = Submission.get_all()
+    return [s['id'] for s in everything
+            if all(s.get(field) == value for field, _, value in filters)]
+
+
+@pytest.mark.parametrize('limit', [1, 3, 5, 12, 50])
+def test_pages_cover_every_submission_once_newest_first(layout, limit):
+    pages = all_pages([], limit, through_cursor=True)
+    ids = [s['id'] for page in pages for s in page]
+
+    assert ids == expected([])
+    assert len(ids) == 12
+    times = [s['submitted_at'] for page in pages for s in page]
+    assert times == sorted(times, reverse=True)
+    assert all(len(page) == limit for page in pages[:-1])
+
+
+def test_last_page_returns_no_cursor(layout):
+    page, position = Submission.get_page([], limit=12)
+    assert len(page) == 12 and position is None
+
+    page, position = Submission.get_page([], limit=11)
+    assert position is not None
+    page, position = Submission.get_page([], limit=11, start_after=position)
+    assert len(page) == 1 and position is None
+
+
+@pytest.mark.parametrize('fields', [
+    ('week_id',),
+    ('category_id',),
+    ('status',),
+    ('week_id', 'status'),
+    ('category_id', 'status'),
+    ('week_id', 'category_id', 'status'),
+])
+def test_filter_combinations_push_one_filter_and_check_the_rest(layout, fields, monkeypatch):
+    # Small scans so the Python-checked filters need several reads per page
+    monkeypatch.setattr(models, 'PAGE_SCAN', 2)
+    _, weeks = layout
+    values = {'week_id': weeks[0]['id'], 'category_id': weeks[0]['category_id'],
+              'status': 'approved'}
+    filters = [(field, '==', values[field]) for field in fields]
+
+    ids = [s['id'] for page in all_pages(filters, 2, through_cursor=True) for s in page]
+
+    assert ids == expected(filters)
+    assert ids
+
+
+def test_get_page_rejects_unsupported_filters(layout):
+    with pytest.raises(ValueError):
+        Submission.get_page([('student_name', '==', 'Student 1')])
+    with pytest.raises(ValueError):
+        Submission.get_page([('status', '!=', 'pending')])
+
+
+def test_cursor_round_trip_keeps_datetimes_and_paths():
+    position = {'submitted_at': START, 'id': 'abc', 'path': 'weeks/w1/submissions/abc'}
+    assert decode_cursor(encode_cursor(position)) == position
+    with pytest.raises(InvalidCursor):
+        decode_cursor('not-a-cursor')
+
+
+def test_week_endpoint_pages_with_cursors(layout):
+    app, weeks = layout
+    client = app.test_client()
+    url = f"/api/weeks/{weeks[1]['id']}/submissions"
+    ids, cursor = [], None
+    while True:
+        query = {'limit': 1, **({'cursor': cursor} if cursor else {})}
+        body = client.get(url, query_string=query).get_json()
+        ids += [s['id'] for s in body['submissions']]
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+
+    assert ids == expected([('week_id', '==', weeks[1]['id'])])
+    assert client.get(url, query_string={'cursor': 'bad'}).status_code == 400
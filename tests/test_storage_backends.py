@@ -0,0 +1,189 @@
+"""Contract tests every local storage backend must pass.
+
+Each test runs against the memory and SQLite backends; the Firestore
+backend follows the same contract but needs a live project (or emulator).
+"""
+import pytest
+
+from server.storage import (AlreadyExists, NotFound, ASCENDING, DESCENDING, MAX_BATCH_SIZE,
+                            create_backend)
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def db(request, tmp_path):
+    backend = create_backend(request.param, sqlite_path=str(tmp_path / 'test.db'))
+    yield backend
+    backend.close()
+
+
+def ids(docs):
+    return [doc['id'] for doc in docs]
+
+
+# Batch commit
+
+def test_batch_commit_applies_every_operation(db):
+    db.set('items', 'updated', {'n': 1})
+    db.set('items', 'deleted', {'n': 2})
+    batch = db.batch()
+    batch.create('items', 'created', {'n': 3})
+    batch.set('items', 'replaced', {'n': 4})
+    batch.update('items', 'updated', {'m': 5})
+    batch.delete('items', 'deleted')
+    batch.increment('counters', 'c', {'total': 2})
+    batch.increment('counters', 'c', {'total': 1, 'late': 1})
+    batch.commit()
+
+    assert db.get('items', 'created') == {'id': 'created', 'n': 3}
+    assert db.get('items', 'replaced') == {'id': 'replaced', 'n': 4}
+    assert db.get('items', 'updated') == {'id': 'updated', 'n': 1, 'm': 5}
+    assert db.get('items', 'deleted') is None
+    assert db.get('counters', 'c') == {'id': 'c', 'total': 3, 'late': 1}
+
+
+def test_batch_with_existing_create_applies_nothing(db):
+    db.set('items', 'taken', {'n': 1})
+    batch = db.batch()
+    batch.set('items', 'other', {'n': 2})
+    batch.create('items', 'taken', {'n': 3})
+    with pytest.raises(AlreadyExists):
+        batch.commit()
+
+    assert db.get('items', 'other') is None
+    assert db.get('items', 'taken') == {'id': 'taken', 'n': 1}
+
+
+def test_batch_with_missing_update_applies_nothing(db):
+    batch = db.batch()
+    batch.set('items', 'other', {'n': 2})
+    batch.update('items', 'missing', {'n': 3})
+    with pytest.raises(NotFound):
+        batch.commit()
+
+    assert db.get('items', 'other') is None
+
+
+# bulk_delete
+
+def test_bulk_delete_spans_chunks_and_counts_existing_documents(db):
+    total = MAX_BATCH_SIZE + 20
+    batch = db.batch()
+    for i in range(total):
+        batch.set('items', f'doc{i:04d}', {'n': i})
+        if len(batch) == MAX_BATCH_SIZE:
+            batch.commit()
+            batch = db.batch()
+    batch.commit()
+    db.set('other', 'kept', {'n': 0})
+
+    documents = [('items', f'doc{i:04d}') for i in range(total)]
+    documents += [('items', 'never-written'), ('counters', 'never-written')]
+    assert db.bulk_delete(documents) == total
+
+    assert list(db.query('items')) == []
+    assert db.get('other', 'kept') is not None
+    assert db.bulk_delete([('items', 'doc0000')]) == 0
+
+
+# Cursors
+
+@pytest.fixture
+def ranked(db):
+    # Ties on score, so paging has to fall back to the document ID
+    for i, score in enumerate([3, 1, 2, 3, 1, 2, 3]):
+        db.set('items', f'doc{i}', {'score': score, 'kind': 'a' if i % 2 else 'b'})
+    return db
+
+
+@pytest.mark.parametrize('direction', [ASCENDING, DESCENDING])
+def test_start_after_pages_through_every_document_once(ranked, direction):
+    order_by = [('score', direction)]
+    expected = ids(ranked.query('items', order_by=order_by))
+    assert len(expected) == 7
+
+    pages, position = [], None
+    while True:
+        page = list(ranked.query('items', order_by=order_by, limit=3, start_after=position))
+        if not page:
+            break
+        pages.extend(page)
+        position = page[-1]
+    assert ids(pages) == expected
+
+
+def test_start_after_combines_with_filters(ranked):
+    order_by = [('score', DESCENDING)]
+    filters = [('kind', '==', 'b')]
+    first = list(ranked.query('items', filters=filters, order_by=order_by, limit=2))
+    rest = list(ranked.query('items', filters=filters, order_by=order_by, start_after=first[-1]))
+
+    assert ids(first + rest) == ids(ranked.query('items', filters=filters, order_by=order_by))
+    assert all(doc['kind'] == 'b' for doc in first + rest)
+
+
+# Collection-group queries
+
+@pytest.fixture
+def nested(db):
+    db.set('categories/c1/submissions', 's1', {'week': 1, 'status': 'approved'})
+    db.set('categories/c1/submissions', 's2', {'week': 2, 'status': 'pending'})
+    db.set('categories/c2/submissions', 's1', {'week': 1, 'status': 'pending'})
+    db.set('submissions', 's3', {'week': 3, 'status': 'pending'})
+    db.set('categories/c1/submissions_archive', 's4', {'week': 1, 'status': 'pending'})
+    return db
+
+
+def test_group_query_reads_every_collection_with_that_id(nested):
+    docs = list(nested.query('submissions', group=True))
+
+    assert sorted(ids(docs)) == ['s1', 's1', 's2', 's3']
+    assert nested.count('submissions', group=True) == 4
+    assert nested.count('submissions', filters=[('status', '==', 'pending')], group=True) == 3
+    assert ids(nested.query('submissions')) == ['s3']
+
+
+def test_group_query_pages_by_path_cursor(nested):
+    order_by = [('week', ASCENDING)]
+    first = list(nested.query('submissions', order_by=order_by, limit=1, group=True))
+    # Two documents share ID s1 and week 1; the cursor's path tells them apart
+    assert ids(first) == ['s1']
+    cursor = dict(first[0], path='categories/c1/submissions/s1')
+    rest = list(nested.query('submissions', order_by=order_by, start_after=cursor, group=True))
+
+    assert [(d['id'], d['week']) for d in rest] == [('s1', 1), ('s2', 2), ('s3', 3)]
+
+
+# Transactions
+
+def test_transaction_reads_and_writes_atomically(db):
+    db.set('items', 'a', {'version': 1})
+
+    def bump(transaction):
+        doc = transaction.get('items', 'a')
+        transaction.update('items', 'a', {'version': doc['version'] + 1})
+        transaction.set('history', 'a-1', {'version': doc['version']})
+        return doc['version']
+
+    assert db.run_transaction(bump) == 1
+    assert db.get('items', 'a')['version'] == 2
+    assert db.get('history', 'a-1') == {'id': 'a-1', 'version': 1}
+
+
+def test_failed_transaction_applies_nothing(db):
+    db.set('items', 'taken', {'n': 1})
+
+    def clash(transaction):
+        transaction.set('items', 'other', {'n': 2})
+        transaction.create('items', 'taken', {'n': 3})
+
+    with pytest.raises(AlreadyExists):
+        db.run_transaction(clash)
+    assert db.get('items', 'other') is None
+
+    def fail(transaction):
+        transaction.set('items', 'other', {'n': 2})
+        raise RuntimeError('abort')
+
+    with pytest.raises(RuntimeError):
+        db.run_transaction(fail)
+    assert db.get('items', 'other') is None
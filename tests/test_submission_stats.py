@@ -0,0 +1,168 @@
+"""Sharded submission counters: write deltas, reconcile, the reconcile job and shard backfill."""
+from collections import Counter
+
+import pytest
+
+from server.jobs import SUCCEEDED, job_runner
+from server.models import (SUBMISSION_COUNTS_COLLECTION, SUBMISSION_STATUSES, Category,
+                           Submission, SubmissionStats, Week, configure_models,
+                           submission_shard)
+from server.scripts.backfill_submission_shards import (CHECKPOINT_ID, MIGRATIONS_COLLECTION,
+                                                       backfill)
+from server.storage import get_backend
+
+
+@pytest.fixture(params=[False, True], ids=['insert', 'upsert'])
+def app(request, make_app):
+    app = make_app(COUNTER_SHARDS=3, SUBMISSIONS_UPSERT=request.param)
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def weeks(app):
+    first, second = Category.create('First'), Category.create('Second')
+    return [Week.create(first['id'], 1, 'One'), Week.create(first['id'], 2, 'Two'),
+            Week.create(second['id'], 1, 'Three')]
+
+
+def actual_counts(key):
+    """Count the stored submissions by week or category, as the counters should."""
+    counts = {}
+    for submission in Submission.get_all():
+        scope = counts.setdefault(submission[key], {'total': 0, 'by_status': Counter()})
+        scope['total'] += 1
+        scope['by_status'][submission['status']] += 1
+    return counts
+
+
+def assert_counters_match(weeks):
+    expected = {'week_id': [w['id'] for w in weeks],
+                'category_id': list({w['category_id'] for w in weeks})}
+    for key, read in (('week_id', SubmissionStats.for_weeks),
+                      ('category_id', SubmissionStats.for_categories)):
+        actual = actual_counts(key)
+        for scope_id, counts in read(expected[key]).items():
+            want = actual.get(scope_id, {'total': 0, 'by_status': Counter()})
+            assert counts['total'] == want['total'], (key, scope_id)
+            assert counts['by_status'] == {status: want['by_status'][status]
+                                           for status in SUBMISSION_STATUSES}, (key, scope_id)
+
+
+def submit(week, name, **kwargs):
+    return Submission.create(week['id'], name, f'https://example.com/{name}',
+                             category_id=week['category_id'], **kwargs)
+
+
+def test_create_counts_each_week_and_category(weeks):
+    for i in range(9):
+        submit(weeks[i % 3], f'student{i}', status='approved' if i % 4 == 0 else 'pending')
+
+    assert_counters_match(weeks)
+    assert SubmissionStats.for_weeks([weeks[0]['id']])[weeks[0]['id']]['total'] == 3
+    assert SubmissionStats.for_categories([weeks[0]['category_id']])[weeks[0]['category_id']]['total'] == 6
+    # Increments land on random shards; readers sum all of them
+    assert len(list(get_backend().query(SUBMISSION_COUNTS_COLLECTION))) > 4
+
+
+def test_status_change_moves_the_count(weeks):
+    submission = submit(weeks[0], 'ada')
+    Submission.update(submission['id'], status='approved')
+    Submission.update(submission['id'], status='approved')
+    Submission.update(submission['id'], admin_comment='no status change')
+
+    assert_counters_match(weeks)
+    counts = SubmissionStats.for_weeks([weeks[0]['id']])[weeks[0]['id']]
+    assert counts['by_status']['approved'] == 1 and counts['by_status']['pending'] == 0
+
+
+def test_delete_removes_the_count(weeks):
+    kept = submit(weeks[1], 'kept')
+    gone = submit(weeks[1], 'gone', status='rejected')
+    Submission.delete(gone['id'])
+    Submission.delete(gone['id'])
+
+    assert_counters_match(weeks)
+    assert SubmissionStats.for_weeks([weeks[1]['id']])[weeks[1]['id']]['total'] == 1
+    assert Submission.get_by_id(kept['id'])
+
+
+def test_resubmissions_count_once_per_student(app, weeks):
+    for attempt in range(3):
+        first = submit(weeks[2], 'grace')
+        Submission.update(first['id'], status='approved')
+    submit(weeks[2], 'Grace ')
+
+    assert_counters_match(weeks)
+    total = SubmissionStats.for_weeks([weeks[2]['id']])[weeks[2]['id']]['total']
+    assert total == (1 if app.config['SUBMISSIONS_UPSERT'] else 4)
+
+
+def test_week_move_and_delete_carry_category_counts(weeks):
+    for i in range(4):
+        submit(weeks[0], f'student{i}')
+    Week.update(weeks[0]['id'], category_id=weeks[2]['category_id'], week_number=2)
+    moved = Week.get_by_id(weeks[0]['id'])
+
+    assert_counters_match([moved, *weeks[1:]])
+
+    Week.delete(moved['id'])
+    counts = SubmissionStats.for_categories([weeks[2]['category_id']])[weeks[2]['category_id']]
+    assert counts['total'] == 0
+
+
+def test_reconcile_restores_wiped_counters(weeks):
+    for i in range(6):
+        submit(weeks[i % 3], f'student{i}', status=SUBMISSION_STATUSES[i % len(SUBMISSION_STATUSES)])
+    db = get_backend()
+    for shard in db.query(SUBMISSION_COUNTS_COLLECTION):
+        db.delete(SUBMISSION_COUNTS_COLLECTION, shard['id'])
+    assert SubmissionStats.for_weeks([weeks[0]['id']])[weeks[0]['id']]['total'] == 0
+
+    counts = SubmissionStats.reconcile_category(weeks[0]['category_id'])
+
+    assert counts['total'] == 4
+    assert SubmissionStats.reconcile_week(weeks[2]['id'])['total'] == 2
+    assert SubmissionStats.for_categories([weeks[2]['category_id']])[weeks[2]['category_id']]['total'] == 0
+    SubmissionStats.reconcile_category(weeks[2]['category_id'])
+    assert_counters_match(weeks)
+
+
+def test_reconcile_job_initializes_counters_for_existing_data(weeks):
+    for i in range(5):
+        submit(weeks[i % 3], f'student{i}')
+    db = get_backend()
+    for shard in db.query(SUBMISSION_COUNTS_COLLECTION):
+        db.set(SUBMISSION_COUNTS_COLLECTION, shard['id'], {'total': 100})
+
+    job = job_runner.submit('reconcile_stats', {'class_id': None})
+    job_runner.run_pending()
+    job = job_runner.get(job['id'])
+
+    assert job['status'] == SUCCEEDED
+    assert job['result'] == {'categories': 2}
+    assert job['checkpoint']['done'] == [c['id'] for c in Category.get_all()]
+    assert_counters_match(weeks)
+
+
+def test_shard_backfill_assigns_shards_and_keeps_counts(app, weeks):
+    for i in range(6):
+        submit(weeks[i % 3], f'student{i}', status='approved' if i % 2 else 'pending')
+    before = SubmissionStats.for_weeks([w['id'] for w in weeks])
+    configure_models({**app.config, 'SUBMISSION_SHARDS': 4})
+
+    backfill(4)
+
+    submissions = Submission.get_all()
+    assert all(s['shard'] == submission_shard(s['id']) for s in submissions)
+    checkpoint = get_backend().get(MIGRATIONS_COLLECTION, CHECKPOINT_ID)
+    assert checkpoint['done'] and checkpoint['shards'] == 4
+    assert (checkpoint['weeks'], checkpoint['updated']) == (3, 6)
+    assert SubmissionStats.for_weeks([w['id'] for w in weeks]) == before
+    assert_counters_match(weeks)
+
+    # A re-run with a different shard count ignores the old checkpoint
+    configure_models({**app.config, 'SUBMISSION_SHARDS': 2})
+    backfill(2)
+    assert all(s['shard'] == submission_shard(s['id']) for s in Submission.get_all())
+    assert get_backend().get(MIGRATIONS_COLLECTION, CHECKPOINT_ID)['shards'] == 2